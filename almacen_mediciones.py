@@ -0,0 +1,145 @@
+import threading
+
+import pandas as pd
+
+import perfilado
+
+# Columnas de mediciones que se cargan para el panel de cada paciente.
+COLUMNAS = ['id', 'fecha', 'dilatacion', 'frecuencia_cardiaca', 'contracciones', 'presion_arterial', 'sistolica', 'diastolica']
+COLUMNAS_NUMERICAS = ['dilatacion', 'frecuencia_cardiaca', 'contracciones', 'sistolica', 'diastolica']
+
+# Función para convertir filas crudas de mediciones en un DataFrame tipado.
+# Los valores numéricos usan enteros con nulos (Int64) porque db_manager.py permite
+# guardar celdas vacías o texto libre en cualquier columna.
+def tipar_mediciones(filas):
+    df = pd.DataFrame(filas, columns=COLUMNAS)
+    df['id'] = df['id'].astype('int64')
+    for columna in COLUMNAS_NUMERICAS:
+        df[columna] = pd.to_numeric(df[columna], errors='coerce').astype('Int64')
+    df['presion_arterial'] = df['presion_arterial'].astype('object')
+    with perfilado.etapa('fechas'):
+        df['Fecha'] = pd.to_datetime(df['fecha'], format='ISO8601', errors='coerce').dt.tz_localize(None)
+    return df.drop(columns=['fecha'])
+
+# Almacén incremental de mediciones por paciente.
+# Recuerda el mayor mediciones.id visto por paciente y en cada consulta solo lee las filas
+# nuevas, que se tipan y se añaden al DataFrame en caché. Si la revisión del paciente cambió
+# (actualización o eliminación de filas, ver la tabla mediciones_revisiones en esquema.py),
+# descarta la caché y recarga su historia completa.
+# Con `desde`, solo se carga la historia a partir de esa fecha: el costo de la primera lectura
+# queda acotado por la ventana que se visualiza y no por la duración del monitoreo. Una ventana
+# que empieza antes de lo ya cargado obliga a recargar desde el nuevo inicio.
+# Los DataFrames devueltos no deben modificarse: se comparten entre sesiones.
+class AlmacenMediciones:
+    def __init__(self, al_invalidar=None):
+        self.al_invalidar = al_invalidar
+        self._pacientes = {}
+        self._lock = threading.Lock()
+        self.filas_leidas = 0
+        self.recargas = 0
+
+    def _revision(self, conn, id_paciente):
+        fila = conn.execute(
+            "SELECT revision FROM mediciones_revisiones WHERE id_paciente = ?", (id_paciente,)
+        ).fetchone()
+        return fila[0] if fila else 0
+
+    # Devuelve las mediciones del paciente ordenadas por fecha (desde `desde`, si se indica),
+    # leyendo solo las filas nuevas.
+    def obtener(self, conn, id_paciente, desde=None):
+        revision = self._revision(conn, id_paciente)
+        with self._lock:
+            estado = self._pacientes.get(id_paciente)
+        if estado is not None and estado['revision'] != revision:
+            self.invalidar(id_paciente)
+            estado = None
+        if estado is not None and estado['desde'] is not None and (desde is None or desde < estado['desde']):
+            estado = None
+
+        if estado is None:
+            desde_carga = desde
+            if desde is None:
+                filas = conn.execute(
+                    f"SELECT {', '.join(COLUMNAS)} FROM mediciones WHERE id_paciente = ? ORDER BY fecha, id",
+                    (id_paciente,),
+                ).fetchall()
+                ultimo_id = max((fila[0] for fila in filas), default=-1)
+            else:
+                # Las filas nuevas se detectan por id, así que se fija el último id antes de leer la
+                # ventana: aunque la ventana esté vacía, las lecturas siguientes no recorren la historia.
+                ultimo_id = conn.execute("SELECT COALESCE(MAX(id), -1) FROM mediciones").fetchone()[0]
+                filas = conn.execute(
+                    f"SELECT {', '.join(COLUMNAS)} FROM mediciones "
+                    "WHERE id_paciente = ? AND fecha >= ? AND id <= ? ORDER BY fecha, id",
+                    (id_paciente, desde.strftime('%Y-%m-%d %H:%M:%S'), ultimo_id),
+                ).fetchall()
+        else:
+            desde_carga = estado['desde']
+            ultimo_id = estado['ultimo_id']
+            # El '+' evita el índice por paciente para recorrer solo el rango de ids nuevos;
+            # las filas nuevas se ordenan por fecha después, en pandas.
+            filas = conn.execute(
+                f"SELECT {', '.join(COLUMNAS)} FROM mediciones WHERE +id_paciente = ? AND id > ? ORDER BY id",
+                (id_paciente, ultimo_id),
+            ).fetchall()
+        self.filas_leidas += len(filas)
+        if estado is not None and not filas:
+            return self._recortar(estado['df'], desde)
+
+        nuevas = tipar_mediciones(filas)
+        if estado is None:
+            self.recargas += 1
+            df = nuevas
+        else:
+            anterior = estado['df']
+            nuevas = nuevas.sort_values(['Fecha', 'id'], kind='stable', ignore_index=True)
+            df = pd.concat([anterior, nuevas], ignore_index=True)
+            # Una medición registrada con fecha anterior a la última obliga a reordenar.
+            if not anterior.empty and nuevas['Fecha'].iloc[0] < anterior['Fecha'].iloc[-1]:
+                df = df.sort_values(['Fecha', 'id'], kind='stable', ignore_index=True)
+
+        with self._lock:
+            self._pacientes[id_paciente] = {
+                'df': df,
+                'ultimo_id': max(int(df['id'].max()), ultimo_id) if not df.empty else ultimo_id,
+                'revision': revision,
+                'desde': desde_carga,
+            }
+        return self._recortar(df, desde)
+
+    # Filas a partir de `desde` de un DataFrame ordenado por fecha, sin copiar si ya empieza ahí.
+    @staticmethod
+    def _recortar(df, desde):
+        if desde is None or df.empty:
+            return df
+        inicio = df['Fecha'].searchsorted(pd.Timestamp(desde))
+        return df if inicio == 0 else df.iloc[inicio:].reset_index(drop=True)
+
+    # Descarta la caché de un paciente; la próxima consulta recarga su historia.
+    def invalidar(self, id_paciente):
+        with self._lock:
+            self._pacientes.pop(id_paciente, None)
+        if self.al_invalidar is not None:
+            self.al_invalidar(id_paciente)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'pacientes': len(self._pacientes),
+                'filas_en_cache': sum(len(e['df']) for e in self._pacientes.values()),
+                'filas_leidas': self.filas_leidas,
+                'recargas': self.recargas,
+            }
+
+# Función para obtener una marca de versión de los datos de pacientes y mediciones.
+# Cambia con cada medición nueva, edición o eliminación (vía mediciones_revisiones) y con cada
+# alta o baja de pacientes y con cada episodio de parto que se finaliza o se reabre; sirve para
+# detectar cambios con una sola consulta barata.
+def version_datos(conn):
+    return conn.execute("""
+        SELECT (SELECT MAX(id) FROM mediciones),
+               (SELECT COALESCE(SUM(revision), 0) FROM mediciones_revisiones),
+               (SELECT COUNT(*) FROM pacientes),
+               (SELECT MAX(rowid) FROM pacientes),
+               (SELECT COUNT(*) FROM pacientes WHERE estado_episodio = 'finalizado')
+    """).fetchone()
@@ -0,0 +1,375 @@
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from contracciones_ctg import ContadorContracciones
+from trazas_ctg import FORMATO_FECHA, leer_traza
+
+# Análisis de la frecuencia cardíaca fetal (FCF) de las trazas de trazas_ctg.py, con las
+# definiciones habituales de la lectura de una cardiotocografía:
+# - épocas de 1/16 de minuto (3,75 s), promediadas, como en el análisis de Dawes-Redman;
+# - línea de base: media de los últimos VENTANA_LINEA_BASE_MIN minutos, sin las épocas que se
+#   apartan más de DESVIO_LINEA_BASE_LPM de una primera estimación (aceleraciones y
+#   desaceleraciones);
+# - variabilidad de corto plazo (VCP): diferencia media, en ms, entre los intervalos de pulso de
+#   épocas consecutivas; amplitud: máximo menos mínimo de las épocas de cada minuto;
+# - aceleración (desaceleración): ascenso (descenso) respecto de la línea de base que llega a
+#   UMBRAL_EVENTO_LPM y dura al menos DURACION_EVENTO_S.
+# Todo se calcula con sumas acumuladas y reduceat sobre la traza completa, en tiempo lineal.
+EPOCAS_POR_MINUTO = 16
+SEGUNDOS_EPOCA = 60 / EPOCAS_POR_MINUTO
+VENTANA_LINEA_BASE_MIN = 10
+# Minutos con señal que necesita la ventana para estimar la línea de base.
+MINIMO_LINEA_BASE_MIN = 2
+DESVIO_LINEA_BASE_LPM = 10
+UMBRAL_EVENTO_LPM = 15
+# Un evento empieza y termina donde la FCF cruza este desvío respecto de la línea de base.
+BORDE_EVENTO_LPM = 5
+DURACION_EVENTO_S = 15
+# Valores de FCF fuera de este rango se consideran artefactos (doble conteo, FC materna).
+RANGO_VALIDO_LPM = (50, 210)
+# Fracción de muestras válidas que necesita una época para tener valor.
+FRACCION_EPOCA_VALIDA = 0.5
+
+# Minutos ya analizados que se vuelven a calcular en cada pasada: un evento que seguía en curso
+# al final de la pasada anterior se cuenta con su duración completa.
+MARGEN_MINUTOS = 3
+# Cada cuántos segundos analiza el servicio las trazas nuevas.
+INTERVALO_ANALISIS_S = 30
+# Minutos de resumen que usa el diagnóstico: VCP media y eventos de la última media hora.
+VENTANA_DIAGNOSTICO_MIN = 30
+# Distancia máxima entre una medición y el último minuto analizado para usar su resumen.
+TOLERANCIA_RESUMEN_MIN = 15
+
+COLUMNAS_ANALISIS = ['linea_base', 'vcp_ms', 'amplitud_lpm', 'aceleraciones', 'desaceleraciones', 'calidad']
+
+SQL_GUARDAR = (
+    f"INSERT OR REPLACE INTO analisis_ctg (id_paciente, minuto, {', '.join(COLUMNAS_ANALISIS)}) "
+    f"VALUES (?, ?, {', '.join('?' for _ in COLUMNAS_ANALISIS)})"
+)
+# Pacientes activas cuya traza de FCF tiene al menos un minuto completo después del último
+# minuto analizado; el final de la traza sale del último bloque.
+SQL_PENDIENTES = """
+SELECT id, ultimo_minuto FROM (
+    SELECT p.id,
+           (SELECT MAX(minuto) FROM analisis_ctg a WHERE a.id_paciente = p.id) AS ultimo_minuto,
+           (SELECT datetime(inicio, '+' || CAST(n_muestras / frecuencia_hz AS INTEGER) || ' seconds')
+            FROM trazas_ctg t WHERE t.id_paciente = p.id AND t.senal = 'fcf'
+            ORDER BY inicio DESC LIMIT 1) AS fin_traza
+    FROM pacientes p
+    WHERE p.estado_episodio = 'activo'
+)
+WHERE fin_traza IS NOT NULL AND (ultimo_minuto IS NULL OR fin_traza >= datetime(ultimo_minuto, '+2 minutes'))
+"""
+SQL_RESUMEN = f"""
+SELECT minuto, {', '.join(COLUMNAS_ANALISIS)} FROM analisis_ctg
+WHERE id_paciente = ? AND minuto >= ? AND minuto < ?
+ORDER BY minuto
+"""
+
+# Promedio de una serie sobre los últimos `ventana` valores (incluido el actual), ignorando los
+# NaN; NaN donde hay menos de `minimo` valores. Con sumas acumuladas, en tiempo lineal.
+def _media_movil(valores, ventana, minimo):
+    validos = np.isfinite(valores)
+    sumas = np.concatenate([[0.0], np.cumsum(np.where(validos, valores, 0.0))])
+    cuentas = np.concatenate([[0], np.cumsum(validos)])
+    fin = np.arange(1, len(valores) + 1)
+    inicio = np.maximum(0, fin - ventana)
+    cuenta = cuentas[fin] - cuentas[inicio]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(cuenta >= minimo, (sumas[fin] - sumas[inicio]) / cuenta, np.nan)
+
+# Promedio de cada minuto (filas de EPOCAS_POR_MINUTO épocas) ignorando los NaN, sin avisos
+# por minutos vacíos.
+def _media_por_minuto(valores):
+    validos = np.isfinite(valores)
+    cuenta = validos.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(cuenta > 0, np.where(validos, valores, 0.0).sum(axis=1) / cuenta, np.nan)
+
+# Épocas de una traza: promedio de las muestras válidas de cada 1/16 de minuto (NaN si hay
+# menos de FRACCION_EPOCA_VALIDA) y fracción de muestras válidas de cada minuto. Solo se
+# consideran los minutos completos.
+def _epocas(muestras, frecuencia_hz):
+    por_minuto = 60 * frecuencia_hz
+    n_minutos = int(len(muestras) // por_minuto)
+    valores = np.asarray(muestras[:int(round(n_minutos * por_minuto))], dtype='float64')
+    if n_minutos == 0:
+        return np.empty(0), np.empty(0)
+    validas = np.isfinite(valores) & (valores >= RANGO_VALIDO_LPM[0]) & (valores <= RANGO_VALIDO_LPM[1])
+    bordes = np.rint(np.arange(n_minutos * EPOCAS_POR_MINUTO) * por_minuto / EPOCAS_POR_MINUTO).astype(np.int64)
+    sumas = np.add.reduceat(np.where(validas, valores, 0.0), bordes)
+    cuentas = np.add.reduceat(validas.astype(np.int64), bordes)
+    largos = np.diff(np.append(bordes, len(valores)))
+    epocas = np.where(cuentas >= largos * FRACCION_EPOCA_VALIDA, sumas / np.maximum(cuentas, 1), np.nan)
+    calidad = cuentas.reshape(n_minutos, EPOCAS_POR_MINUTO).sum(axis=1) / largos.reshape(n_minutos, EPOCAS_POR_MINUTO).sum(axis=1)
+    return epocas, calidad
+
+# Eventos de una serie de desvíos respecto de la línea de base (en épocas): tramos donde el
+# desvío supera BORDE_EVENTO_LPM, llega a UMBRAL_EVENTO_LPM y dura DURACION_EVENTO_S.
+# Devuelve (inicios, fines) en épocas, fin exclusivo.
+def _eventos(desvios):
+    dentro = np.nan_to_num(desvios, nan=-np.inf) >= BORDE_EVENTO_LPM
+    cambios = np.diff(np.concatenate([[0], dentro.astype(np.int8), [0]]))
+    inicios = np.flatnonzero(cambios == 1)
+    fines = np.flatnonzero(cambios == -1)
+    if len(inicios) == 0:
+        return inicios, fines
+    picos = np.maximum.reduceat(np.where(dentro, desvios, -np.inf), inicios)
+    validos = (picos >= UMBRAL_EVENTO_LPM) & ((fines - inicios) * SEGUNDOS_EPOCA >= DURACION_EVENTO_S)
+    return inicios[validos], fines[validos]
+
+# Análisis completo de una traza de FCF: épocas, línea de base, variabilidad y eventos.
+def _analizar(muestras, frecuencia_hz):
+    epocas, calidad = _epocas(muestras, frecuencia_hz)
+    ventana = VENTANA_LINEA_BASE_MIN * EPOCAS_POR_MINUTO
+    minimo = MINIMO_LINEA_BASE_MIN * EPOCAS_POR_MINUTO
+    preliminar = _media_movil(epocas, ventana, minimo)
+    with np.errstate(invalid='ignore'):
+        estables = np.where(np.abs(epocas - preliminar) <= DESVIO_LINEA_BASE_LPM, epocas, np.nan)
+    linea_base = _media_movil(estables, ventana, minimo)
+    desvios = epocas - linea_base
+    aceleraciones = _eventos(desvios)
+    desaceleraciones = _eventos(-desvios)
+
+    # La VCP se calcula fuera de los eventos, como en Dawes-Redman.
+    with np.errstate(invalid='ignore', divide='ignore'):
+        intervalos = 60000 / estables
+    diferencias = np.abs(np.diff(intervalos, prepend=np.nan))
+    n_minutos = len(calidad)
+    por_minuto = (n_minutos, EPOCAS_POR_MINUTO)
+    amplitud = np.fmax.reduce(estables.reshape(por_minuto), axis=1) - np.fmin.reduce(estables.reshape(por_minuto), axis=1)
+    return {
+        'eventos': {'aceleraciones': aceleraciones, 'desaceleraciones': desaceleraciones},
+        # Arreglos por minuto, en el orden de COLUMNAS_ANALISIS.
+        'minutos': [
+            # Línea de base al final de cada minuto.
+            linea_base.reshape(por_minuto)[:, -1],
+            _media_por_minuto(diferencias.reshape(por_minuto)),
+            amplitud,
+            # Cada evento se cuenta en el minuto en que empieza.
+            np.bincount(aceleraciones[0] // EPOCAS_POR_MINUTO, minlength=n_minutos),
+            np.bincount(desaceleraciones[0] // EPOCAS_POR_MINUTO, minlength=n_minutos),
+            calidad,
+        ],
+    }
+
+# Función para analizar una traza de FCF (muestras en lpm, NaN sin señal, a frecuencia_hz,
+# empezando al comienzo de un minuto). Devuelve un DataFrame con una fila por minuto completo
+# y las columnas de COLUMNAS_ANALISIS.
+def analizar_fcf(muestras, frecuencia_hz):
+    return pd.DataFrame(dict(zip(COLUMNAS_ANALISIS, _analizar(muestras, frecuencia_hz)['minutos'])))
+
+# Función para detectar las aceleraciones y desaceleraciones de una traza de FCF. Devuelve un
+# diccionario con (inicios, fines) de cada tipo, en índices de muestra.
+def detectar_eventos(muestras, frecuencia_hz):
+    muestras_epoca = 60 * frecuencia_hz / EPOCAS_POR_MINUTO
+    return {
+        tipo: tuple(np.rint(indices * muestras_epoca).astype(np.int64) for indices in eventos)
+        for tipo, eventos in _analizar(muestras, frecuencia_hz)['eventos'].items()
+    }
+
+# Filas de analisis_ctg con los minutos nuevos de la traza de FCF de una paciente. Relee solo
+# desde MARGEN_MINUTOS antes del último minuto guardado, más el contexto que necesita la línea
+# de base. Los minutos sin señal también se guardan (calidad 0), así no se vuelven a leer.
+def _filas_nuevas(conn, id_paciente, ultimo_minuto):
+    desde = desde_lectura = None
+    if ultimo_minuto is not None:
+        desde = datetime.strptime(ultimo_minuto, FORMATO_FECHA) - timedelta(minutes=MARGEN_MINUTOS)
+        # La línea de base de un minuto depende de la estimación preliminar de los diez
+        # anteriores, y esa de los diez previos: con dos ventanas de contexto, los minutos
+        # guardados son iguales a los de analizar la traza completa.
+        desde_lectura = desde - timedelta(minutes=2 * VENTANA_LINEA_BASE_MIN)
+    traza = leer_traza(conn, id_paciente, 'fcf', desde_lectura)
+    if traza is None:
+        return []
+    columnas = _analizar(traza.muestras, traza.frecuencia_hz)['minutos']
+    primero = 0
+    if desde is not None:
+        primero = max(0, int((desde - traza.inicio).total_seconds() // 60))
+    # Listas de Python con None en lugar de NaN, como las espera sqlite3.
+    columnas = [
+        [None if valor != valor else valor for valor in np.round(columna[primero:], 2).tolist()]
+        for columna in columnas
+    ]
+    fechas = [(traza.inicio + timedelta(minutes=primero + i)).strftime(FORMATO_FECHA) for i in range(len(columnas[0]))]
+    return [(id_paciente, fecha, *valores) for fecha, *valores in zip(fechas, *columnas)]
+
+# Función para analizar los minutos nuevos de la traza de FCF de una paciente y guardar su
+# resumen en analisis_ctg. Devuelve el número de minutos guardados.
+def analizar_paciente(pool, id_paciente):
+    with pool.lectura() as conn:
+        ultimo_minuto = conn.execute(
+            "SELECT MAX(minuto) FROM analisis_ctg WHERE id_paciente = ?", (id_paciente,)
+        ).fetchone()[0]
+        filas = _filas_nuevas(conn, id_paciente, ultimo_minuto)
+    if filas:
+        pool.escribir(lambda conn: conn.executemany(SQL_GUARDAR, filas))
+    return len(filas)
+
+# Función para analizar las trazas nuevas de todas las pacientes activas: se leen con una sola
+# conexión y todos los minutos se guardan en una sola escritura.
+# Devuelve el número de pacientes y de minutos analizados.
+def analizar_sala(pool):
+    with pool.lectura() as conn:
+        pendientes = conn.execute(SQL_PENDIENTES).fetchall()
+        filas = [fila for id_paciente, ultimo in pendientes for fila in _filas_nuevas(conn, id_paciente, ultimo)]
+    if filas:
+        pool.escribir(lambda conn: conn.executemany(SQL_GUARDAR, filas))
+    return len(pendientes), len(filas)
+
+# Función para leer el resumen por minuto de una paciente entre dos fechas (datetime).
+def leer_resumen(conn, id_paciente, desde, hasta):
+    resumen = pd.read_sql_query(SQL_RESUMEN, conn, params=(
+        id_paciente, desde.strftime(FORMATO_FECHA), hasta.strftime(FORMATO_FECHA)
+    ))
+    resumen['minuto'] = pd.to_datetime(resumen['minuto'])
+    return resumen
+
+# Función para agregar a un DataFrame de mediciones (columna Fecha) el resumen de la
+# cardiotocografía al momento de cada medición: línea de base del último minuto analizado,
+# VCP media y aceleraciones y desaceleraciones de los VENTANA_DIAGNOSTICO_MIN minutos previos.
+# Las mediciones sin traza reciente quedan con NaN, y el diagnóstico usa solo sus valores
+# puntuales (ver diagnostico.evaluar_reglas).
+def unir_resumen_ctg(conn, id_paciente, mediciones_df):
+    fechas = mediciones_df['Fecha'].dropna()
+    if fechas.empty:
+        return mediciones_df
+    desde = fechas.min() - timedelta(minutes=VENTANA_DIAGNOSTICO_MIN + TOLERANCIA_RESUMEN_MIN)
+    resumen = leer_resumen(conn, id_paciente, desde, fechas.max() + timedelta(minutes=1))
+    if resumen.empty:
+        return mediciones_df
+    ventana = resumen.set_index('minuto').rolling(f'{VENTANA_DIAGNOSTICO_MIN}min')
+    columnas = {
+        'linea_base_fcf': resumen['linea_base'].to_numpy(dtype='float64'),
+        'vcp_ms': ventana['vcp_ms'].mean().to_numpy(),
+        'aceleraciones_ctg': ventana['aceleraciones'].sum().to_numpy(),
+        'desaceleraciones_ctg': ventana['desaceleraciones'].sum().to_numpy(),
+    }
+    # Cada medición toma el último minuto analizado que terminó antes que ella.
+    finales = (resumen['minuto'] + timedelta(minutes=1)).to_numpy(dtype='datetime64[ns]')
+    momentos = mediciones_df['Fecha'].to_numpy(dtype='datetime64[ns]')
+    posiciones = np.searchsorted(finales, momentos, side='right') - 1
+    cercanas = (
+        (posiciones >= 0) & ~np.isnat(momentos)
+        & (momentos - finales[posiciones.clip(0)] <= np.timedelta64(TOLERANCIA_RESUMEN_MIN, 'm'))
+    )
+    return mediciones_df.assign(**{
+        columna: np.where(cercanas, valores[posiciones.clip(0)], np.nan) for columna, valores in columnas.items()
+    })
+
+# Resumen de la cardiotocografía de los últimos VENTANA_DIAGNOSTICO_MIN minutos de cada paciente
+# activa, con las mismas columnas que unir_resumen_ctg; cada paciente se lee por el rango de la
+# clave primaria (id_paciente, minuto). linea_base_fcf es la del último minuto (SQLite toma las
+# columnas sueltas de la fila del MAX).
+SQL_RESUMEN_SALA = """
+SELECT a.id_paciente, MAX(a.minuto) AS minuto_ctg, a.linea_base AS linea_base_fcf, AVG(a.vcp_ms) AS vcp_ms,
+       SUM(a.aceleraciones) AS aceleraciones_ctg, SUM(a.desaceleraciones) AS desaceleraciones_ctg
+FROM pacientes p
+JOIN analisis_ctg a ON a.id_paciente = p.id AND a.minuto >= ?
+WHERE p.estado_episodio = 'activo'
+GROUP BY a.id_paciente
+"""
+
+# Función para leer el resumen actual de la cardiotocografía de toda la sala (para el triage).
+def resumen_sala(conn, ahora=None):
+    desde = (ahora or datetime.now()) - timedelta(minutes=VENTANA_DIAGNOSTICO_MIN)
+    return pd.read_sql_query(SQL_RESUMEN_SALA, conn, params=(desde.strftime(FORMATO_FECHA),))
+
+# Servicio de análisis en segundo plano: cada intervalo_s segundos analiza las trazas nuevas de
+# la sala (analizar_sala) y cuenta las contracciones de la tocografía nueva, con las que completa
+# las mediciones sin contracciones anotadas (ver contracciones_ctg.py). Uno por proceso, como el
+# planificador.
+class AnalizadorCTG:
+    def __init__(self, pool, intervalo_s=INTERVALO_ANALISIS_S):
+        self.pool = pool
+        self.intervalo_s = intervalo_s
+        self.pasadas = 0
+        self.pacientes_analizados = 0
+        self.minutos_analizados = 0
+        self.contador = ContadorContracciones(pool)
+        self.contracciones_detectadas = 0
+        self.mediciones_completadas = 0
+        self.errores = 0
+        self.ultima_pasada_ms = None
+        self._detener = threading.Event()
+        self._hilo = None
+
+    # Una pasada del análisis. Devuelve (pacientes, minutos) analizados.
+    def ciclo(self):
+        inicio = time.perf_counter()
+        pacientes, minutos = analizar_sala(self.pool)
+        _, contracciones, completadas = self.contador.procesar_sala()
+        self.ultima_pasada_ms = round((time.perf_counter() - inicio) * 1000, 2)
+        self.pasadas += 1
+        self.pacientes_analizados += pacientes
+        self.minutos_analizados += minutos
+        self.contracciones_detectadas += contracciones
+        self.mediciones_completadas += completadas
+        return pacientes, minutos
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                self.ciclo()
+            except Exception:
+                # Un error puntual (por ejemplo, la base ocupada) no debe detener el análisis.
+                self.errores += 1
+            self._detener.wait(self.intervalo_s)
+
+    def iniciar(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle, name='analizador-ctg', daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    def metricas(self):
+        return {
+            'pasadas': self.pasadas,
+            'pacientes_analizados': self.pacientes_analizados,
+            'minutos_analizados': self.minutos_analizados,
+            'contracciones_detectadas': self.contracciones_detectadas,
+            'mediciones_completadas': self.mediciones_completadas,
+            'ultima_pasada_ms': self.ultima_pasada_ms,
+            'errores': self.errores,
+        }
+
+# Uso: python analisis_ctg.py [--bd partoseguro.db] [--cada 30] [--una-vez]
+# Corre el análisis como proceso independiente.
+def main():
+    from conexiones import obtener_pool
+
+    parser = argparse.ArgumentParser(description="Analiza las cardiotocografías nuevas de la sala.")
+    parser.add_argument('--bd', default='partoseguro.db', help="Base de datos (por defecto: partoseguro.db)")
+    parser.add_argument('--cada', type=float, default=INTERVALO_ANALISIS_S, help="Segundos entre pasadas")
+    parser.add_argument('--una-vez', action='store_true', help="Hace una sola pasada y termina")
+    args = parser.parse_args()
+
+    pool = obtener_pool(args.bd)
+    analizador = AnalizadorCTG(pool, args.cada)
+    try:
+        while True:
+            pacientes, minutos = analizador.ciclo()
+            print(f"{datetime.now():%H:%M:%S} {pacientes} pacientes, {minutos} minutos analizados "
+                  f"({analizador.ultima_pasada_ms} ms)")
+            if args.una_vez:
+                break
+            time.sleep(args.cada)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.cerrar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,311 @@
+import argparse
+import os
+import sqlite3
+import time
+import urllib.parse
+from contextlib import closing, contextmanager
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from busqueda import reconstruir_indice
+
+# Base de datos de archivo, con los episodios de parto ya cerrados.
+RUTA_ARCHIVO = 'partoseguro_archivo.db'
+# Horas que un episodio finalizado sigue en la base viva (revisión del puerperio inmediato).
+HORAS_RETENCION = 24
+# Episodios que se mueven por transacción: cada lote bloquea la escritura solo un momento.
+TAMANO_LOTE = 200
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+COLUMNAS_PACIENTES = ['id', 'nombre', 'edad', 'fum', 'patologia', 'estado_episodio', 'fecha_finalizacion']
+COLUMNAS_MEDICIONES = [
+    'id', 'id_paciente', 'fecha', 'dilatacion', 'frecuencia_cardiaca', 'contracciones',
+    'presion_arterial', 'sistolica', 'diastolica',
+]
+COLUMNAS_ALERTAS = ['id', 'id_paciente', 'tipo', 'vence', 'emitida', 'resuelta']
+COLUMNAS_TRAZAS = ['id_paciente', 'senal', 'inicio', 'frecuencia_hz', 'n_muestras', 'version', 'datos']
+
+# Esquema de la base de archivo: las mismas columnas que la base viva, sin triggers ni tablas
+# derivadas; las mediciones y alertas conservan su id original y las trazas de cardiotocografía
+# se copian con sus bloques comprimidos tal cual. Cada episodio se identifica por
+# (id, fecha_finalizacion): los ids son números de documento y vuelven con un embarazo posterior,
+# así que las mediciones y alertas guardan la fecha_finalizacion de su episodio.
+ESQUEMA_ARCHIVO = [
+    """
+    CREATE TABLE IF NOT EXISTS archivo.pacientes (
+        id TEXT,
+        nombre TEXT,
+        edad INTEGER,
+        fum DATE,
+        patologia TEXT,
+        estado_episodio TEXT,
+        fecha_finalizacion TIMESTAMP,
+        fecha_archivo TIMESTAMP,
+        PRIMARY KEY (id, fecha_finalizacion)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS archivo.mediciones (
+        id INTEGER PRIMARY KEY,
+        id_paciente TEXT,
+        fecha TIMESTAMP,
+        dilatacion INTEGER,
+        frecuencia_cardiaca INTEGER,
+        contracciones INTEGER,
+        presion_arterial TEXT,
+        sistolica INTEGER,
+        diastolica INTEGER,
+        fecha_finalizacion TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS archivo.alertas (
+        id INTEGER PRIMARY KEY,
+        id_paciente TEXT,
+        tipo TEXT,
+        vence TIMESTAMP,
+        emitida TIMESTAMP,
+        resuelta TIMESTAMP,
+        fecha_finalizacion TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS archivo.trazas_ctg (
+        id_paciente TEXT,
+        senal TEXT,
+        inicio TIMESTAMP,
+        frecuencia_hz REAL,
+        n_muestras INTEGER,
+        version INTEGER,
+        datos BLOB,
+        PRIMARY KEY (id_paciente, senal, inicio)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archivo.idx_mediciones_paciente_fecha ON mediciones (id_paciente, fecha)",
+    "CREATE INDEX IF NOT EXISTS archivo.idx_alertas_paciente ON alertas (id_paciente)",
+]
+# Versión del esquema de archivo (PRAGMA archivo.user_version) que crea ESQUEMA_ARCHIVO.
+VERSION_ARCHIVO = 1
+# Paso de un archivo de la versión 0 (pacientes con clave id, donde un episodio posterior
+# reemplazaba al anterior) a la 1: cada medición y alerta toma la fecha_finalizacion de la fila de
+# su paciente. Lo que la versión 0 ya reemplazó no se puede recuperar.
+ACTUALIZAR_ARCHIVO_V0 = [
+    "DROP INDEX IF EXISTS archivo.idx_mediciones_paciente_fecha",
+    "DROP INDEX IF EXISTS archivo.idx_alertas_paciente",
+    "ALTER TABLE archivo.pacientes RENAME TO pacientes_v0",
+    "ALTER TABLE archivo.mediciones RENAME TO mediciones_v0",
+    "ALTER TABLE archivo.alertas RENAME TO alertas_v0",
+    *ESQUEMA_ARCHIVO,
+    "INSERT INTO archivo.pacientes SELECT * FROM archivo.pacientes_v0",
+    f"INSERT INTO archivo.mediciones SELECT {', '.join('m.' + c for c in COLUMNAS_MEDICIONES)}, p.fecha_finalizacion "
+    f"FROM archivo.mediciones_v0 m LEFT JOIN archivo.pacientes_v0 p ON p.id = m.id_paciente",
+    f"INSERT INTO archivo.alertas SELECT {', '.join('a.' + c for c in COLUMNAS_ALERTAS)}, p.fecha_finalizacion "
+    f"FROM archivo.alertas_v0 a LEFT JOIN archivo.pacientes_v0 p ON p.id = a.id_paciente",
+    "DROP TABLE archivo.pacientes_v0",
+    "DROP TABLE archivo.mediciones_v0",
+    "DROP TABLE archivo.alertas_v0",
+]
+
+_EN_LOTE = "(SELECT id_paciente FROM episodios_archivando)"
+_EPISODIO = "(SELECT fecha_finalizacion FROM main.pacientes p WHERE p.id = t.id_paciente)"
+
+# Sentencias de un lote, una vez elegidos los episodios en episodios_archivando. Primero se
+# copian al archivo y después se borran de la base viva, de las tablas hijas a pacientes.
+# Con la base viva en modo WAL, SQLite confirma cada archivo por separado: si el proceso cae
+# entre los dos, el lote queda copiado y sigue en la base viva, y al repetirlo INSERT OR REPLACE
+# vuelve a escribir las mismas filas (la clave incluye la fecha_finalizacion del episodio, así
+# que nunca reemplaza a un episodio anterior de la misma paciente). Nunca se pierden episodios.
+SQL_COPIAR_LOTE = [
+    f"INSERT OR REPLACE INTO archivo.pacientes ({', '.join(COLUMNAS_PACIENTES)}, fecha_archivo) "
+    f"SELECT {', '.join(COLUMNAS_PACIENTES)}, ? FROM main.pacientes WHERE id IN {_EN_LOTE}",
+    f"INSERT OR REPLACE INTO archivo.mediciones ({', '.join(COLUMNAS_MEDICIONES)}, fecha_finalizacion) "
+    f"SELECT {', '.join(COLUMNAS_MEDICIONES)}, {_EPISODIO} FROM main.mediciones t WHERE id_paciente IN {_EN_LOTE}",
+    f"INSERT OR REPLACE INTO archivo.alertas ({', '.join(COLUMNAS_ALERTAS)}, fecha_finalizacion) "
+    f"SELECT {', '.join(COLUMNAS_ALERTAS)}, {_EPISODIO} FROM main.alertas t WHERE id_paciente IN {_EN_LOTE}",
+    f"INSERT OR REPLACE INTO archivo.trazas_ctg ({', '.join(COLUMNAS_TRAZAS)}) "
+    f"SELECT {', '.join(COLUMNAS_TRAZAS)} FROM main.trazas_ctg WHERE id_paciente IN {_EN_LOTE}",
+]
+SQL_BORRAR_LOTE = [
+    f"DELETE FROM main.alertas WHERE id_paciente IN {_EN_LOTE}",
+    f"DELETE FROM main.intervalos_medicion WHERE id_paciente IN {_EN_LOTE}",
+    f"DELETE FROM main.trazas_ctg WHERE id_paciente IN {_EN_LOTE}",
+    f"DELETE FROM main.analisis_ctg WHERE id_paciente IN {_EN_LOTE}",
+    f"DELETE FROM main.contracciones_ctg WHERE id_paciente IN {_EN_LOTE}",
+    # Los triggers de borrado de mediciones no recalculan nada para los episodios del lote
+    # (ver la migración 8 de esquema.py); su estado y sus revisiones se borran aquí.
+    f"DELETE FROM main.mediciones WHERE id_paciente IN {_EN_LOTE}",
+    f"DELETE FROM main.estado_paciente WHERE id_paciente IN {_EN_LOTE}",
+    f"DELETE FROM main.mediciones_revisiones WHERE id_paciente IN {_EN_LOTE}",
+    f"DELETE FROM main.pacientes WHERE id IN {_EN_LOTE}",
+    "DELETE FROM main.episodios_archivando",
+]
+
+SQL_ELEGIR_LOTE = """
+INSERT INTO main.episodios_archivando (id_paciente)
+SELECT id FROM main.pacientes
+WHERE estado_episodio = 'finalizado' AND fecha_finalizacion <= ?
+ORDER BY fecha_finalizacion
+LIMIT ?
+"""
+
+# Función para cerrar el episodio de parto de una paciente (parto registrado). La paciente deja
+# de aparecer en el tablero y el planificador, y se archiva pasadas HORAS_RETENCION horas.
+def finalizar_episodio(pool, id_paciente, fecha=None):
+    fecha = (fecha or datetime.now()).strftime(FORMATO_FECHA)
+    pool.escribir(
+        "UPDATE pacientes SET estado_episodio = 'finalizado', fecha_finalizacion = ? WHERE id = ?",
+        (fecha, id_paciente),
+    )
+
+# Función para volver a abrir un episodio finalizado por error (antes de archivarlo).
+def reabrir_episodio(pool, id_paciente):
+    pool.escribir(
+        "UPDATE pacientes SET estado_episodio = 'activo', fecha_finalizacion = NULL WHERE id = ?", (id_paciente,)
+    )
+
+# Crea el esquema del archivo adjunto o lo actualiza a VERSION_ARCHIVO, en una transacción y
+# volviendo a leer la versión dentro de ella, como esquema.aplicar_migraciones.
+def _preparar_archivo(conn):
+    if conn.execute("PRAGMA archivo.user_version").fetchone()[0] >= VERSION_ARCHIVO:
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("PRAGMA archivo.user_version").fetchone()[0] < VERSION_ARCHIVO:
+            existe = conn.execute("SELECT 1 FROM archivo.sqlite_master WHERE name = 'pacientes'").fetchone()
+            for sql in ACTUALIZAR_ARCHIVO_V0 if existe else ESQUEMA_ARCHIVO:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA archivo.user_version = {VERSION_ARCHIVO:d}")
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+# Función para mover a la base de archivo los episodios finalizados hace más de horas_retencion
+# horas, con sus mediciones y alertas, en lotes de tamano_lote episodios (una transacción por
+# lote). Con vacuum=True compacta después la base viva y reconstruye el índice de búsqueda.
+# Devuelve un resumen con conteos y tiempos.
+def archivar_episodios(pool, ruta_archivo=RUTA_ARCHIVO, horas_retencion=HORAS_RETENCION,
+                       tamano_lote=TAMANO_LOTE, vacuum=False, ahora=None):
+    inicio = time.perf_counter()
+    ahora = ahora or datetime.now()
+    limite = (ahora - timedelta(hours=horas_retencion)).strftime(FORMATO_FECHA)
+    episodios = mediciones = lotes = 0
+
+    # ATTACH y DETACH no pueden correr dentro de una transacción; entre lotes la conexión de
+    # escritura queda libre para el resto de las sesiones.
+    with pool.escritura() as conn:
+        conn.execute("ATTACH DATABASE ? AS archivo", (ruta_archivo,))
+        conn.execute("PRAGMA archivo.journal_mode = WAL")
+        _preparar_archivo(conn)
+    try:
+        while True:
+            with pool.escritura() as conn:
+                elegidos = conn.execute(SQL_ELEGIR_LOTE, (limite, tamano_lote)).rowcount
+                if not elegidos:
+                    break
+                conn.execute(SQL_COPIAR_LOTE[0], (ahora.strftime(FORMATO_FECHA),))
+                mediciones += conn.execute(SQL_COPIAR_LOTE[1]).rowcount
+                for sql in SQL_COPIAR_LOTE[2:] + SQL_BORRAR_LOTE:
+                    conn.execute(sql)
+            episodios += elegidos
+            lotes += 1
+    finally:
+        with pool.escritura() as conn:
+            conn.execute("DETACH DATABASE archivo")
+    fin_archivo = time.perf_counter()
+
+    # VACUUM puede cambiar los rowid de pacientes, que son la clave del índice de búsqueda: el
+    # índice se vacía antes (así sus páginas viejas no quedan libres dentro del archivo) y se
+    # reconstruye después, ya solo con las pacientes de la base viva.
+    if vacuum and episodios:
+        with pool.escritura() as conn:
+            conn.execute("INSERT INTO pacientes_busqueda (pacientes_busqueda) VALUES ('delete-all')")
+        with pool.escritura() as conn:
+            conn.execute("VACUUM main")
+            reconstruir_indice(conn)
+        # En modo WAL, VACUUM escribe en el WAL: el archivo se achica al hacer el checkpoint.
+        with pool.escritura() as conn:
+            conn.execute("PRAGMA main.wal_checkpoint(TRUNCATE)")
+
+    return {
+        'episodios': episodios,
+        'mediciones': mediciones,
+        'lotes': lotes,
+        'archivo_s': round(fin_archivo - inicio, 3),
+        'vacuum_s': round(time.perf_counter() - fin_archivo, 3),
+        'episodios_por_segundo': round(episodios / (fin_archivo - inicio)) if episodios else 0,
+    }
+
+def _uri_solo_lectura(ruta):
+    return f"file:{urllib.parse.quote(os.path.abspath(ruta))}?mode=ro"
+
+# Conexión de solo lectura para consultas históricas sobre las dos bases: la viva como main y
+# el archivo adjunto (ATTACH) como archivo. Las vistas temporales historico_pacientes y
+# historico_mediciones unen ambas con una columna origen ('viva' o 'archivo'); SQLite lleva los
+# filtros a cada rama de la unión, así que una búsqueda por paciente usa los índices de ambas.
+@contextmanager
+def lectura_historica(ruta='partoseguro.db', ruta_archivo=RUTA_ARCHIVO):
+    with closing(sqlite3.connect(_uri_solo_lectura(ruta), uri=True)) as conn:
+        ramas_pacientes = [f"SELECT {', '.join(COLUMNAS_PACIENTES)}, 'viva' AS origen FROM main.pacientes"]
+        ramas_mediciones = [
+            f"SELECT {', '.join(COLUMNAS_MEDICIONES)}, {_EPISODIO} AS fecha_finalizacion, 'viva' AS origen FROM main.mediciones t"
+        ]
+        if os.path.exists(ruta_archivo):
+            conn.execute("ATTACH DATABASE ? AS archivo", (_uri_solo_lectura(ruta_archivo),))
+            if conn.execute("PRAGMA archivo.user_version").fetchone()[0] >= VERSION_ARCHIVO:
+                ramas_pacientes.append(f"SELECT {', '.join(COLUMNAS_PACIENTES)}, 'archivo' FROM archivo.pacientes")
+                ramas_mediciones.append(
+                    f"SELECT {', '.join(COLUMNAS_MEDICIONES)}, fecha_finalizacion, 'archivo' FROM archivo.mediciones"
+                )
+            elif conn.execute("SELECT 1 FROM archivo.sqlite_master WHERE name = 'pacientes'").fetchone():
+                # Archivo de la versión 0, que se actualiza la próxima vez que se archive: el
+                # episodio de cada medición sale de la fila de su paciente, como al actualizarlo.
+                ramas_pacientes.append(f"SELECT {', '.join(COLUMNAS_PACIENTES)}, 'archivo' FROM archivo.pacientes")
+                ramas_mediciones.append(
+                    f"SELECT {', '.join('m.' + c for c in COLUMNAS_MEDICIONES)}, p.fecha_finalizacion, 'archivo' "
+                    f"FROM archivo.mediciones m LEFT JOIN archivo.pacientes p ON p.id = m.id_paciente"
+                )
+        conn.execute(f"CREATE TEMP VIEW historico_pacientes AS {' UNION ALL '.join(ramas_pacientes)}")
+        conn.execute(f"CREATE TEMP VIEW historico_mediciones AS {' UNION ALL '.join(ramas_mediciones)}")
+        yield conn
+
+# Función para leer la historia completa de una paciente, esté en la base viva o en el archivo.
+# Devuelve (episodios, mediciones) como DataFrames, ambos vacíos si no existe: una fila por
+# episodio (el de la base viva primero y después los archivados, del más reciente al más antiguo)
+# y las mediciones de todos, con la fecha_finalizacion del episodio al que pertenecen.
+def historia_paciente(conn, id_paciente):
+    paciente = pd.read_sql_query(
+        "SELECT * FROM historico_pacientes WHERE id = ? ORDER BY origen = 'viva' DESC, fecha_finalizacion DESC",
+        conn, params=(id_paciente,),
+    )
+    mediciones = pd.read_sql_query(
+        "SELECT * FROM historico_mediciones WHERE id_paciente = ? ORDER BY fecha, id", conn, params=(id_paciente,)
+    )
+    return paciente, mediciones
+
+# Uso: python archivo_historico.py [--bd partoseguro.db] [--archivo partoseguro_archivo.db] [--horas 24] [--vacuum]
+# Pensado para correr periódicamente (por ejemplo, con cron cada noche).
+def main():
+    from conexiones import obtener_pool
+
+    parser = argparse.ArgumentParser(description="Mueve los episodios de parto finalizados a la base de archivo.")
+    parser.add_argument('--bd', default='partoseguro.db', help="Base de datos viva (por defecto: partoseguro.db)")
+    parser.add_argument('--archivo', default=RUTA_ARCHIVO, help=f"Base de datos de archivo (por defecto: {RUTA_ARCHIVO})")
+    parser.add_argument('--horas', type=float, default=HORAS_RETENCION,
+                        help=f"Horas desde la finalización antes de archivar (por defecto: {HORAS_RETENCION})")
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help=f"Episodios por transacción (por defecto: {TAMANO_LOTE})")
+    parser.add_argument('--vacuum', action='store_true', help="Compactar la base viva después de archivar")
+    args = parser.parse_args()
+
+    pool = obtener_pool(args.bd)
+    try:
+        resumen = archivar_episodios(pool, args.archivo, args.horas, args.lote, args.vacuum)
+    finally:
+        pool.cerrar()
+    for clave, valor in resumen.items():
+        print(f"{clave}: {valor}")
+
+
+if __name__ == '__main__':
+    main()
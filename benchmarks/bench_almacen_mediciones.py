@@ -0,0 +1,52 @@
+# Benchmark del almacén incremental de mediciones.
+# Compara la lectura completa original (read_sql_query + to_datetime de toda la historia) con
+# AlmacenMediciones cuando entre dos refrescos llega una sola medición nueva.
+#
+# Uso: python -m benchmarks.bench_almacen_mediciones
+import pandas as pd
+
+from almacen_mediciones import AlmacenMediciones
+from benchmarks.comun import crear_bd_sintetica, cronometrar
+
+HISTORIAS = [50, 500, 5000, 50000]
+
+
+# Lectura original de partoseguro_main.py.
+def lectura_original(conn, id_paciente):
+    df = pd.read_sql_query(
+        "SELECT id, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial "
+        "FROM mediciones WHERE id_paciente = ? ORDER BY fecha",
+        conn, params=(id_paciente,),
+    )
+    df['Fecha'] = pd.to_datetime(df['fecha']).dt.tz_localize(None)
+    return df.drop(columns=['fecha'])
+
+
+def main():
+    filas = []
+    for n in HISTORIAS:
+        conn = crear_bd_sintetica(1, n)
+        id_paciente = conn.execute("SELECT id FROM pacientes").fetchone()[0]
+        almacen = AlmacenMediciones()
+        almacen.obtener(conn, id_paciente)
+
+        def refresco_incremental():
+            conn.execute(
+                "INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial) "
+                "VALUES (?, datetime('now'), 5, 140, 4, '120/80')",
+                (id_paciente,),
+            )
+            almacen.obtener(conn, id_paciente)
+
+        filas.append({
+            'mediciones': n,
+            'original_ms': round(cronometrar(lambda: lectura_original(conn, id_paciente)), 3),
+            'incremental_ms': round(cronometrar(refresco_incremental), 3),
+            'sin_cambios_ms': round(cronometrar(lambda: almacen.obtener(conn, id_paciente)), 3),
+        })
+        conn.close()
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+# Benchmark del análisis de cardiotocografías.
+# Sobre trazas sintéticas de varias horas (benchmarks/generador.generar_ctg) mide:
+# - el análisis vectorizado de la traza completa frente a una versión de referencia que recorre
+#   época por época con ventanas deslizantes (costo proporcional a épocas x ventana);
+# - la detección de aceleraciones y desaceleraciones frente a los eventos generados
+#   (sensibilidad y detecciones sin evento, con tolerancia de 30 s) y el error de la línea de base;
+# - una sala de pacientes monitorizadas: la pasada incremental de analizar_sala después de un
+#   minuto de señal nueva por paciente, frente a volver a analizar todas las trazas completas.
+#
+# Uso: python -m benchmarks.bench_analisis_ctg
+import os
+import tempfile
+import time
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from analisis_ctg import (
+    DESVIO_LINEA_BASE_LPM, EPOCAS_POR_MINUTO, MINIMO_LINEA_BASE_MIN, VENTANA_LINEA_BASE_MIN,
+    analizar_fcf, analizar_sala, detectar_eventos,
+)
+from benchmarks.generador import generar_ctg, generar_sala
+from conexiones import PoolConexiones
+from trazas_ctg import agregar_muestras, leer_traza
+
+HORAS = [1, 6, 24, 72]
+FRECUENCIA_HZ = 4
+TOLERANCIA_S = 30
+PACIENTES_SALA = 40
+HORAS_SALA = 6
+REPETICIONES = 3
+
+
+def cronometrar(funcion, repeticiones=REPETICIONES):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return float(np.median(tiempos))
+
+
+# Línea de base de referencia: para cada época, la media de su ventana, con un bucle.
+def linea_base_referencia(muestras):
+    muestras_epoca = 60 * FRECUENCIA_HZ // EPOCAS_POR_MINUTO
+    n = len(muestras) // muestras_epoca
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        epocas = np.array([np.nanmean(muestras[i * muestras_epoca:(i + 1) * muestras_epoca]) for i in range(n)])
+    ventana = VENTANA_LINEA_BASE_MIN * EPOCAS_POR_MINUTO
+    minimo = MINIMO_LINEA_BASE_MIN * EPOCAS_POR_MINUTO
+
+    def media_movil(valores):
+        medias = np.full(n, np.nan)
+        for i in range(n):
+            tramo = valores[max(0, i - ventana + 1):i + 1]
+            tramo = tramo[np.isfinite(tramo)]
+            if len(tramo) >= minimo:
+                medias[i] = tramo.mean()
+        return medias
+
+    preliminar = media_movil(epocas)
+    with np.errstate(invalid='ignore'):
+        return media_movil(np.where(np.abs(epocas - preliminar) <= DESVIO_LINEA_BASE_LPM, epocas, np.nan))
+
+
+# Eventos generados encontrados (inicio detectado a menos de TOLERANCIA_S) y detecciones que
+# no corresponden a ningún evento generado.
+def comparar_eventos(generados, detectados):
+    tolerancia = TOLERANCIA_S * FRECUENCIA_HZ
+    if len(generados) == 0 or len(detectados) == 0:
+        return 0, len(detectados)
+    distancias = np.abs(generados[:, None] - detectados[None, :])
+    encontrados = int((distancias.min(axis=1) <= tolerancia).sum())
+    sin_evento = int((distancias.min(axis=0) > tolerancia).sum())
+    return encontrados, sin_evento
+
+
+def medir_trazas():
+    filas = []
+    for horas in HORAS:
+        ctg = generar_ctg(horas, FRECUENCIA_HZ, semilla=horas)
+        vectorizado = cronometrar(lambda: analizar_fcf(ctg['fcf'], FRECUENCIA_HZ))
+        referencia = cronometrar(lambda: linea_base_referencia(ctg['fcf']), 1)
+        minutos = analizar_fcf(ctg['fcf'], FRECUENCIA_HZ)
+        eventos = detectar_eventos(ctg['fcf'], FRECUENCIA_HZ)
+        aceleraciones = comparar_eventos(ctg['aceleraciones'], eventos['aceleraciones'][0])
+        desaceleraciones = comparar_eventos(ctg['desaceleraciones'], eventos['desaceleraciones'][0])
+        real = ctg['linea_base'][60 * FRECUENCIA_HZ - 1::60 * FRECUENCIA_HZ][:len(minutos)]
+        filas.append({
+            'horas': horas,
+            'muestras': len(ctg['fcf']),
+            'vectorizado_ms': round(vectorizado * 1000, 1),
+            'millones_muestras_s': round(len(ctg['fcf']) / vectorizado / 1e6, 1),
+            'referencia_linea_base_ms': round(referencia * 1000),
+            'aceleraciones': f"{aceleraciones[0]}/{len(ctg['aceleraciones'])} (+{aceleraciones[1]})",
+            'desaceleraciones': f"{desaceleraciones[0]}/{len(ctg['desaceleraciones'])} (+{desaceleraciones[1]})",
+            'error_linea_base_lpm': round(float(np.nanmean(np.abs(minutos['linea_base'].to_numpy() - real))), 2),
+        })
+    return filas
+
+
+def medir_sala():
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'sala.db')
+        generar_sala(ruta, PACIENTES_SALA, 12).close()
+        pool = PoolConexiones(ruta)
+        ids = [str(20000000 + i) for i in range(PACIENTES_SALA)]
+        trazas = {id_paciente: generar_ctg(HORAS_SALA + 1, FRECUENCIA_HZ, semilla=i)['fcf'] for i, id_paciente in enumerate(ids)}
+        inicio = datetime.now().replace(second=0, microsecond=0) - timedelta(hours=HORAS_SALA)
+        muestras_historia = HORAS_SALA * 3600 * FRECUENCIA_HZ
+        for id_paciente in ids:
+            agregar_muestras(pool, id_paciente, 'fcf', inicio, trazas[id_paciente][:muestras_historia], FRECUENCIA_HZ)
+        primera = time.perf_counter()
+        analizar_sala(pool)
+        primera = time.perf_counter() - primera
+
+        pasadas = []
+        por_minuto = 60 * FRECUENCIA_HZ
+        for minuto in range(5):
+            desde = muestras_historia + minuto * por_minuto
+            for id_paciente in ids:
+                agregar_muestras(pool, id_paciente, 'fcf', inicio + timedelta(minutes=HORAS_SALA * 60 + minuto),
+                                 trazas[id_paciente][desde:desde + por_minuto], FRECUENCIA_HZ)
+            comienzo = time.perf_counter()
+            pacientes, minutos = analizar_sala(pool)
+            pasadas.append(time.perf_counter() - comienzo)
+
+        def completo():
+            with pool.lectura() as conn:
+                for id_paciente in ids:
+                    traza = leer_traza(conn, id_paciente, 'fcf')
+                    analizar_fcf(traza.muestras, traza.frecuencia_hz)
+
+        completo_s = cronometrar(completo, 1)
+        pool.cerrar()
+    return {
+        'pacientes': PACIENTES_SALA,
+        'horas_por_traza': HORAS_SALA,
+        'primera_pasada_s': round(primera, 2),
+        'pasada_incremental_ms': round(float(np.median(pasadas)) * 1000, 1),
+        'por_paciente_ms': round(float(np.median(pasadas)) * 1000 / PACIENTES_SALA, 2),
+        'minutos_por_pasada': minutos,
+        'analisis_completo_ms': round(completo_s * 1000, 1),
+    }
+
+
+def main():
+    print(f"Trazas de FCF a {FRECUENCIA_HZ} Hz, {os.cpu_count()} CPU")
+    print(pd.DataFrame(medir_trazas()).to_string(index=False))
+    print()
+    print("Sala monitorizada: un minuto nuevo por paciente y pasada")
+    print(pd.DataFrame([medir_sala()]).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Benchmark del archivo de episodios cerrados.
+# Sobre salas con pocas pacientes en trabajo de parto y muchos episodios ya finalizados, mide
+# las consultas del tablero (censo de pacientes, triage, carga del planificador y marca de
+# versión) y el tamaño de la base viva antes y después de archivar, la velocidad del archivo y
+# la consulta de la historia de una paciente archivada a través de las dos bases (ATTACH).
+#
+# Uso: python -m benchmarks.bench_archivo
+import os
+import tempfile
+
+import pandas as pd
+
+from almacen_mediciones import version_datos
+from archivo_historico import archivar_episodios, historia_paciente, lectura_historica
+from benchmarks.comun import cronometrar
+from benchmarks.generador import generar_sala
+from conexiones import PoolConexiones
+from diagnostico import triage_sala
+from proximas_mediciones import SQL_ULTIMAS_MEDICIONES
+
+PACIENTES = [2000, 10000, 30000]
+PACIENTES_ACTIVAS = 100
+MEDICIONES_POR_PACIENTE = 24
+
+
+def consultas_ms(pool):
+    with pool.lectura() as conn:
+        return {
+            'censo': cronometrar(lambda: conn.execute("SELECT id FROM pacientes").fetchall()),
+            'triage': cronometrar(lambda: triage_sala(conn)),
+            'planificador': cronometrar(lambda: conn.execute(SQL_ULTIMAS_MEDICIONES).fetchall()),
+            'version': cronometrar(lambda: version_datos(conn)),
+        }
+
+
+def main():
+    filas = []
+    with tempfile.TemporaryDirectory() as directorio:
+        for n in PACIENTES:
+            ruta = os.path.join(directorio, f'sala_{n}.db')
+            ruta_archivo = os.path.join(directorio, f'archivo_{n}.db')
+            generar_sala(ruta, n, MEDICIONES_POR_PACIENTE, n_activas=PACIENTES_ACTIVAS).close()
+            pool = PoolConexiones(ruta)
+            antes = consultas_ms(pool)
+            tamano_antes = os.path.getsize(ruta)
+            resumen = archivar_episodios(pool, ruta_archivo, vacuum=True)
+            despues = consultas_ms(pool)
+            with lectura_historica(ruta, ruta_archivo) as conn:
+                historia = cronometrar(lambda: historia_paciente(conn, str(20000000 + n - 1)))
+            pool.cerrar()
+            filas.append({
+                'pacientes': n,
+                **{f'{clave}_antes_ms': round(valor, 2) for clave, valor in antes.items()},
+                **{f'{clave}_despues_ms': round(valor, 2) for clave, valor in despues.items()},
+                'bd_antes_mb': round(tamano_antes / 1e6, 1),
+                'bd_despues_mb': round(os.path.getsize(ruta) / 1e6, 1),
+                'episodios_por_s': resumen['episodios_por_segundo'],
+                'historia_archivada_ms': round(historia, 2),
+            })
+    print(pd.DataFrame(filas).T.to_string(header=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+# Benchmark de la búsqueda de pacientes.
+# Compara lo que cuesta llenar la lista desplegable de la barra lateral con todo el censo
+# (SELECT id FROM pacientes, como antes de la búsqueda) con una búsqueda en el índice FTS5
+# por prefijo de nombre, por ID y solo entre las pacientes activas.
+#
+# Uso: python -m benchmarks.bench_busqueda
+import os
+import tempfile
+
+import pandas as pd
+
+from benchmarks.comun import cronometrar
+from benchmarks.generador import generar_sala
+from busqueda import buscar_pacientes
+
+PACIENTES = [1000, 10000, 50000]
+MEDICIONES_POR_PACIENTE = 4
+
+
+def main():
+    filas = []
+    with tempfile.TemporaryDirectory() as directorio:
+        for n in PACIENTES:
+            conn = generar_sala(os.path.join(directorio, f'sala_{n}.db'), n, MEDICIONES_POR_PACIENTE,
+                                n_activas=max(1, n // 20))
+            id_paciente = conn.execute("SELECT MAX(id) FROM pacientes").fetchone()[0]
+            filas.append({
+                'pacientes': n,
+                'censo_completo_ms': round(cronometrar(
+                    lambda: pd.read_sql_query("SELECT id FROM pacientes", conn)['id'].tolist()), 2),
+                'busqueda_nombre_ms': round(cronometrar(lambda: buscar_pacientes(conn, 'caro')), 2),
+                'busqueda_id_ms': round(cronometrar(lambda: buscar_pacientes(conn, id_paciente[:6])), 2),
+                'busqueda_activas_ms': round(cronometrar(
+                    lambda: buscar_pacientes(conn, 'ana', solo_activos=True)), 2),
+                'sin_texto_ms': round(cronometrar(lambda: buscar_pacientes(conn, '')), 2),
+            })
+            conn.close()
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
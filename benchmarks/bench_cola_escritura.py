@@ -0,0 +1,85 @@
+# Benchmark de la cola de escrituras del pool.
+# Simula varias estaciones (hilos) que registran mediciones a la vez y compara una transacción
+# por escritura (pool.escritura(), como las funciones CRUD antes de la cola) con la cola de
+# escrituras, que confirma juntas las que llegan a la vez (pool.escribir()). Se mide con
+# synchronous=NORMAL, el valor del pool, y con FULL, donde cada commit espera al disco (fsync).
+# Informa escrituras por segundo, latencia por escritura y escrituras por commit.
+#
+# Uso: python -m benchmarks.bench_cola_escritura
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.comun import crear_bd_sintetica
+from conexiones import PoolConexiones
+
+ESTACIONES = 12
+ESCRITURAS_POR_ESTACION = 200
+SINCRONIZACION = ['NORMAL', 'FULL']
+
+ESCRITURA = (
+    "INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial, "
+    "sistolica, diastolica) VALUES (?, datetime('now'), 5, 140, 4, '120/80', 120, 80)"
+)
+
+
+def escribir_en_transaccion(pool, id_paciente):
+    with pool.escritura() as conn:
+        conn.execute(ESCRITURA, (id_paciente,))
+
+
+def escribir_en_cola(pool, id_paciente):
+    pool.escribir(ESCRITURA, (id_paciente,))
+
+
+def estacion(pool, escribir, latencias):
+    for _ in range(ESCRITURAS_POR_ESTACION):
+        inicio = time.perf_counter()
+        escribir(pool, '10000000')
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+
+def medir(ruta, sincronizacion, modo, escribir):
+    pool = PoolConexiones(ruta)
+    with pool.escritura() as conn:
+        conn.execute(f"PRAGMA synchronous = {sincronizacion}")
+    latencias = []
+    hilos = [threading.Thread(target=estacion, args=(pool, escribir, latencias)) for _ in range(ESTACIONES)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+    cola = pool.metricas()['cola_escritura']
+    pool.cerrar()
+    p50, p99 = np.percentile(latencias, [50, 99])
+    return {
+        'synchronous': sincronizacion,
+        'modo': modo,
+        'escrituras_s': round(len(latencias) / duracion),
+        'latencia_p50_ms': round(p50, 2),
+        'latencia_p99_ms': round(p99, 2),
+        'escrituras_por_commit': cola['escrituras_por_grupo'] if cola['grupos'] else 1.0,
+        'commit_p50_ms': cola['commit_p50_ms'] if cola['grupos'] else None,
+    }
+
+
+def main():
+    filas = []
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'partoseguro.db')
+        crear_bd_sintetica(50, 200, ruta=ruta).close()
+        for sincronizacion in SINCRONIZACION:
+            filas.append(medir(ruta, sincronizacion, 'transacción por escritura', escribir_en_transaccion))
+            filas.append(medir(ruta, sincronizacion, 'cola con commit agrupado', escribir_en_cola))
+    print(f"{ESTACIONES} estaciones x {ESCRITURAS_POR_ESTACION} escrituras, {os.cpu_count()} CPU")
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+# Benchmark de acceso concurrente a la base de datos.
+# Simula varias estaciones de enfermería (hilos) que leen el tablero y registran mediciones a la
+# vez. Compara abrir una conexión nueva por operación, como hacían las aplicaciones, con el pool
+# compartido en modo WAL de conexiones.py. Informa operaciones por segundo, errores
+# "database is locked" y las métricas de espera del pool.
+#
+# Uso: python -m benchmarks.bench_conexiones
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from benchmarks.comun import crear_bd_sintetica
+from conexiones import PoolConexiones
+
+ESTACIONES = 12
+OPERACIONES_POR_ESTACION = 200
+ESCRITURAS_CADA = 5  # una de cada cinco operaciones es una escritura
+
+LECTURA = "SELECT id_paciente, MAX(fecha) FROM mediciones GROUP BY id_paciente"
+ESCRITURA = (
+    "INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial) "
+    "VALUES ('10000000', datetime('now'), 5, 140, 4, '120/80')"
+)
+
+
+def estacion_original(ruta, errores):
+    for i in range(OPERACIONES_POR_ESTACION):
+        conn = sqlite3.connect(ruta, timeout=0.1)
+        try:
+            if i % ESCRITURAS_CADA == 0:
+                conn.execute(ESCRITURA)
+                conn.commit()
+            else:
+                conn.execute(LECTURA).fetchall()
+        except sqlite3.OperationalError:
+            errores.append(1)
+        finally:
+            conn.close()
+
+
+def estacion_pool(pool, errores):
+    for i in range(OPERACIONES_POR_ESTACION):
+        try:
+            if i % ESCRITURAS_CADA == 0:
+                with pool.escritura() as conn:
+                    conn.execute(ESCRITURA)
+            else:
+                with pool.lectura() as conn:
+                    conn.execute(LECTURA).fetchall()
+        except sqlite3.OperationalError:
+            errores.append(1)
+
+
+def ejecutar(objetivo, argumento):
+    errores = []
+    hilos = [threading.Thread(target=objetivo, args=(argumento, errores)) for _ in range(ESTACIONES)]
+    inicio = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio
+    return round(ESTACIONES * OPERACIONES_POR_ESTACION / duracion), len(errores)
+
+
+def main():
+    filas = []
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'partoseguro.db')
+        crear_bd_sintetica(50, 200, ruta=ruta).close()
+        ops, errores = ejecutar(estacion_original, ruta)
+        filas.append({'modo': 'conexión por operación', 'ops_por_s': ops, 'errores_bloqueo': errores})
+
+        pool = PoolConexiones(ruta)
+        ops, errores = ejecutar(estacion_pool, pool)
+        filas.append({'modo': 'pool WAL', 'ops_por_s': ops, 'errores_bloqueo': errores})
+        metricas = pool.metricas()
+        pool.cerrar()
+    print(f"{ESTACIONES} estaciones x {OPERACIONES_POR_ESTACION} operaciones")
+    print(pd.DataFrame(filas).to_string(index=False))
+    print("Métricas del pool:")
+    print(json.dumps(metricas, indent=2))
+
+
+if __name__ == '__main__':
+    main()
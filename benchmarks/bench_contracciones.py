@@ -0,0 +1,199 @@
+# Benchmark del conteo automático de contracciones.
+# Sobre tocografías sintéticas (benchmarks/generador.generar_ctg) mide:
+# - la detección vectorizada de la traza completa frente a una versión de referencia que suaviza
+#   y calcula el tono muestra por muestra, y las contracciones encontradas frente a las generadas
+#   (pico detectado a menos de 30 s) y las detecciones sin contracción;
+# - una sala monitorizada en flujo: cada pasada llega SEGUNDOS_POR_PASADA de tocografía por
+#   paciente y ContadorContracciones.procesar_sala detecta y guarda las contracciones nuevas y
+#   completa las mediciones sin contracciones anotadas (costo por pasada y por paciente, en un
+#   solo núcleo), frente a volver a detectar en cada pasada los últimos diez minutos de cada
+#   paciente; al final compara el conteo anotado en las mediciones con el de las contracciones
+#   generadas en los diez minutos previos.
+#
+# Uso: python -m benchmarks.bench_contracciones
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generador import generar_ctg, generar_sala
+from conexiones import PoolConexiones
+from contracciones_ctg import (
+    BLOQUE_TONO_S, CONTEXTO_S, DURACION_MINIMA_S, FRACCION_VALIDA, SUAVIZADO_S, UMBRAL_CONTRACCION,
+    VENTANA_CONTEO_MIN, VENTANA_TONO_S, ContadorContracciones, detectar_contracciones,
+)
+from trazas_ctg import FORMATO_FECHA, agregar_muestras, leer_traza
+
+HORAS = [1, 6, 24]
+FRECUENCIA_HZ = 4
+TOLERANCIA_S = 30
+PACIENTES_SALA = [40, 120]
+HORAS_HISTORIA = 1
+HORAS_FLUJO = 2
+SEGUNDOS_POR_PASADA = 30
+MINUTOS_ENTRE_MEDICIONES = 30
+REPETICIONES = 3
+INICIO = datetime(2026, 1, 1, 8)
+
+
+def cronometrar(funcion, repeticiones=REPETICIONES):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return float(np.median(tiempos))
+
+
+# Detección de referencia: media móvil y tono con una ventana por muestra, y tramos recorridos
+# con un bucle.
+def detectar_referencia(muestras):
+    n = len(muestras)
+    mitad = SUAVIZADO_S * FRECUENCIA_HZ // 2
+    suavizada = np.full(n, np.nan)
+    for i in range(n):
+        tramo = muestras[max(0, i - mitad):i + mitad + 1]
+        tramo = tramo[np.isfinite(tramo)]
+        if len(tramo) >= 2 * mitad * FRACCION_VALIDA:
+            suavizada[i] = tramo.mean()
+    por_bloque = BLOQUE_TONO_S * FRECUENCIA_HZ
+    picos = []
+    inicio = None
+    for i in range(n + 1):
+        dentro = False
+        if i < n:
+            desde = (i // por_bloque - VENTANA_TONO_S // BLOQUE_TONO_S) * por_bloque
+            ventana = suavizada[max(0, desde):(i // por_bloque + 1) * por_bloque]
+            ventana = ventana[np.isfinite(ventana)]
+            dentro = len(ventana) > 0 and suavizada[i] - ventana.min() >= UMBRAL_CONTRACCION
+        if dentro and inicio is None:
+            inicio = i
+        elif not dentro and inicio is not None:
+            if i - inicio >= DURACION_MINIMA_S * FRECUENCIA_HZ:
+                picos.append(inicio + int(np.nanargmax(suavizada[inicio:i])))
+            inicio = None
+    return np.array(picos, dtype=np.int64)
+
+
+# Contracciones generadas encontradas (pico detectado a menos de TOLERANCIA_S) y detecciones
+# que no corresponden a ninguna contracción generada.
+def comparar_picos(generados, detectados):
+    tolerancia = TOLERANCIA_S * FRECUENCIA_HZ
+    if len(generados) == 0 or len(detectados) == 0:
+        return 0, len(detectados)
+    distancias = np.abs(generados[:, None] - detectados[None, :])
+    return int((distancias.min(axis=1) <= tolerancia).sum()), int((distancias.min(axis=0) > tolerancia).sum())
+
+
+def medir_trazas():
+    filas = []
+    for horas in HORAS:
+        ctg = generar_ctg(horas, FRECUENCIA_HZ, semilla=horas)
+        vectorizado = cronometrar(lambda: detectar_contracciones(ctg['toco'], FRECUENCIA_HZ))
+        referencia = cronometrar(lambda: detectar_referencia(ctg['toco']), 1)
+        picos = detectar_contracciones(ctg['toco'], FRECUENCIA_HZ)['picos']
+        encontradas, sin_contraccion = comparar_picos(ctg['contracciones'], picos)
+        filas.append({
+            'horas': horas,
+            'muestras': len(ctg['toco']),
+            'vectorizado_ms': round(vectorizado * 1000, 1),
+            'millones_muestras_s': round(len(ctg['toco']) / vectorizado / 1e6, 1),
+            'referencia_ms': round(referencia * 1000),
+            'contracciones': f"{encontradas}/{len(ctg['contracciones'])} (+{sin_contraccion})",
+            'igual_a_referencia': bool(np.array_equal(picos, detectar_referencia(ctg['toco']))) if horas == HORAS[0] else '',
+        })
+    return filas
+
+
+# Conteo de contracciones generadas en los VENTANA_CONTEO_MIN minutos previos a cada medición.
+def conteo_real(picos, fechas):
+    momentos = np.array([(fecha - INICIO).total_seconds() * FRECUENCIA_HZ for fecha in fechas])
+    picos = np.sort(picos)
+    desde = momentos - VENTANA_CONTEO_MIN * 60 * FRECUENCIA_HZ
+    return np.searchsorted(picos, momentos, side='right') - np.searchsorted(picos, desde, side='right')
+
+
+def medir_sala(n_pacientes):
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'sala.db')
+        generar_sala(ruta, n_pacientes, 1).close()
+        pool = PoolConexiones(ruta)
+        ids = [str(20000000 + i) for i in range(n_pacientes)]
+        ctgs = {id_paciente: generar_ctg(HORAS_HISTORIA + HORAS_FLUJO, FRECUENCIA_HZ, semilla=i) for i, id_paciente in enumerate(ids)}
+        historia = HORAS_HISTORIA * 3600 * FRECUENCIA_HZ
+        for id_paciente in ids:
+            agregar_muestras(pool, id_paciente, 'toco', INICIO, ctgs[id_paciente]['toco'][:historia], FRECUENCIA_HZ)
+        # Mediciones sin contracciones anotadas durante el tramo en flujo.
+        fechas = [INICIO + timedelta(hours=HORAS_HISTORIA, minutes=m)
+                  for m in range(MINUTOS_ENTRE_MEDICIONES, HORAS_FLUJO * 60, MINUTOS_ENTRE_MEDICIONES)]
+        with pool.escritura() as conn:
+            conn.executemany(
+                "INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial) "
+                "VALUES (?, ?, 5, 140, NULL, '120/80')",
+                [(id_paciente, fecha.strftime(FORMATO_FECHA)) for id_paciente in ids for fecha in fechas],
+            )
+            conn.commit()
+        contador = ContadorContracciones(pool)
+        primera = time.perf_counter()
+        contador.procesar_sala()
+        primera = time.perf_counter() - primera
+
+        pasadas = []
+        recuentos = []
+        por_pasada = SEGUNDOS_POR_PASADA * FRECUENCIA_HZ
+        for desde in range(historia, historia + HORAS_FLUJO * 3600 * FRECUENCIA_HZ, por_pasada):
+            inicio_tramo = INICIO + timedelta(seconds=desde / FRECUENCIA_HZ)
+            for id_paciente in ids:
+                agregar_muestras(pool, id_paciente, 'toco', inicio_tramo, ctgs[id_paciente]['toco'][desde:desde + por_pasada], FRECUENCIA_HZ)
+            comienzo = time.perf_counter()
+            contador.procesar_sala()
+            pasadas.append(time.perf_counter() - comienzo)
+            if len(recuentos) < 10:
+                # Sin estado: detectar de nuevo la ventana del conteo (más el contexto del tono).
+                fin_tramo = inicio_tramo + timedelta(seconds=SEGUNDOS_POR_PASADA)
+                comienzo = time.perf_counter()
+                with pool.lectura() as conn:
+                    for id_paciente in ids:
+                        traza = leer_traza(conn, id_paciente, 'toco', fin_tramo - timedelta(minutes=VENTANA_CONTEO_MIN, seconds=CONTEXTO_S))
+                        detectar_contracciones(traza.muestras, FRECUENCIA_HZ)
+                recuentos.append(time.perf_counter() - comienzo)
+
+        with pool.lectura() as conn:
+            anotadas = pd.read_sql_query(
+                "SELECT id_paciente, fecha, contracciones FROM mediciones WHERE id_paciente IN "
+                f"({', '.join('?' for _ in ids)}) AND fecha >= ? AND fecha <= ? ORDER BY id_paciente, fecha",
+                conn, params=(*ids, fechas[0].strftime(FORMATO_FECHA), fechas[-1].strftime(FORMATO_FECHA)),
+            )
+        errores = []
+        for id_paciente, grupo in anotadas.groupby('id_paciente'):
+            real = conteo_real(ctgs[id_paciente]['contracciones'], pd.to_datetime(grupo['fecha']).dt.to_pydatetime())
+            errores.extend(np.abs(grupo['contracciones'].to_numpy(dtype='float64') - real))
+        pool.cerrar()
+    errores = np.array(errores)
+    pasada = float(np.median(pasadas))
+    return {
+        'pacientes': n_pacientes,
+        'primera_pasada_s': round(primera, 2),
+        'pasada_ms': round(pasada * 1000, 1),
+        'p99_pasada_ms': round(float(np.percentile(pasadas, 99)) * 1000, 1),
+        'por_paciente_ms': round(pasada * 1000 / n_pacientes, 3),
+        'recontar_ventana_ms': round(float(np.median(recuentos)) * 1000, 1),
+        'mediciones_completadas': f"{int(np.isfinite(errores).sum())}/{len(errores)}",
+        'conteo_exacto': f"{int((errores == 0).sum())}/{len(errores)}",
+        'error_maximo': int(np.nanmax(errores)),
+    }
+
+
+def main():
+    print(f"Tocografías a {FRECUENCIA_HZ} Hz, {os.cpu_count()} CPU")
+    print(pd.DataFrame(medir_trazas()).to_string(index=False))
+    print()
+    print(f"Sala monitorizada: {SEGUNDOS_POR_PASADA} s de tocografía nueva por paciente y pasada, {HORAS_FLUJO} h")
+    print(pd.DataFrame([medir_sala(n) for n in PACIENTES_SALA]).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
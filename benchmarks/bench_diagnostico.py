@@ -0,0 +1,60 @@
+# Benchmark del motor de diagnóstico vectorizado.
+# Compara aplicar fila por fila una versión escalar de las reglas (como el antiguo
+# generar_diagnostico) con evaluar_mediciones sobre la historia completa de la sala.
+#
+# Uso: python -m benchmarks.bench_diagnostico
+import pandas as pd
+
+from benchmarks.comun import crear_bd_sintetica, cronometrar
+from diagnostico import evaluar_mediciones
+
+
+# Reglas escalares del antiguo generar_diagnostico, acumulando todos los estados.
+def diagnostico_escalar(dilatacion, frecuencia_cardiaca, contracciones, presion_arterial):
+    estados = []
+    if frecuencia_cardiaca < 110:
+        estados.append('Bradicardia fetal')
+    elif frecuencia_cardiaca > 160:
+        estados.append('Taquicardia fetal')
+    try:
+        sistolica, diastolica = map(int, presion_arterial.split('/'))
+        if sistolica < 90 or diastolica < 60:
+            estados.append('Hipotensión')
+        elif sistolica > 140 or diastolica > 90:
+            estados.append('Hipertensión')
+    except ValueError:
+        estados.append('Error en la medición de la presión arterial')
+    if contracciones > 5:
+        estados.append('Contracciones uterinas frecuentes')
+    elif contracciones < 3:
+        estados.append('Contracciones uterinas insuficientes')
+    if dilatacion >= 10:
+        estados.append('Dilatación completa, preparar para el parto')
+    elif dilatacion < 4:
+        estados.append('Dilatación cervical lenta')
+    return estados
+
+
+def main():
+    filas = []
+    for pacientes, mediciones in [(10, 50), (50, 200), (200, 500)]:
+        conn = crear_bd_sintetica(pacientes, mediciones)
+        df = pd.read_sql_query("SELECT * FROM mediciones", conn)
+        conn.close()
+
+        def por_filas():
+            return [
+                diagnostico_escalar(f.dilatacion, f.frecuencia_cardiaca, f.contracciones, f.presion_arterial)
+                for f in df.itertuples()
+            ]
+
+        filas.append({
+            'filas': len(df),
+            'escalar_ms': round(cronometrar(por_filas, repeticiones=3), 2),
+            'vectorizado_ms': round(cronometrar(lambda: evaluar_mediciones(df), repeticiones=3), 2),
+        })
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# Benchmark del arranque del esquema.
+# Compara el bloque que partoseguro_main.py ejecutaba en cada rerun (tres CREATE TABLE IF NOT
+# EXISTS, índices, triggers y la lectura completa de patologías) con esquema.conectar, que solo
+# migra la primera vez en el proceso. También mide la migración inicial de una base vacía.
+#
+# Uso: python -m benchmarks.bench_esquema
+import os
+import sqlite3
+import tempfile
+
+import pandas as pd
+
+import esquema
+from benchmarks.comun import cronometrar
+
+RERUNS = 200
+
+
+# Trabajo de DDL que se hacía en cada rerun antes de esquema.py.
+def rerun_original(ruta):
+    conn = sqlite3.connect(ruta)
+    for _, _, sentencias in esquema.MIGRACIONES:
+        for sql in sentencias:
+            if sql.lstrip().startswith('CREATE'):
+                conn.execute(sql)
+    conn.execute("SELECT * FROM patologias").fetchall()
+    conn.commit()
+    conn.close()
+
+
+def rerun_migrado(ruta):
+    conn = esquema.conectar(ruta)
+    conn.close()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'partoseguro.db')
+        conn = sqlite3.connect(ruta)
+        migracion_inicial = cronometrar(lambda: esquema.aplicar_migraciones(conn), repeticiones=1)
+        conn.close()
+
+        filas = [
+            {'modo': 'migración inicial (una vez)', 'ms': round(migracion_inicial, 3)},
+            {'modo': 'DDL en cada rerun', 'ms': round(cronometrar(lambda: [rerun_original(ruta) for _ in range(RERUNS)]) / RERUNS, 3)},
+            {'modo': 'esquema.conectar', 'ms': round(cronometrar(lambda: [rerun_migrado(ruta) for _ in range(RERUNS)]) / RERUNS, 3)},
+        ]
+    print(f"Tiempo medio por rerun ({RERUNS} reruns)")
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
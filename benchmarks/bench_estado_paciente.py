@@ -0,0 +1,75 @@
+# Benchmark de la tabla estado_paciente.
+# Compara la consulta del triage de la sala buscando la última medición de cada paciente en
+# mediciones (esquema 5) con la lectura de estado_paciente (esquema 6), el triage completo
+# (consulta más reglas de diagnóstico) y el costo que agregan los triggers al insertar, editar
+# y eliminar una medición.
+#
+# Uso: python -m benchmarks.bench_estado_paciente
+import pandas as pd
+
+from benchmarks.comun import crear_bd_sintetica, cronometrar
+from diagnostico import SQL_ULTIMAS_MEDICIONES_COMPLETAS, evaluar_mediciones, triage_sala
+from esquema import aplicar_migraciones
+
+PACIENTES = [100, 1000, 5000]
+MEDICIONES_POR_PACIENTE = 200
+REPETICIONES_ESCRITURA = 200
+
+# Triage anterior a estado_paciente: una búsqueda por paciente en el índice (id_paciente, fecha).
+SQL_TRIAGE_MEDICIONES = """
+SELECT p.id AS id_paciente, p.nombre, m.fecha, m.dilatacion, m.frecuencia_cardiaca,
+       m.contracciones, m.presion_arterial, m.sistolica, m.diastolica
+FROM pacientes p
+JOIN mediciones m ON m.id = (
+    SELECT m2.id FROM mediciones m2 WHERE m2.id_paciente = p.id ORDER BY m2.fecha DESC, m2.id DESC LIMIT 1
+)
+"""
+
+
+def triage_mediciones(conn):
+    ultimas = pd.read_sql_query(SQL_TRIAGE_MEDICIONES, conn)
+    for columna in ['dilatacion', 'frecuencia_cardiaca', 'contracciones', 'sistolica', 'diastolica']:
+        ultimas[columna] = pd.to_numeric(ultimas[columna], errors='coerce').astype('Int64')
+    return ultimas.join(evaluar_mediciones(ultimas))
+
+
+# Milisegundos por operación de escritura (insertar, editar la presión y eliminar una medición).
+def escrituras_ms(conn, id_paciente):
+    def ciclo():
+        for _ in range(REPETICIONES_ESCRITURA):
+            id_medicion = conn.execute(
+                "INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, "
+                "presion_arterial, sistolica, diastolica) VALUES (?, datetime('now'), 5, 140, 4, '120/80', 120, 80)",
+                (id_paciente,),
+            ).lastrowid
+            conn.execute("UPDATE mediciones SET presion_arterial = '150/95' WHERE id = ?", (id_medicion,))
+            conn.execute("DELETE FROM mediciones WHERE id = ?", (id_medicion,))
+        conn.commit()
+    return cronometrar(ciclo, repeticiones=3) / (3 * REPETICIONES_ESCRITURA)
+
+
+def main():
+    filas = []
+    for n in PACIENTES:
+        conn = crear_bd_sintetica(n, MEDICIONES_POR_PACIENTE, n_activas=max(1, n // 10), version_esquema=5)
+        id_paciente = conn.execute("SELECT MIN(id) FROM pacientes").fetchone()[0]
+        consulta_antes = cronometrar(lambda: conn.execute(SQL_TRIAGE_MEDICIONES).fetchall())
+        triage_antes = cronometrar(lambda: triage_mediciones(conn))
+        escritura_antes = escrituras_ms(conn, id_paciente)
+        aplicar_migraciones(conn)
+        filas.append({
+            'pacientes': n,
+            'mediciones': n * MEDICIONES_POR_PACIENTE,
+            'consulta_mediciones_ms': round(consulta_antes, 2),
+            'consulta_estado_ms': round(cronometrar(lambda: conn.execute(SQL_ULTIMAS_MEDICIONES_COMPLETAS).fetchall()), 2),
+            'triage_mediciones_ms': round(triage_antes, 2),
+            'triage_estado_ms': round(cronometrar(lambda: triage_sala(conn)), 2),
+            'escritura_sin_estado_ms': round(escritura_antes, 3),
+            'escritura_con_estado_ms': round(escrituras_ms(conn, id_paciente), 3),
+        })
+        conn.close()
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# Benchmark de la exportación de mediciones.
+# Compara la exportación en memoria (pd.read_sql de toda la tabla con los pacientes y luego
+# to_csv / to_parquet) con la exportación por lotes de exportacion.py. Informa el tiempo y el
+# pico de memoria reservada por Python (tracemalloc) según el tamaño de la tabla.
+#
+# Uso: python -m benchmarks.bench_exportacion
+import os
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks.comun import crear_bd_sintetica
+from conexiones import PoolConexiones
+from exportacion import SQL_EXPORTACION, exportar_mediciones
+
+TAMANOS = [(100, 1000), (1000, 1000)]  # (pacientes, mediciones por paciente)
+
+
+def exportar_en_memoria(pool, destino, formato):
+    with pool.lectura() as conn:
+        df = pd.read_sql(SQL_EXPORTACION, conn)
+    if formato == 'csv':
+        df.to_csv(destino, index=False)
+    else:
+        df.to_parquet(destino, index=False)
+
+
+def medir(funcion):
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    funcion()
+    segundos = time.perf_counter() - inicio
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return round(segundos, 2), round(pico / 1e6, 1)
+
+
+def main():
+    filas = []
+    for n_pacientes, n_mediciones in TAMANOS:
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'partoseguro.db')
+            crear_bd_sintetica(n_pacientes, n_mediciones, ruta=ruta).close()
+            pool = PoolConexiones(ruta)
+            for formato in ['csv', 'parquet']:
+                destino = os.path.join(directorio, f"mediciones.{formato}")
+                for modo, funcion in [
+                    ('en memoria', lambda: exportar_en_memoria(pool, destino, formato)),
+                    ('por lotes', lambda: exportar_mediciones(pool, destino, formato)),
+                ]:
+                    segundos, pico_mb = medir(funcion)
+                    filas.append({
+                        'filas': n_pacientes * n_mediciones,
+                        'formato': formato,
+                        'modo': modo,
+                        'segundos': segundos,
+                        'pico_memoria_mb': pico_mb,
+                    })
+            pool.cerrar()
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+# Benchmark de extremo a extremo de las aplicaciones Streamlit.
+# Para cada aplicación y tamaño de sala (N pacientes x M mediciones, generada con
+# benchmarks/generador.py) ejecuta el script sin navegador con el AppTest de Streamlit: una
+# primera ejecución en frío y luego varios reruns. Informa la latencia de la primera ejecución,
+# los percentiles 50/95/99 de los reruns, las sentencias SQL por rerun y el pico de memoria
+# residente. Cada escenario corre en un proceso aparte para que cachés y memoria no se mezclen.
+#
+# Los resultados se agregan a benchmarks/resultados/extremo_a_extremo.jsonl junto con el commit
+# de git, y cada escenario se compara con su medición anterior para ver regresiones.
+#
+# Uso: python -m benchmarks.bench_extremo_a_extremo [--tamanos 10x48 50x48] [--reruns 10]
+#                                                   [--apps partoseguro_main.py ...] [--no-guardar]
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ['partoseguro_main.py', 'gestor_partoseguro.py', 'db_manager.py']
+TAMANOS = ['10x48', '50x48']
+RERUNS = 10
+ARCHIVO_RESULTADOS = os.path.join(RAIZ, 'benchmarks', 'resultados', 'extremo_a_extremo.jsonl')
+
+
+# Ejecuta un escenario en este proceso y devuelve sus métricas.
+def ejecutar_escenario(app, n_pacientes, n_mediciones, reruns):
+    import streamlit
+    from streamlit.testing.v1 import AppTest
+
+    from benchmarks.generador import generar_sala
+    from conexiones import obtener_pool
+
+    directorio = tempfile.mkdtemp()
+    try:
+        shutil.copytree(os.path.join(RAIZ, 'img'), os.path.join(directorio, 'img'))
+        generar_sala(os.path.join(directorio, 'partoseguro.db'), n_pacientes, n_mediciones).close()
+        os.chdir(directorio)
+
+        # Todas las aplicaciones abren partoseguro.db con el pool compartido del proceso.
+        sentencias = [0]
+        def contar(sql):
+            if not sql.startswith('--'):  # los triggers aparecen como comentarios
+                sentencias[0] += 1
+        obtener_pool('partoseguro.db').trazar(contar)
+
+        prueba = AppTest.from_file(os.path.join(RAIZ, app), default_timeout=600)
+        inicio = time.perf_counter()
+        prueba.run()
+        frio_ms = (time.perf_counter() - inicio) * 1000
+        if prueba.exception:
+            raise RuntimeError(f"{app} falló: {prueba.exception[0].value}")
+        sentencias_frio = sentencias[0]
+
+        latencias = []
+        sentencias[0] = 0
+        for _ in range(reruns):
+            inicio = time.perf_counter()
+            prueba.run()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        p50, p95, p99 = np.percentile(latencias, [50, 95, 99])
+        return {
+            'app': app,
+            'pacientes': n_pacientes,
+            'mediciones': n_mediciones,
+            'reruns': reruns,
+            'frio_ms': round(frio_ms, 1),
+            'p50_ms': round(p50, 1),
+            'p95_ms': round(p95, 1),
+            'p99_ms': round(p99, 1),
+            'sql_frio': sentencias_frio,
+            'sql_por_rerun': round(sentencias[0] / reruns, 1),
+            # ru_maxrss está en KiB en Linux.
+            'pico_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'streamlit': streamlit.__version__,
+        }
+    finally:
+        os.chdir(RAIZ)
+        shutil.rmtree(directorio, ignore_errors=True)
+
+
+def commit_actual():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        sucio = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=RAIZ,
+                               capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ('-modificado' if sucio else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def resultados_anteriores():
+    anteriores = {}
+    if os.path.exists(ARCHIVO_RESULTADOS):
+        with open(ARCHIVO_RESULTADOS, encoding='utf-8') as archivo:
+            for linea in archivo:
+                resultado = json.loads(linea)
+                anteriores[(resultado['app'], resultado['pacientes'], resultado['mediciones'])] = resultado
+    return anteriores
+
+
+def variacion(actual, anterior):
+    if anterior is None or not anterior:
+        return '-'
+    return f"{100 * (actual - anterior) / anterior:+.0f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de extremo a extremo de las aplicaciones Streamlit.")
+    parser.add_argument('--apps', nargs='+', default=APPS, choices=APPS)
+    parser.add_argument('--tamanos', nargs='+', default=TAMANOS, help="Tamaños de sala como PACIENTESxMEDICIONES")
+    parser.add_argument('--reruns', type=int, default=RERUNS)
+    parser.add_argument('--no-guardar', action='store_true', help="No agregar los resultados al historial")
+    parser.add_argument('--escenario', nargs=3, metavar=('APP', 'PACIENTES', 'MEDICIONES'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Modo interno: un solo escenario, con el resultado en JSON por la salida estándar.
+    if args.escenario:
+        app, n_pacientes, n_mediciones = args.escenario
+        print(json.dumps(ejecutar_escenario(app, int(n_pacientes), int(n_mediciones), args.reruns)))
+        return
+
+    anteriores = resultados_anteriores()
+    comun = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit_actual(),
+        'python': platform.python_version(),
+        'maquina': platform.node(),
+    }
+    resultados = []
+    for tamano in args.tamanos:
+        n_pacientes, n_mediciones = (int(valor) for valor in tamano.lower().split('x'))
+        for app in args.apps:
+            proceso = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_extremo_a_extremo', '--reruns', str(args.reruns),
+                 '--escenario', app, str(n_pacientes), str(n_mediciones)],
+                cwd=RAIZ, capture_output=True, text=True,
+            )
+            if proceso.returncode != 0:
+                print(f"{app} {tamano}: error\n{proceso.stderr[-2000:]}", file=sys.stderr)
+                continue
+            resultado = {**comun, **json.loads(proceso.stdout.strip().splitlines()[-1])}
+            resultados.append(resultado)
+
+    if not resultados:
+        return
+    tabla = pd.DataFrame(resultados)
+    tabla['p50_vs_anterior'] = [
+        variacion(r['p50_ms'], anteriores.get((r['app'], r['pacientes'], r['mediciones']), {}).get('p50_ms'))
+        for r in resultados
+    ]
+    tabla['rss_vs_anterior'] = [
+        variacion(r['pico_rss_mb'], anteriores.get((r['app'], r['pacientes'], r['mediciones']), {}).get('pico_rss_mb'))
+        for r in resultados
+    ]
+    columnas = ['app', 'pacientes', 'mediciones', 'frio_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'sql_frio',
+                'sql_por_rerun', 'pico_rss_mb', 'p50_vs_anterior', 'rss_vs_anterior']
+    print(f"commit {comun['commit']}, {args.reruns} reruns por escenario")
+    print(tabla[columnas].to_string(index=False))
+
+    if not args.no_guardar:
+        os.makedirs(os.path.dirname(ARCHIVO_RESULTADOS), exist_ok=True)
+        with open(ARCHIVO_RESULTADOS, 'a', encoding='utf-8') as archivo:
+            for resultado in resultados:
+                archivo.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+        print(f"Resultados agregados a {os.path.relpath(ARCHIVO_RESULTADOS, RAIZ)}")
+
+
+if __name__ == '__main__':
+    main()
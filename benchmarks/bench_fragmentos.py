@@ -0,0 +1,75 @@
+# Benchmark del costo de CPU de cada refresco de la cuenta regresiva.
+# Antes, st_autorefresh volvía a ejecutar toda la página cada 30 segundos; ahora solo se ejecuta
+# el fragmento panel_proximas_mediciones. Compara el tiempo de CPU de un rerun completo de
+# partoseguro_main.py (con las cachés ya calientes) con el de un tick del fragmento, usando el
+# entorno de pruebas de Streamlit sobre una base de datos sintética.
+#
+# Uso: python -m benchmarks.bench_fragmentos
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import conexiones
+from benchmarks.comun import crear_bd_sintetica
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TAMANOS = [(5, 48), (20, 48), (50, 48)]
+REPETICIONES = 5
+
+
+def tick_cuenta_regresiva():
+    from conexiones import obtener_pool
+    from paneles import panel_proximas_mediciones
+
+    panel_proximas_mediciones(obtener_pool('partoseguro.db'))
+
+
+def cpu_ms(app, repeticiones=REPETICIONES):
+    app.run()  # calienta cachés y conexiones
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.process_time()
+        app.run()
+        tiempos.append((time.process_time() - inicio) * 1000)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2]
+
+
+def main():
+    filas = []
+    directorio_original = os.getcwd()
+    for n_pacientes, n_mediciones in TAMANOS:
+        with tempfile.TemporaryDirectory() as directorio:
+            shutil.copytree(os.path.join(RAIZ, 'img'), os.path.join(directorio, 'img'))
+            crear_bd_sintetica(n_pacientes, n_mediciones, ruta=os.path.join(directorio, 'partoseguro.db')).close()
+            os.chdir(directorio)
+            try:
+                pagina = AppTest.from_file(os.path.join(RAIZ, 'partoseguro_main.py'), default_timeout=120)
+                fragmento = AppTest.from_function(tick_cuenta_regresiva, default_timeout=120)
+                completo = cpu_ms(pagina)
+                tick = cpu_ms(fragmento)
+            finally:
+                # Cada tamaño usa su propia base de datos: se descartan el pool y las cachés.
+                for pool in conexiones._pools.values():
+                    pool.cerrar()
+                conexiones._pools.clear()
+                st.cache_resource.clear()
+                st.cache_data.clear()
+                os.chdir(directorio_original)
+        filas.append({
+            'pacientes': n_pacientes,
+            'mediciones_por_paciente': n_mediciones,
+            'rerun_completo_cpu_ms': round(completo, 1),
+            'tick_fragmento_cpu_ms': round(tick, 1),
+            'reduccion': f"{completo / tick:.0f}x" if tick else '-',
+        })
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
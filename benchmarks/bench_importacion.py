@@ -0,0 +1,86 @@
+# Benchmark de la importación masiva de mediciones.
+# Compara registrar las filas de un archivo una por una, con un INSERT y un commit por fila
+# como create_medicion/agregar_medicion, frente a importacion.importar_mediciones (validación
+# vectorizada y executemany por lotes). Usa una base de datos en disco con el pool WAL.
+#
+# Uso: python -m benchmarks.bench_importacion
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from benchmarks.comun import crear_bd_sintetica
+from conexiones import PoolConexiones
+from importacion import SQL_INSERTAR_MEDICION, importar_mediciones
+from validacion import separar_presion
+
+FILAS = [1000, 10000, 100000]
+PACIENTES = 50
+FILAS_UNO_A_UNO_MAX = 10000  # más allá, la inserción fila por fila tarda demasiado
+PORCENTAJE_INVALIDAS = 2
+
+
+def escribir_csv(ruta, n, semilla=0):
+    rng = random.Random(semilla)
+    inicio = datetime(2023, 1, 1)
+    filas = []
+    for i in range(n):
+        presion = f"{rng.randint(100, 150)}/{rng.randint(60, 95)}"
+        if rng.randrange(100) < PORCENTAJE_INVALIDAS:
+            presion = rng.choice(['', '120-80', '20/10', '300/200'])
+        filas.append({
+            'id_paciente': str(10000000 + rng.randrange(PACIENTES)),
+            'fecha': (inicio + timedelta(minutes=30 * i)).strftime('%Y-%m-%d %H:%M'),
+            'dilatacion': rng.randint(0, 10),
+            'frecuencia_cardiaca': rng.randint(100, 170),
+            'contracciones': rng.randint(2, 6),
+            'presion_arterial': presion,
+        })
+    pd.DataFrame(filas).to_csv(ruta, index=False)
+
+
+# Registro fila por fila: una transacción por medición.
+def importar_uno_a_uno(pool, ruta):
+    df = pd.read_csv(ruta, dtype=str, keep_default_na=False)
+    for fila in df.itertuples(index=False, name=None):
+        with pool.escritura() as conn:
+            conn.execute(SQL_INSERTAR_MEDICION, fila + separar_presion(fila[-1]))
+    return len(df)
+
+
+def main():
+    resultados = []
+    for n in FILAS:
+        with tempfile.TemporaryDirectory() as directorio:
+            archivo = os.path.join(directorio, 'mediciones.csv')
+            escribir_csv(archivo, n)
+            for modo in ['uno a uno', 'importación por lotes']:
+                if modo == 'uno a uno' and n > FILAS_UNO_A_UNO_MAX:
+                    continue
+                ruta = os.path.join(directorio, f"{modo.replace(' ', '_')}.db")
+                crear_bd_sintetica(PACIENTES, 1, ruta=ruta).close()
+                pool = PoolConexiones(ruta)
+                inicio = time.perf_counter()
+                if modo == 'uno a uno':
+                    insertadas, rechazadas = importar_uno_a_uno(pool, archivo), '-'
+                else:
+                    resumen = importar_mediciones(pool, archivo)
+                    insertadas, rechazadas = resumen['insertadas'], resumen['rechazadas']
+                segundos = time.perf_counter() - inicio
+                pool.cerrar()
+                resultados.append({
+                    'filas': n,
+                    'modo': modo,
+                    'insertadas': insertadas,
+                    'rechazadas': rechazadas,
+                    'segundos': round(segundos, 2),
+                    'filas_por_segundo': round(insertadas / segundos),
+                })
+    print(pd.DataFrame(resultados).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# Benchmark del servicio de ingesta de equipos.
+# Simula monitores fetales que envían una lectura, esperan la respuesta y envían la siguiente,
+# por HTTP y por TCP. Una de cada cincuenta lecturas trae una presión arterial inválida. Compara
+# escribir cada lectura en su propia transacción (lote de 1, como la barra lateral) con el
+# commit por lotes del servicio. Informa lecturas por segundo, latencia vista por los equipos
+# (percentiles 50/95/99), lecturas por lote y latencia del commit.
+# Servidor y equipos comparten el bucle de eventos, así que las cifras son conservadoras.
+#
+# Uso: python -m benchmarks.bench_ingesta
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generador import generar_sala
+from conexiones import PoolConexiones
+from ingesta import detener_servicio, iniciar_servicio
+
+PACIENTES = 40
+MONITORES = 64
+DURACION_S = 4
+LECTURAS_INVALIDAS_CADA = 50
+ESCENARIOS = [
+    ('http', 1, 0),
+    ('http', 500, 20),
+    ('tcp', 1, 0),
+    ('tcp', 500, 20),
+]
+
+
+def lectura_simulada(rng, ids_pacientes, n):
+    return {
+        'id_paciente': rng.choice(ids_pacientes),
+        'dilatacion': rng.randint(0, 10),
+        'frecuencia_cardiaca': rng.randint(110, 160),
+        'contracciones': rng.randint(1, 6),
+        'presion_arterial': '300/200' if n % LECTURAS_INVALIDAS_CADA == 0 else f"{rng.randint(100, 140)}/{rng.randint(60, 90)}",
+    }
+
+
+async def enviar_http(lector, escritor, lectura):
+    cuerpo = json.dumps(lectura).encode()
+    escritor.write(b"POST /mediciones HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                   b"Content-Length: " + str(len(cuerpo)).encode() + b"\r\n\r\n" + cuerpo)
+    await escritor.drain()
+    await lector.readline()
+    largo = 0
+    while (linea := await lector.readline()) not in (b'\r\n', b''):
+        if linea.lower().startswith(b'content-length:'):
+            largo = int(linea.split(b':')[1])
+    return json.loads(await lector.readexactly(largo))
+
+
+async def enviar_tcp(lector, escritor, lectura):
+    escritor.write(json.dumps(lectura).encode() + b'\n')
+    await escritor.drain()
+    return json.loads(await lector.readline())
+
+
+async def monitor(puerto, protocolo, ids_pacientes, fin, latencias, semilla):
+    rng = random.Random(semilla)
+    enviar = enviar_http if protocolo == 'http' else enviar_tcp
+    lector, escritor = await asyncio.open_connection('127.0.0.1', puerto)
+    n = 0
+    try:
+        while time.perf_counter() < fin:
+            n += 1
+            inicio = time.perf_counter()
+            await enviar(lector, escritor, lectura_simulada(rng, ids_pacientes, n))
+            latencias.append((time.perf_counter() - inicio) * 1000)
+    finally:
+        escritor.close()
+
+
+async def medir(ruta_bd, ids_pacientes, protocolo, tamano_lote, intervalo_ms):
+    pool = PoolConexiones(ruta_bd)
+    servicio, servidores = await iniciar_servicio(
+        pool, puerto_http=0 if protocolo == 'http' else None, puerto_tcp=0 if protocolo == 'tcp' else None,
+        tamano_lote=tamano_lote, intervalo_lote_ms=intervalo_ms)
+    puerto = servidores[0].sockets[0].getsockname()[1]
+    latencias = []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(monitor(puerto, protocolo, ids_pacientes, inicio + DURACION_S, latencias, semilla)
+                           for semilla in range(MONITORES)))
+    segundos = time.perf_counter() - inicio
+    await detener_servicio(servicio, servidores)
+    pool.cerrar()
+    estadisticas = servicio.estadisticas()
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99])
+    return {
+        'protocolo': protocolo,
+        'lote_max': tamano_lote,
+        'intervalo_ms': intervalo_ms,
+        'lecturas_s': round(len(latencias) / segundos),
+        'latencia_p50_ms': round(p50, 1),
+        'latencia_p95_ms': round(p95, 1),
+        'latencia_p99_ms': round(p99, 1),
+        'lecturas_por_lote': estadisticas['lecturas_por_lote'],
+        'commit_p50_ms': estadisticas['commit_ms']['p50'],
+        'rechazadas': estadisticas['rechazadas'],
+        'errores': estadisticas['errores'],
+    }
+
+
+def main():
+    filas = []
+    with tempfile.TemporaryDirectory() as directorio:
+        for protocolo, tamano_lote, intervalo_ms in ESCENARIOS:
+            ruta_bd = os.path.join(directorio, f"{protocolo}_{tamano_lote}.db")
+            generar_sala(ruta_bd, PACIENTES, 24).close()
+            ids_pacientes = [str(20000000 + i) for i in range(PACIENTES)]
+            filas.append(asyncio.run(medir(ruta_bd, ids_pacientes, protocolo, tamano_lote, intervalo_ms)))
+    print(f"{MONITORES} monitores durante {DURACION_S} s por escenario, {os.cpu_count()} CPU")
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
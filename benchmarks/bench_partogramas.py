@@ -0,0 +1,61 @@
+# Benchmark de los partogramas de fin de turno.
+# Genera el PDF de cada paciente de una sala sintética en este proceso (trabajadores=0) y con
+# pools de distinto tamaño. Informa el tiempo total, los partogramas por segundo, el tiempo hasta
+# el primer PDF en disco y el pico de memoria residente del proceso principal y de los procesos
+# del pool.
+#
+# Uso: python -m benchmarks.bench_partogramas
+import os
+import resource
+import tempfile
+import time
+
+import pandas as pd
+
+from benchmarks.generador import generar_sala
+from reporte_partogramas import iterar_partogramas
+
+PACIENTES = 120
+MEDICIONES_POR_PACIENTE = 72
+TRABAJADORES = [0, 1, 2, 4]
+
+
+def medir(ruta_bd, trabajadores, carpeta):
+    inicio = time.perf_counter()
+    primero = None
+    generados = paginas = 0
+    for resultado in iterar_partogramas(ruta_bd, carpeta, trabajadores=trabajadores):
+        if primero is None:
+            primero = time.perf_counter() - inicio
+        if resultado['archivo'] is not None:
+            generados += 1
+            paginas += resultado['paginas']
+    segundos = time.perf_counter() - inicio
+    # ru_maxrss está en KiB en Linux; RUSAGE_CHILDREN es el pico del mayor proceso ya terminado.
+    return {
+        'trabajadores': trabajadores,
+        'partogramas': generados,
+        'paginas': paginas,
+        'segundos': round(segundos, 2),
+        'pdf_por_segundo': round(generados / segundos, 2),
+        'primer_pdf_s': round(primero, 2),
+        'rss_principal_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'rss_hijo_max_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def main():
+    filas = []
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta_bd = os.path.join(directorio, 'sala.db')
+        generar_sala(ruta_bd, PACIENTES, MEDICIONES_POR_PACIENTE).close()
+        for trabajadores in TRABAJADORES:
+            if trabajadores > (os.cpu_count() or 1) * 2:
+                continue
+            filas.append(medir(ruta_bd, trabajadores, os.path.join(directorio, str(trabajadores))))
+    print(f"{PACIENTES} pacientes x {MEDICIONES_POR_PACIENTE} mediciones, {os.cpu_count()} CPU")
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# Benchmark del planificador de mediciones.
+# Compara el costo por refresco de la cuenta regresiva recalculando todo con SQL (como hacía
+# el panel de próximas mediciones) frente a leer el estado ya calculado por el planificador,
+# y el costo de procesar una medición nueva: notificar_medicion más un ciclo del planificador,
+# frente a volver a calcular a todas las pacientes.
+#
+# Uso: python -m benchmarks.bench_planificador
+import os
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.comun import crear_bd_sintetica, cronometrar
+from conexiones import PoolConexiones
+from planificador import PlanificadorMediciones
+from proximas_mediciones import calcular_cuentas_regresivas, obtener_ultimas_mediciones
+
+PACIENTES = [100, 1000, 5000]
+MEDICIONES_POR_PACIENTE = 48
+
+
+def main():
+    filas = []
+    for n in PACIENTES:
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'partoseguro.db')
+            crear_bd_sintetica(n, MEDICIONES_POR_PACIENTE, n_activas=max(1, n // 10), ruta=ruta).close()
+            pool = PoolConexiones(ruta)
+            planificador = PlanificadorMediciones(pool)
+            carga_ms = cronometrar(planificador.ciclo, repeticiones=1)
+
+            def refresco_sql():
+                with pool.lectura() as conn:
+                    return calcular_cuentas_regresivas(obtener_ultimas_mediciones(conn))
+
+            def refresco_planificador():
+                estado = planificador.estado()
+                return calcular_cuentas_regresivas(estado, intervalo_minutos=estado['intervalo_minutos'])
+
+            def medicion_nueva():
+                ahora = datetime.now()
+                with pool.escritura() as conn:
+                    conn.execute(
+                        "INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial) "
+                        "VALUES ('10000000', ?, 5, 140, 4, '120/80')",
+                        (ahora.strftime('%Y-%m-%d %H:%M:%S'),),
+                    )
+                planificador.notificar_medicion('10000000', ahora)
+                planificador.ciclo()
+
+            filas.append({
+                'pacientes': n,
+                'carga_inicial_ms': round(carga_ms, 2),
+                'refresco_sql_ms': round(cronometrar(refresco_sql), 2),
+                'refresco_planificador_ms': round(cronometrar(refresco_planificador), 2),
+                'medicion_nueva_ms': round(cronometrar(medicion_nueva), 2),
+                'ciclo_sin_cambios_ms': round(cronometrar(planificador.ciclo), 2),
+            })
+            pool.cerrar()
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# Benchmark de la sección "Próximas Mediciones".
+# Compara el recorrido original (una consulta MAX(fecha) por paciente) con la consulta única
+# de proximas_mediciones, con una sala de 20 pacientes activas y un histórico creciente de altas.
+#
+# Uso: python -m benchmarks.bench_proximas_mediciones
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.comun import crear_bd_sintetica, cronometrar
+from esquema import aplicar_migraciones
+from proximas_mediciones import obtener_ultimas_mediciones, calcular_cuentas_regresivas
+
+PACIENTES_ACTIVAS = 20
+MEDICIONES_POR_PACIENTE = 40
+TAMANOS = [100, 1000, 5000, 20000]
+# Sin índice el recorrido original es cuadrático; solo se mide en los tamaños pequeños.
+MAX_PACIENTES_SIN_INDICE = 1000
+
+
+# Recorrido original de partoseguro_main.py, sin la parte de Streamlit.
+def barra_lateral_original(conn):
+    resultado = []
+    for paciente in conn.execute("SELECT id, nombre FROM pacientes").fetchall():
+        ultima = conn.execute("SELECT MAX(fecha) FROM mediciones WHERE id_paciente = ?", (paciente[0],)).fetchone()[0]
+        if ultima:
+            fecha = datetime.strptime(ultima, '%Y-%m-%d %H:%M:%S')
+            resultado.append((paciente[0], (datetime.now() - fecha).total_seconds()))
+    return resultado
+
+
+def barra_lateral_por_lotes(conn, solo_activos):
+    return calcular_cuentas_regresivas(obtener_ultimas_mediciones(conn, solo_activos=solo_activos))
+
+
+def main():
+    filas = []
+    for n in TAMANOS:
+        # Versión 1 del esquema: tablas base, todavía sin los índices de mediciones.
+        conn = crear_bd_sintetica(n, MEDICIONES_POR_PACIENTE, n_activas=PACIENTES_ACTIVAS, version_esquema=1)
+        sin_indice = None
+        if n <= MAX_PACIENTES_SIN_INDICE:
+            sin_indice = round(cronometrar(lambda: barra_lateral_original(conn), repeticiones=1), 2)
+        aplicar_migraciones(conn)
+        filas.append({
+            'pacientes': n,
+            'mediciones': n * MEDICIONES_POR_PACIENTE,
+            'original_sin_indice_ms': sin_indice,
+            'original_con_indice_ms': round(cronometrar(lambda: barra_lateral_original(conn)), 2),
+            'lote_todas_ms': round(cronometrar(lambda: barra_lateral_por_lotes(conn, False)), 2),
+            'lote_activas_ms': round(cronometrar(lambda: barra_lateral_por_lotes(conn, True)), 2),
+        })
+        conn.close()
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
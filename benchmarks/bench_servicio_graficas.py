@@ -0,0 +1,79 @@
+# Benchmark del servicio de gráficas.
+# Simula un rerun en el que cambiaron los datos de todas las pacientes de la sala, más una
+# paciente con una historia muy larga, y compara el renderizado en el hilo de la página
+# (trabajadores=0, como antes del servicio) con pools de distinto tamaño. Informa cuánto tiempo
+# queda bloqueada la página y cuánto tardan en estar listas todas las gráficas.
+#
+# Uso: python -m benchmarks.bench_servicio_graficas
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from almacen_mediciones import tipar_mediciones
+from benchmarks.comun import crear_bd_sintetica
+from servicio_graficas import ServicioGraficas
+
+PACIENTES = 24
+MEDICIONES_POR_PACIENTE = 48
+MEDICIONES_PACIENTE_LENTA = 20000
+TRABAJADORES = [0, 1, 2, 4]
+ESTILO = 'estandar'
+
+
+def historias_sala():
+    conn = crear_bd_sintetica(PACIENTES, MEDICIONES_POR_PACIENTE)
+    lenta = crear_bd_sintetica(1, MEDICIONES_PACIENTE_LENTA, semilla=1)
+    historias = {}
+    for origen in (conn, lenta):
+        for (id_paciente,) in origen.execute("SELECT id FROM pacientes"):
+            filas = origen.execute(
+                "SELECT id, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial, sistolica, "
+                "diastolica FROM mediciones WHERE id_paciente = ? ORDER BY fecha, id", (id_paciente,)
+            ).fetchall()
+            historias[f"{id_paciente}-{len(filas)}"] = tipar_mediciones(filas)
+    return historias
+
+
+def medir(historias, trabajadores, carpeta):
+    servicio = ServicioGraficas(carpeta=carpeta, trabajadores=trabajadores)
+    try:
+        # Los procesos arrancan con la primera gráfica; no se cuenta en el rerun medido.
+        servicio.obtener(('calentamiento', 0, ESTILO, None, None), next(iter(historias.values())), ESTILO)
+        while servicio.estadisticas()['en_cola']:
+            time.sleep(0.005)
+        inicio = time.perf_counter()
+        for id_paciente, df in historias.items():
+            servicio.obtener((id_paciente, int(df['id'].iloc[-1]), ESTILO, None, None), df, ESTILO)
+        pagina = time.perf_counter() - inicio
+        while servicio.estadisticas()['en_cola']:
+            time.sleep(0.005)
+        completo = time.perf_counter() - inicio
+        estadisticas = servicio.estadisticas()
+    finally:
+        servicio.cerrar()
+    return {
+        'trabajadores': trabajadores,
+        'pagina_bloqueada_ms': round(pagina * 1000, 1),
+        'graficas_listas_ms': round(completo * 1000, 1),
+        'render_medio_ms': estadisticas['render_medio_ms'],
+        'errores': estadisticas['errores'],
+    }
+
+
+def main():
+    historias = historias_sala()
+    filas = []
+    with tempfile.TemporaryDirectory() as directorio:
+        for trabajadores in TRABAJADORES:
+            if trabajadores > (os.cpu_count() or 1) * 2:
+                continue
+            filas.append(medir(historias, trabajadores, os.path.join(directorio, str(trabajadores))))
+    print(f"{len(historias)} gráficas por rerun ({PACIENTES} x {MEDICIONES_POR_PACIENTE} mediciones "
+          f"y una paciente con {MEDICIONES_PACIENTE_LENTA}), {os.cpu_count()} CPU")
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
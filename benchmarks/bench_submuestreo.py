@@ -0,0 +1,78 @@
+# Benchmark del submuestreo de series para las gráficas.
+# Genera historias densas (una medición por minuto, como las de un monitor fetal, con
+# desaceleraciones breves de la frecuencia cardíaca) y compara el dibujo con todos los puntos
+# frente a LTTB y a la decimación mínimo/máximo de submuestreo.py. Informa el tiempo de
+# renderizado y la fidelidad visual: porcentaje de píxeles distintos respecto de la gráfica
+# completa, error medio al interpolar la serie reducida y si se conservan el mínimo y el
+# máximo de la frecuencia cardíaca.
+#
+# Uso: python -m benchmarks.bench_submuestreo
+import io
+
+import numpy as np
+import pandas as pd
+from PIL import Image, ImageChops
+
+from benchmarks.comun import cronometrar
+from graficas import ESTILOS, renderizar_grafica
+from submuestreo import reducir_serie
+
+MEDICIONES = [1440, 10080, 43200]  # 1 día, 1 semana y 1 mes a una medición por minuto
+ESTILO = 'estandar'
+
+
+def historia_densa(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    frecuencia = 140 + np.cumsum(rng.normal(0, 0.3, n)).clip(-15, 15) + rng.normal(0, 3, n)
+    # Desaceleraciones de 3 minutos cada ~2 horas.
+    for inicio in rng.choice(n - 3, max(1, n // 120), replace=False):
+        frecuencia[inicio:inicio + 3] -= rng.uniform(30, 50)
+    return pd.DataFrame({
+        'id': np.arange(n),
+        'Fecha': pd.date_range('2024-01-01', periods=n, freq='min'),
+        'dilatacion': pd.array(np.minimum(10, 3 + np.arange(n) * 8 // n), dtype='Int64'),
+        'frecuencia_cardiaca': pd.array(frecuencia.round().astype(int), dtype='Int64'),
+        'contracciones': pd.array(rng.integers(2, 7, n), dtype='Int64'),
+    })
+
+
+def pixeles_distintos(png_a, png_b):
+    a = Image.open(io.BytesIO(png_a)).convert('L')
+    b = Image.open(io.BytesIO(png_b)).convert('L')
+    diferencia = np.asarray(ImageChops.difference(a, b))
+    return 100 * (diferencia > 32).mean()
+
+
+def fidelidad(df, metodo):
+    config = ESTILOS[ESTILO]
+    ancho_px = int(0.775 * config['figsize'][0] * config['dpi'])  # ancho del eje por defecto
+    valores = df['frecuencia_cardiaca'].astype('float64')
+    fechas_r, valores_r = reducir_serie(df['Fecha'], valores, ancho_px, metodo)
+    x = df['Fecha'].to_numpy().astype('int64')
+    interpolada = np.interp(x, fechas_r.to_numpy().astype('int64'), valores_r.to_numpy())
+    extremos = valores_r.min() == valores.min() and valores_r.max() == valores.max()
+    return len(valores_r), np.abs(interpolada - valores.to_numpy()).mean(), extremos
+
+
+def main():
+    filas = []
+    for n in MEDICIONES:
+        df = historia_densa(n)
+        completa = renderizar_grafica(df, ESTILO, submuestreo=None)
+        for metodo in [None, 'lttb', 'minmax']:
+            png = renderizar_grafica(df, ESTILO, submuestreo=metodo)
+            puntos, error, extremos = fidelidad(df, metodo) if metodo else (n, 0.0, True)
+            filas.append({
+                'mediciones': n,
+                'metodo': metodo or 'todos los puntos',
+                'puntos_fcf': puntos,
+                'render_ms': round(cronometrar(lambda: renderizar_grafica(df, ESTILO, submuestreo=metodo), repeticiones=3), 1),
+                'pixeles_distintos_%': round(pixeles_distintos(completa, png), 2),
+                'error_medio_lpm': round(error, 2),
+                'conserva_min_max': extremos,
+            })
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
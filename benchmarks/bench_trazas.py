@@ -0,0 +1,167 @@
+# Benchmark del almacén de trazas de cardiotocografía.
+# Guarda 24 horas de frecuencia cardíaca fetal y tocografía sintéticas a 4 Hz de una paciente de
+# dos formas: una fila por muestra (id_paciente, senal, fecha, valor) y los bloques comprimidos de
+# trazas_ctg.py. Informa bytes por hora de registro, tiempo de carga, lectura de las 24 horas y de
+# un tramo de 30 minutos (filas, bloques descomprimidos y copia mapeada en memoria, en frío y ya
+# creada), latencia de agregar 5 segundos de señal como hace un monitor y de volver a leer la
+# última media hora con la copia mapeada después de cada envío (la copia se actualiza desde su
+# último bloque), y tiempo de dibujar la traza completa y la última hora.
+#
+# Uso: python -m benchmarks.bench_trazas
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generador import generar_ctg, generar_sala
+from conexiones import PoolConexiones
+from graficas import renderizar_traza
+from trazas_ctg import BLOQUE_MINUTOS, FORMATO_FECHA, agregar_muestras, leer_traza, leer_traza_mapeada
+
+HORAS = 24
+FRECUENCIA_HZ = 4
+AGREGADOS = 200
+SEGUNDOS_POR_AGREGADO = 5
+REPETICIONES = 5
+INICIO = datetime(2026, 1, 1)
+ID_PACIENTE = '20000000'
+
+SQL_TABLA_FILAS = """
+CREATE TABLE muestras_ctg (
+    id_paciente TEXT NOT NULL,
+    senal TEXT NOT NULL,
+    fecha TIMESTAMP NOT NULL,
+    valor REAL,
+    PRIMARY KEY (id_paciente, senal, fecha)
+) WITHOUT ROWID
+"""
+SQL_LEER_FILAS = "SELECT fecha, valor FROM muestras_ctg WHERE id_paciente = ? AND senal = ? AND fecha >= ? AND fecha < ?"
+
+
+def tamano_bd(conn):
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return conn.execute("PRAGMA page_count").fetchone()[0] * conn.execute("PRAGMA page_size").fetchone()[0]
+
+
+def cronometrar(funcion, repeticiones=REPETICIONES):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return round(float(np.median(tiempos)), 2), resultado
+
+
+def cargar_filas(ruta, ctg):
+    conn = sqlite3.connect(ruta)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(SQL_TABLA_FILAS)
+    fechas = pd.date_range(INICIO, periods=len(ctg['fcf']), freq=pd.Timedelta(seconds=1 / FRECUENCIA_HZ))
+    # Con fracciones de segundo: cuatro muestras por segundo.
+    textos = fechas.strftime('%Y-%m-%d %H:%M:%S.%f').str[:-3].tolist()
+    inicio = time.perf_counter()
+    with conn:
+        for senal in ('fcf', 'toco'):
+            valores = [None if np.isnan(v) else round(float(v), 2) for v in ctg[senal]]
+            conn.executemany("INSERT INTO muestras_ctg VALUES (?, ?, ?, ?)",
+                             zip([ID_PACIENTE] * len(textos), [senal] * len(textos), textos, valores))
+    return conn, time.perf_counter() - inicio
+
+
+def leer_filas(conn, senal, desde, hasta):
+    filas = conn.execute(SQL_LEER_FILAS, (ID_PACIENTE, senal, desde.strftime(FORMATO_FECHA), hasta.strftime(FORMATO_FECHA))).fetchall()
+    return np.array([valor for _, valor in filas], dtype='float64')
+
+
+def cargar_bloques(pool, ctg):
+    por_bloque = BLOQUE_MINUTOS * 60 * FRECUENCIA_HZ
+    inicio = time.perf_counter()
+    for senal in ('fcf', 'toco'):
+        for desde in range(0, len(ctg[senal]), por_bloque):
+            agregar_muestras(pool, ID_PACIENTE, senal, INICIO + timedelta(seconds=desde / FRECUENCIA_HZ),
+                             ctg[senal][desde:desde + por_bloque], FRECUENCIA_HZ)
+    return time.perf_counter() - inicio
+
+
+def medir_agregados(pool, ctg, carpeta):
+    # Un monitor que sigue registrando después de las 24 horas, 5 segundos por envío; después de
+    # cada uno, el panel vuelve a leer la última media hora.
+    latencias, lecturas = [], []
+    por_agregado = SEGUNDOS_POR_AGREGADO * FRECUENCIA_HZ
+    fin = INICIO + timedelta(hours=HORAS)
+    for i in range(AGREGADOS):
+        valores = ctg['fcf'][i * por_agregado:(i + 1) * por_agregado]
+        inicio = time.perf_counter()
+        agregar_muestras(pool, ID_PACIENTE, 'fcf', fin + timedelta(seconds=i * SEGUNDOS_POR_AGREGADO), valores, FRECUENCIA_HZ)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        hasta = fin + timedelta(seconds=(i + 1) * SEGUNDOS_POR_AGREGADO)
+        inicio = time.perf_counter()
+        with pool.lectura() as conn:
+            leer_traza_mapeada(conn, ID_PACIENTE, 'fcf', hasta - timedelta(minutes=30), hasta, carpeta)
+        lecturas.append((time.perf_counter() - inicio) * 1000)
+    return np.percentile(latencias, [50, 99]), np.percentile(lecturas, [50, 99])
+
+def main():
+    ctg = generar_ctg(HORAS, FRECUENCIA_HZ)
+    filas = []
+    with tempfile.TemporaryDirectory() as directorio:
+        conn_filas, carga_filas = cargar_filas(os.path.join(directorio, 'filas.db'), ctg)
+        ruta = os.path.join(directorio, 'bloques.db')
+        generar_sala(ruta, 1, 1).close()
+        pool = PoolConexiones(ruta)
+        with pool.lectura() as conn:
+            base = tamano_bd(conn)
+        carga_bloques = cargar_bloques(pool, ctg)
+        with pool.escritura() as conn:
+            bloques = tamano_bd(conn) - base
+        filas.append({'almacenamiento': 'una fila por muestra', 'kb_por_hora': round(tamano_bd(conn_filas) / HORAS / 1024),
+                      'carga_24h_s': round(carga_filas, 2)})
+        filas.append({'almacenamiento': 'bloques comprimidos', 'kb_por_hora': round(bloques / HORAS / 1024),
+                      'carga_24h_s': round(carga_bloques, 2)})
+        print(f"{HORAS} h de FCF y tocografía a {FRECUENCIA_HZ} Hz ({len(ctg['fcf'])} muestras por señal)")
+        print(pd.DataFrame(filas).to_string(index=False))
+
+        lecturas = []
+        fin = INICIO + timedelta(hours=HORAS)
+        tramo = (fin - timedelta(minutes=30), fin)
+        carpeta = os.path.join(directorio, 'trazas')
+        with pool.lectura() as conn:
+            for nombre, desde, hasta in [('24 h', INICIO, fin), ('últimos 30 min', *tramo)]:
+                ms, _ = cronometrar(lambda: leer_filas(conn_filas, 'fcf', desde, hasta))
+                lecturas.append({'lectura': nombre, 'metodo': 'filas', 'ms': ms})
+                ms, _ = cronometrar(lambda: leer_traza(conn, ID_PACIENTE, 'fcf', desde, hasta))
+                lecturas.append({'lectura': nombre, 'metodo': 'bloques descomprimidos', 'ms': ms})
+                for archivo in os.listdir(carpeta) if os.path.isdir(carpeta) else []:
+                    os.remove(os.path.join(carpeta, archivo))
+                ms, _ = cronometrar(lambda: leer_traza_mapeada(conn, ID_PACIENTE, 'fcf', desde, hasta, carpeta), 1)
+                lecturas.append({'lectura': nombre, 'metodo': 'mapa de memoria (en frío)', 'ms': ms})
+                # Incluye convertir las muestras a unidades: sumar las muestras obliga a leer el tramo.
+                ms, _ = cronometrar(lambda: float(np.nansum(leer_traza_mapeada(conn, ID_PACIENTE, 'fcf', desde, hasta, carpeta).muestras)))
+                lecturas.append({'lectura': nombre, 'metodo': 'mapa de memoria', 'ms': ms})
+            traza_fcf = leer_traza_mapeada(conn, ID_PACIENTE, 'fcf', INICIO, fin, carpeta)
+            traza_toco = leer_traza_mapeada(conn, ID_PACIENTE, 'toco', INICIO, fin, carpeta)
+        print(pd.DataFrame(lecturas).to_string(index=False))
+
+        (p50, p99), (lectura_p50, lectura_p99) = medir_agregados(pool, ctg, carpeta)
+        print(f"Agregar {SEGUNDOS_POR_AGREGADO} s de señal ({AGREGADOS} envíos): p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+        print(f"Leer los últimos 30 min con la copia mapeada tras cada envío: p50 {lectura_p50:.2f} ms, p99 {lectura_p99:.2f} ms")
+
+        hora = pd.Timestamp(fin - timedelta(hours=1))
+        ultima_fcf = traza_fcf._replace(inicio=hora.to_pydatetime(), muestras=traza_fcf.muestras[-3600 * FRECUENCIA_HZ:])
+        ultima_toco = traza_toco._replace(inicio=hora.to_pydatetime(), muestras=traza_toco.muestras[-3600 * FRECUENCIA_HZ:])
+        dibujos = []
+        for nombre, fcf, toco in [('24 h', traza_fcf, traza_toco), ('última hora', ultima_fcf, ultima_toco)]:
+            for submuestreo in ('minmax', None):
+                ms, _ = cronometrar(lambda: renderizar_traza(fcf, toco, submuestreo=submuestreo), 3)
+                dibujos.append({'traza': nombre, 'submuestreo': submuestreo or 'todos los puntos', 'ms': ms})
+        print(pd.DataFrame(dibujos).to_string(index=False))
+        pool.cerrar()
+        conn_filas.close()
+
+
+if __name__ == '__main__':
+    main()
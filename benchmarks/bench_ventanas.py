@@ -0,0 +1,44 @@
+# Benchmark de las ventanas de visualización.
+# Mide el costo de armar el panel de un paciente (lectura en frío, diagnóstico y gráfica) con
+# toda la historia frente a las últimas 24 horas, según la duración del monitoreo, y el costo
+# del resumen por hora de la historia anterior a la ventana.
+#
+# Uso: python -m benchmarks.bench_ventanas
+import pandas as pd
+
+from almacen_mediciones import AlmacenMediciones
+from benchmarks.comun import crear_bd_sintetica, cronometrar
+from diagnostico import evaluar_mediciones
+from graficas import renderizar_grafica
+from ventanas import inicio_ventana, resumen_por_hora
+
+HISTORIAS = [48, 480, 4800, 48000]  # mediciones cada 30 minutos: de 1 día a casi 3 años
+HORAS_VENTANA = 24
+
+
+def panel(conn, id_paciente, desde):
+    mediciones_df = AlmacenMediciones().obtener(conn, id_paciente, desde=desde)
+    evaluar_mediciones(mediciones_df)
+    renderizar_grafica(mediciones_df, 'compacto')
+    return len(mediciones_df)
+
+
+def main():
+    filas = []
+    for n in HISTORIAS:
+        conn = crear_bd_sintetica(1, n)
+        id_paciente = conn.execute("SELECT id FROM pacientes").fetchone()[0]
+        desde = inicio_ventana(HORAS_VENTANA)
+        filas.append({
+            'mediciones': n,
+            'filas_en_ventana': panel(conn, id_paciente, desde),
+            'historia_completa_ms': round(cronometrar(lambda: panel(conn, id_paciente, None), repeticiones=3), 1),
+            f'ventana_{HORAS_VENTANA}h_ms': round(cronometrar(lambda: panel(conn, id_paciente, desde), repeticiones=3), 1),
+            'resumen_por_hora_ms': round(cronometrar(lambda: resumen_por_hora(conn, id_paciente, desde)), 1),
+        })
+        conn.close()
+    print(pd.DataFrame(filas).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
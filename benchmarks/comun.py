@@ -0,0 +1,53 @@
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from esquema import VERSION_ACTUAL, aplicar_migraciones
+
+# Función para crear una base de datos sintética con n_pacientes y n_mediciones por paciente.
+# Las primeras n_activas pacientes tienen mediciones recientes; el resto son altas antiguas.
+# version_esquema permite detener las migraciones antes, por ejemplo para medir sin índices.
+def crear_bd_sintetica(n_pacientes, n_mediciones, n_activas=None, ruta=':memory:', semilla=0,
+                       version_esquema=VERSION_ACTUAL):
+    rng = random.Random(semilla)
+    conn = sqlite3.connect(ruta)
+    aplicar_migraciones(conn, hasta=version_esquema)
+
+    ahora = datetime.now().replace(microsecond=0)
+    n_activas = n_pacientes if n_activas is None else n_activas
+    pacientes = []
+    mediciones = []
+    for i in range(n_pacientes):
+        id_paciente = f"{10000000 + i}"
+        pacientes.append((id_paciente, f"Paciente {i}", rng.randint(16, 45), '2023-01-01', 'Sin patologías'))
+        fin = ahora if i < n_activas else ahora - timedelta(days=rng.randint(2, 3 * 365))
+        inicio = fin - timedelta(minutes=30 * n_mediciones)
+        for j in range(n_mediciones):
+            fecha = inicio + timedelta(minutes=30 * (j + 1) - rng.randint(0, 10))
+            mediciones.append((
+                id_paciente,
+                fecha.strftime('%Y-%m-%d %H:%M:%S'),
+                min(10, 3 + j * 7 // max(n_mediciones, 1)),
+                rng.randint(100, 170),
+                rng.randint(2, 6),
+                f"{rng.randint(100, 150)}/{rng.randint(60, 95)}",
+            ))
+    conn.executemany("INSERT INTO pacientes (id, nombre, edad, fum, patologia) VALUES (?, ?, ?, ?, ?)", pacientes)
+    conn.executemany(
+        "INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        mediciones,
+    )
+    conn.commit()
+    return conn
+
+# Función para medir la mediana en milisegundos de varias ejecuciones de una función.
+def cronometrar(funcion, repeticiones=5):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return tiempos[len(tiempos) // 2]
@@ -0,0 +1,201 @@
+# Generador de salas sintéticas realistas para benchmarks y pruebas de carga.
+# Cada paciente tiene una curva de trabajo de parto: fase latente lenta hasta 6 cm y fase activa
+# más rápida hasta 10 cm, frecuencia cardíaca fetal alrededor de una línea de base propia con
+# episodios de bradicardia o taquicardia, contracciones que aumentan con la dilatación y
+# presión arterial normal o hipertensa, con algún error de registro ocasional.
+#
+# Uso: python -m benchmarks.generador sala.db --pacientes 200 --mediciones 48 [--activas 40]
+import argparse
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from esquema import VERSION_ACTUAL, aplicar_migraciones
+
+NOMBRES = ['María', 'Laura', 'Ana', 'Lucía', 'Camila', 'Valentina', 'Daniela', 'Sofía', 'Paula', 'Carolina',
+           'Andrea', 'Natalia', 'Juliana', 'Isabella', 'Mariana', 'Gabriela', 'Diana', 'Alejandra']
+APELLIDOS = ['García', 'Rodríguez', 'Martínez', 'López', 'González', 'Pérez', 'Sánchez', 'Ramírez', 'Torres',
+             'Díaz', 'Vásquez', 'Herazo', 'Oviedo', 'Castro', 'Morales', 'Rojas', 'Gómez', 'Jiménez']
+# Patologías de base y su frecuencia aproximada.
+PATOLOGIAS = {
+    'Sin patologías': 0.70, 'Hipertensión': 0.08, 'Preeclampsia': 0.05,
+    'Diabetes Gestacional': 0.08, 'Anemia': 0.06, 'Tiroides': 0.03,
+}
+MINUTOS_ENTRE_MEDICIONES = 30
+PROBABILIDAD_ERROR_PA = 0.01
+PROBABILIDAD_EPISODIO_FCF = 0.03
+
+# Curva de dilatación de una paciente: fase latente hasta 6 cm y fase activa hasta 10 cm.
+def _curva_dilatacion(rng, horas):
+    inicial = rng.uniform(1, 4)
+    latente = rng.uniform(0.2, 0.6)   # cm/h
+    activa = rng.uniform(0.8, 2.0)    # cm/h
+    horas_latente = max(0.0, (6 - inicial) / latente)
+    dilatacion = np.where(
+        horas < horas_latente,
+        inicial + latente * horas,
+        6 + activa * (horas - horas_latente),
+    )
+    return np.clip(np.round(dilatacion + rng.normal(0, 0.3, len(horas))), 0, 10).astype(int)
+
+# Mediciones de una paciente: lista de tuplas (id_paciente, fecha, dilatacion, fcf, contracciones, pa).
+def _mediciones_paciente(rng, id_paciente, fin, n_mediciones, hipertensa):
+    minutos = MINUTOS_ENTRE_MEDICIONES * np.arange(n_mediciones) + rng.integers(-5, 6, n_mediciones)
+    inicio = fin - timedelta(minutes=MINUTOS_ENTRE_MEDICIONES * n_mediciones)
+    horas = np.maximum(minutos, 0) / 60
+    dilatacion = _curva_dilatacion(rng, horas)
+
+    base_fcf = np.clip(rng.normal(140, 8), 115, 155)
+    fcf = base_fcf + rng.normal(0, 5, n_mediciones)
+    episodios = rng.random(n_mediciones) < PROBABILIDAD_EPISODIO_FCF
+    fcf[episodios] += rng.choice([-40, 30], episodios.sum())
+    fcf = np.clip(np.round(fcf), 60, 200).astype(int)
+
+    contracciones = np.clip(np.round(2 + 0.35 * dilatacion + rng.normal(0, 0.8, n_mediciones)), 0, 8).astype(int)
+
+    media_sis, media_dia = (148, 96) if hipertensa else (116, 74)
+    sistolica = np.round(rng.normal(media_sis, 10, n_mediciones)).astype(int)
+    diastolica = np.round(rng.normal(media_dia, 7, n_mediciones)).astype(int)
+    presiones = [f"{s}/{d}" for s, d in zip(sistolica, diastolica)]
+    for i in np.flatnonzero(rng.random(n_mediciones) < PROBABILIDAD_ERROR_PA):
+        presiones[i] = rng.choice(['', f"{sistolica[i]}{diastolica[i]}", f"{sistolica[i]}-{diastolica[i]}"])
+
+    return [
+        (id_paciente, (inicio + timedelta(minutes=int(m))).strftime('%Y-%m-%d %H:%M:%S'),
+         int(d), int(f), int(c), p)
+        for m, d, f, c, p in zip(minutos, dilatacion, fcf, contracciones, presiones)
+    ]
+
+# Pulso con forma de campana (coseno elevado) de duración muestras, con valor máximo 1.
+def _campana(duracion):
+    return np.sin(np.linspace(0, np.pi, max(int(duracion), 2))) ** 2
+
+# Función para generar una cardiotocografía sintética de horas horas a frecuencia_hz.
+# Tocografía: tono basal con deriva lenta, contracciones en campana cada 2 a 5 minutos (de 60 a
+# 90 s y 30 a 60 unidades) y algún artefacto breve por movimiento materno. Frecuencia cardíaca
+# fetal: línea de base propia que deriva unos lpm en horas, variabilidad de corto plazo (ruido
+# suavizado), aceleraciones de 15 a 25 lpm cada 10 a 30 minutos y desaceleraciones tempranas o
+# tardías con parte de las contracciones. Hay pérdidas de señal de 10 a 60 s (NaN).
+# Devuelve un diccionario con las señales 'fcf' y 'toco' (float64) y los eventos generados, en
+# índices de muestra: 'contracciones' (picos), 'aceleraciones' y 'desaceleraciones' (inicios),
+# más 'linea_base' (la línea de base sin eventos).
+def generar_ctg(horas, frecuencia_hz=4, semilla=0):
+    rng = np.random.default_rng(semilla)
+    n = int(horas * 3600 * frecuencia_hz)
+    segundos = np.arange(n) / frecuencia_hz
+
+    toco = 12 + 4 * np.sin(2 * np.pi * segundos / 5400 + rng.uniform(0, 2 * np.pi))
+    picos = []
+    inicio = rng.uniform(30, 120) * frecuencia_hz
+    duraciones = {}
+    while True:
+        duracion = int(rng.uniform(60, 90) * frecuencia_hz)
+        if inicio + duracion >= n:
+            break
+        desde = int(inicio)
+        toco[desde:desde + duracion] += rng.uniform(30, 60) * _campana(duracion)
+        picos.append(desde + duracion // 2)
+        duraciones[picos[-1]] = duracion
+        inicio += rng.uniform(120, 300) * frecuencia_hz
+    for desde in rng.integers(0, n - 40 * frecuencia_hz, max(1, int(horas * 2))):
+        duracion = int(rng.uniform(3, 8) * frecuencia_hz)
+        toco[desde:desde + duracion] += rng.uniform(20, 40) * _campana(duracion)
+    toco += rng.normal(0, 1.5, n)
+
+    deriva = np.cumsum(rng.normal(0, 1, n))
+    deriva = 3 * (deriva - deriva.mean()) / (np.abs(deriva - deriva.mean()).max() or 1)
+    linea_base = np.clip(rng.normal(138, 6), 120, 155) + deriva
+    suavizado = np.ones(int(2 * frecuencia_hz)) / (2 * frecuencia_hz)
+    variabilidad = np.convolve(rng.normal(0, 1, n), suavizado, mode='same')
+    variabilidad *= rng.uniform(2.5, 5) / variabilidad.std()
+    fcf = linea_base + variabilidad
+
+    aceleraciones = []
+    inicio = rng.uniform(5, 20) * 60 * frecuencia_hz
+    while inicio + 40 * frecuencia_hz < n:
+        duracion = int(rng.uniform(20, 40) * frecuencia_hz)
+        desde = int(inicio)
+        fcf[desde:desde + duracion] += rng.uniform(15, 25) * _campana(duracion)
+        aceleraciones.append(desde)
+        inicio += rng.uniform(10, 30) * 60 * frecuencia_hz
+    desaceleraciones = []
+    for pico in picos:
+        if rng.random() < 0.25:
+            duracion = duraciones[pico]
+            retraso = int(rng.choice([0, rng.uniform(20, 30)]) * frecuencia_hz)
+            desde = pico - duracion // 2 + retraso
+            if desde + duracion < n:
+                fcf[desde:desde + duracion] -= rng.uniform(20, 40) * _campana(duracion)
+                desaceleraciones.append(desde)
+
+    for desde in rng.integers(0, n - 60 * frecuencia_hz, max(1, int(horas))):
+        duracion = int(rng.uniform(10, 60) * frecuencia_hz)
+        fcf[desde:desde + duracion] = np.nan
+        toco[desde:desde + duracion] = np.nan
+    return {
+        'fcf': np.clip(fcf, 50, 240),
+        'toco': np.clip(toco, 0, 100),
+        'contracciones': np.array(picos, dtype=np.int64),
+        'aceleraciones': np.array(aceleraciones, dtype=np.int64),
+        'desaceleraciones': np.array(desaceleraciones, dtype=np.int64),
+        'linea_base': linea_base,
+    }
+
+# Función para generar una sala con n_pacientes y n_mediciones por paciente.
+# Las primeras n_activas pacientes (todas, por defecto) están en trabajo de parto ahora; el
+# resto son altas de los últimos meses, con el episodio finalizado. Devuelve la conexión abierta.
+def generar_sala(ruta, n_pacientes, n_mediciones, n_activas=None, semilla=0, version_esquema=VERSION_ACTUAL):
+    rng = np.random.default_rng(semilla)
+    conn = sqlite3.connect(ruta)
+    aplicar_migraciones(conn, hasta=version_esquema)
+
+    ahora = datetime.now().replace(microsecond=0)
+    n_activas = n_pacientes if n_activas is None else n_activas
+    patologias = rng.choice(list(PATOLOGIAS), n_pacientes, p=list(PATOLOGIAS.values()))
+    pacientes = []
+    mediciones = []
+    finalizados = []
+    for i in range(n_pacientes):
+        id_paciente = str(20000000 + i)
+        fin = ahora - timedelta(minutes=int(rng.integers(0, 25))) if i < n_activas else ahora - timedelta(days=int(rng.integers(2, 180)))
+        fum = (fin - timedelta(days=int(rng.integers(259, 294)))).date().isoformat()
+        nombre = f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)}"
+        pacientes.append((id_paciente, nombre, int(rng.integers(16, 45)), fum, str(patologias[i])))
+        hipertensa = patologias[i] in ('Hipertensión', 'Preeclampsia') or rng.random() < 0.03
+        mediciones.extend(_mediciones_paciente(rng, id_paciente, fin, n_mediciones, hipertensa))
+        if i >= n_activas:
+            finalizados.append(((fin + timedelta(hours=int(rng.integers(1, 6)))).strftime('%Y-%m-%d %H:%M:%S'), id_paciente))
+
+    conn.executemany("INSERT INTO pacientes (id, nombre, edad, fum, patologia) VALUES (?, ?, ?, ?, ?)", pacientes)
+    conn.executemany(
+        "INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        mediciones,
+    )
+    # Las altas son episodios de parto ya finalizados (desde la versión 8 del esquema).
+    if version_esquema >= 8:
+        conn.executemany(
+            "UPDATE pacientes SET estado_episodio = 'finalizado', fecha_finalizacion = ? WHERE id = ?", finalizados
+        )
+    conn.commit()
+    return conn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera una base de datos de sala sintética para PartoSeguro.")
+    parser.add_argument('destino', help="Archivo .db a crear")
+    parser.add_argument('--pacientes', type=int, default=50)
+    parser.add_argument('--mediciones', type=int, default=48, help="Mediciones por paciente")
+    parser.add_argument('--activas', type=int, help="Pacientes en trabajo de parto ahora (por defecto, todas)")
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    if os.path.exists(args.destino):
+        parser.exit(1, f"Error: {args.destino} ya existe\n")
+    generar_sala(args.destino, args.pacientes, args.mediciones, args.activas, args.semilla).close()
+    print(f"Sala generada en {args.destino}: {args.pacientes} pacientes x {args.mediciones} mediciones")
+
+
+if __name__ == '__main__':
+    main()
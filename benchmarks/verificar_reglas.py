@@ -0,0 +1,99 @@
+# Verificación de las reglas de diagnóstico en SQL frente a las de pandas.
+# Escribe mediciones en los límites de cada umbral de umbrales.py (un valor por debajo, el
+# umbral y uno por encima), con valores nulos, texto libre y presiones mal escritas, más una sala
+# sintética, y compara el diagnóstico y la severidad que calculan los triggers de
+# estado_paciente (esquema._REGLAS_SQL) con evaluar_mediciones sobre las mismas filas, leyendo la
+# presión ya separada y también interpretando el texto. Termina con error si alguna fila difiere.
+#
+# Uso: python -m benchmarks.verificar_reglas
+import itertools
+import sqlite3
+import sys
+
+import pandas as pd
+
+import umbrales
+from benchmarks.comun import crear_bd_sintetica
+from diagnostico import evaluar_mediciones
+from esquema import aplicar_migraciones
+
+# Diagnóstico de estado_paciente junto a la medición de la que sale.
+SQL_ESTADO_Y_MEDICION = """
+SELECT e.id_paciente, e.diagnostico, e.severidad, m.dilatacion, m.frecuencia_cardiaca,
+       m.contracciones, m.presion_arterial, e.sistolica, e.diastolica
+FROM estado_paciente e
+JOIN mediciones m ON m.id = e.id_medicion
+"""
+
+
+# Valores a un lado y otro de cada umbral.
+def _alrededor(*umbrales_):
+    return sorted({valor for umbral in umbrales_ for valor in (umbral - 1, umbral, umbral + 1)})
+
+
+# Presiones arteriales en los límites de hipertensión e hipotensión, con los formatos que
+# aceptan (espacios) o rechazan (texto, falta un número) las dos interpretaciones.
+def _presiones():
+    sistolicas = _alrededor(umbrales.SISTOLICA_HIPOTENSION, umbrales.SISTOLICA_HIPERTENSION) + [120]
+    diastolicas = _alrededor(umbrales.DIASTOLICA_HIPOTENSION, umbrales.DIASTOLICA_HIPERTENSION) + [75]
+    validas = [f"{sistolica}/{diastolica}" for sistolica, diastolica in itertools.product(sistolicas, diastolicas)]
+    return validas + [' 120 / 80 ', '120/', '/80', '120-80', 'abc', '', None]
+
+
+# Base de datos con una paciente por combinación de valores en los límites de los umbrales.
+def crear_bd_limites():
+    conn = sqlite3.connect(':memory:')
+    aplicar_migraciones(conn)
+    combinaciones = itertools.product(
+        _alrededor(umbrales.DILATACION_LENTA, umbrales.DILATACION_COMPLETA) + [None, 'sin dato'],
+        _alrededor(umbrales.FCF_BRADICARDIA, umbrales.FCF_TAQUICARDIA) + [None, 'sin dato'],
+        _alrededor(umbrales.CONTRACCIONES_INSUFICIENTES, umbrales.CONTRACCIONES_FRECUENTES) + [None, 'sin dato'],
+        _presiones(),
+    )
+    pacientes = []
+    mediciones = []
+    for i, valores in enumerate(combinaciones):
+        pacientes.append((f"{10000000 + i}", f"Paciente {i}"))
+        mediciones.append((f"{10000000 + i}", '2024-01-01 08:00:00', *valores))
+    conn.executemany("INSERT INTO pacientes (id, nombre) VALUES (?, ?)", pacientes)
+    conn.executemany(
+        "INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        mediciones,
+    )
+    conn.commit()
+    return conn
+
+
+# Filas en las que el diagnóstico de estado_paciente y el de evaluar_mediciones difieren.
+def discrepancias(conn, separar_presion):
+    filas = pd.read_sql_query(SQL_ESTADO_Y_MEDICION, conn)
+    # Las mismas conversiones que triage_sala.
+    for columna in ['dilatacion', 'frecuencia_cardiaca', 'contracciones', 'sistolica', 'diastolica']:
+        filas[columna] = pd.to_numeric(filas[columna], errors='coerce').astype('Int64')
+    mediciones = filas.drop(columns=['sistolica', 'diastolica']) if separar_presion else filas
+    evaluadas = evaluar_mediciones(mediciones.drop(columns=['diagnostico', 'severidad']))
+    distintas = (filas['diagnostico'] != evaluadas['diagnostico']) | (filas['severidad'] != evaluadas['severidad'])
+    return filas[distintas].join(evaluadas.loc[distintas, ['diagnostico', 'severidad']], rsuffix='_pandas')
+
+
+def main():
+    resultados = []
+    errores = []
+    for escenario, conn in [('límites', crear_bd_limites()), ('sala sintética', crear_bd_sintetica(500, 48))]:
+        for presion, separar in [('separada', False), ('texto', True)]:
+            diferentes = discrepancias(conn, separar)
+            n_filas = conn.execute("SELECT COUNT(*) FROM estado_paciente").fetchone()[0]
+            resultados.append({'escenario': escenario, 'presion': presion, 'filas': n_filas, 'discrepancias': len(diferentes)})
+            if not diferentes.empty:
+                errores.append(diferentes.assign(escenario=escenario, presion=presion))
+        conn.close()
+    print(pd.DataFrame(resultados).to_string(index=False))
+    if errores:
+        print()
+        print(pd.concat(errores).head(20).to_string(index=False))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+import re
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from proximas_mediciones import HORAS_ACTIVIDAD
+
+# Resultados que devuelve una búsqueda: suficientes para elegir en una lista desplegable sin
+# tener que mostrar todo el censo.
+LIMITE_RESULTADOS = 20
+
+COLUMNAS_RESULTADO = ['id', 'nombre', 'edad', 'patologia', 'ultima_fecha']
+
+# Búsqueda en el índice FTS5 (ver la migración 7 de esquema.py), de mejor a peor coincidencia.
+SQL_BUSCAR = """
+SELECT p.id, p.nombre, p.edad, p.patologia, e.ultima_fecha
+FROM pacientes_busqueda b
+JOIN pacientes p ON p.rowid = b.rowid
+LEFT JOIN estado_paciente e ON e.id_paciente = p.id
+WHERE pacientes_busqueda MATCH ?
+"""
+
+# Sin texto: las pacientes con el episodio de parto activo ingresadas más recientemente, o las
+# medidas más recientemente si solo se quieren las activas. Ambas recorren un índice y se detienen
+# en el límite.
+SQL_RECIENTES = """
+SELECT p.id, p.nombre, p.edad, p.patologia, e.ultima_fecha
+FROM pacientes p
+LEFT JOIN estado_paciente e ON e.id_paciente = p.id
+WHERE p.estado_episodio = 'activo'
+ORDER BY p.rowid DESC
+LIMIT ?
+"""
+
+SQL_RECIENTES_ACTIVAS = """
+SELECT p.id, p.nombre, p.edad, p.patologia, e.ultima_fecha
+FROM estado_paciente e
+JOIN pacientes p ON p.id = e.id_paciente
+WHERE e.ultima_fecha >= ? AND p.estado_episodio = 'activo'
+ORDER BY e.ultima_fecha DESC
+LIMIT ?
+"""
+
+# Función para convertir lo que escribe el usuario en una consulta FTS5: cada palabra se busca
+# como prefijo y todas deben aparecer ("mar gar" encuentra a "María García"). Los caracteres
+# especiales de FTS5 se descartan, así que el texto nunca produce una consulta inválida.
+def consulta_fts(texto):
+    palabras = re.findall(r'\w+', texto or '')
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+# Función para buscar pacientes por id, nombre o patología, con a lo sumo `limite` resultados.
+# Con solo_activos=True solo devuelve pacientes con el episodio de parto activo y medidas en las
+# últimas horas_actividad horas; la búsqueda por texto sin ese filtro también encuentra episodios
+# finalizados (para el gestor y la historia clínica).
+# Devuelve un DataFrame con las columnas de COLUMNAS_RESULTADO.
+def buscar_pacientes(conn, texto, limite=LIMITE_RESULTADOS, solo_activos=False,
+                     horas_actividad=HORAS_ACTIVIDAD, ahora=None):
+    consulta = consulta_fts(texto)
+    desde = None
+    if solo_activos:
+        desde = ((ahora or datetime.now()) - timedelta(hours=horas_actividad)).strftime('%Y-%m-%d %H:%M:%S')
+    if not consulta:
+        if desde is None:
+            filas = conn.execute(SQL_RECIENTES, (limite,)).fetchall()
+        else:
+            filas = conn.execute(SQL_RECIENTES_ACTIVAS, (desde, limite)).fetchall()
+    else:
+        sql, parametros = SQL_BUSCAR, [consulta]
+        if desde is not None:
+            sql += "AND e.ultima_fecha >= ? AND p.estado_episodio = 'activo'\n"
+            parametros.append(desde)
+        filas = conn.execute(sql + "ORDER BY b.rank LIMIT ?", parametros + [limite]).fetchall()
+    return pd.DataFrame(filas, columns=COLUMNAS_RESULTADO)
+
+# Función para mostrar una paciente en una lista de resultados.
+def etiqueta_paciente(fila):
+    return f"{fila['id']} - {fila['nombre']}"
+
+# Función para reconstruir el índice de búsqueda desde la tabla pacientes. Los triggers lo
+# mantienen al día; solo hace falta si cambian los rowid de pacientes (por ejemplo, tras un
+# VACUUM) o si se escribió en la base con los triggers desactivados.
+def reconstruir_indice(conn):
+    conn.execute("INSERT INTO pacientes_busqueda (pacientes_busqueda) VALUES ('rebuild')")
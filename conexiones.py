@@ -0,0 +1,270 @@
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as TiempoAgotado
+from contextlib import contextmanager
+
+import esquema
+
+# Configuración por defecto del pool de conexiones.
+LECTORES_MAXIMOS = 4
+BUSY_TIMEOUT_MS = 5000
+ESPERA_MAXIMA_S = 30
+# Cola de escrituras: el escritor confirma en una sola transacción todas las escrituras que
+# esperan en la cola (hasta MAX_ESCRITURAS_GRUPO), más las que lleguen en ESPERA_GRUPO_MS. Con 0
+# no espera: los grupos se forman con lo que llega mientras se confirma el grupo anterior, que
+# en las pruebas rindió más que esperar 1 o 2 ms.
+ESPERA_GRUPO_MS = 0
+MAX_ESCRITURAS_GRUPO = 256
+# Commits cuya latencia se guarda para los percentiles de metricas().
+MUESTRAS_COMMIT = 1000
+
+# Pool de conexiones SQLite compartido por todas las sesiones de un proceso.
+# Usa el modo WAL para que las lecturas no bloqueen a la escritura (ni al revés), varias
+# conexiones de solo lectura que se reparten entre hilos y una única conexión de escritura
+# protegida por un lock, de modo que las escrituras del proceso nunca compiten entre sí por el
+# bloqueo de la base de datos. busy_timeout cubre la espera frente a otros procesos.
+# Las escrituras cortas (las funciones CRUD de las aplicaciones) van por escribir(): un hilo
+# escritor las toma de una cola y confirma las que llegaron juntas en una sola transacción, cada
+# una dentro de su SAVEPOINT para que el error de una no revierta a las demás. Las operaciones
+# por lotes (importación, archivo) usan escritura() directamente; ambas comparten el lock de la
+# conexión de escritura.
+# Con wal=False no se cambia el modo de diario del archivo: para bases ajenas, que no deben quedar
+# en WAL para siempre ni con archivos -wal y -shm al lado; las lecturas y la escritura se esperan
+# entonces entre sí (busy_timeout).
+class PoolConexiones:
+    def __init__(self, ruta, lectores_maximos=LECTORES_MAXIMOS, busy_timeout_ms=BUSY_TIMEOUT_MS, migrar=True,
+                 espera_grupo_ms=ESPERA_GRUPO_MS, max_escrituras_grupo=MAX_ESCRITURAS_GRUPO, wal=True):
+        self.ruta = ruta
+        self.lectores_maximos = lectores_maximos
+        self.busy_timeout_ms = busy_timeout_ms
+        self.migrar = migrar
+        self.wal = wal
+        self.espera_grupo_s = espera_grupo_ms / 1000
+        self.max_escrituras_grupo = max_escrituras_grupo
+        self._lectores = queue.LifoQueue()
+        self._lectores_creados = 0
+        self._conexiones = []
+        self._traza = None
+        self._lock_creacion = threading.Lock()
+        self._lock_escritura = threading.Lock()
+        self._lock_metricas = threading.Lock()
+        self._metricas = {
+            'lectura': {'solicitudes': 0, 'espera_total_ms': 0.0, 'espera_max_ms': 0.0},
+            'escritura': {'solicitudes': 0, 'espera_total_ms': 0.0, 'espera_max_ms': 0.0},
+        }
+        self._cola_escrituras = queue.Queue()
+        self._hilo_escritor = None
+        self._grupos = 0
+        self._escrituras_agrupadas = 0
+        self._escrituras_fallidas = 0
+        self._commit_ms = deque(maxlen=MUESTRAS_COMMIT)
+        self._escritor = self._abrir(solo_lectura=False)
+
+    def _abrir(self, solo_lectura):
+        if self.migrar:
+            conn = esquema.conectar(self.ruta, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.ruta, check_same_thread=False)
+            conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        if not solo_lectura:
+            if self.wal:
+                # WAL es persistente en el archivo; basta con activarlo desde la conexión de escritura.
+                conn.execute("PRAGMA journal_mode = WAL")
+                conn.execute("PRAGMA synchronous = NORMAL")
+        else:
+            conn.execute("PRAGMA query_only = ON")
+        if self._traza is not None:
+            conn.set_trace_callback(self._traza)
+        self._conexiones.append(conn)
+        return conn
+
+    def _registrar_espera(self, tipo, inicio):
+        espera_ms = (time.perf_counter() - inicio) * 1000
+        with self._lock_metricas:
+            metricas = self._metricas[tipo]
+            metricas['solicitudes'] += 1
+            metricas['espera_total_ms'] += espera_ms
+            metricas['espera_max_ms'] = max(metricas['espera_max_ms'], espera_ms)
+
+    def _tomar_lector(self):
+        try:
+            return self._lectores.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock_creacion:
+            if self._lectores_creados < self.lectores_maximos:
+                self._lectores_creados += 1
+                return self._abrir(solo_lectura=True)
+        try:
+            return self._lectores.get(timeout=ESPERA_MAXIMA_S)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"No hay conexiones de lectura libres para {self.ruta} tras {ESPERA_MAXIMA_S} s"
+            )
+
+    # Conexión de solo lectura, devuelta al pool al salir del bloque.
+    @contextmanager
+    def lectura(self):
+        inicio = time.perf_counter()
+        conn = self._tomar_lector()
+        self._registrar_espera('lectura', inicio)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._lectores.put(conn)
+
+    # Conexión de escritura exclusiva: confirma al salir del bloque o revierte si hubo un error.
+    @contextmanager
+    def escritura(self):
+        inicio = time.perf_counter()
+        if not self._lock_escritura.acquire(timeout=ESPERA_MAXIMA_S):
+            raise sqlite3.OperationalError(f"La conexión de escritura de {self.ruta} sigue ocupada tras {ESPERA_MAXIMA_S} s")
+        self._registrar_espera('escritura', inicio)
+        try:
+            yield self._escritor
+            self._escritor.commit()
+        except BaseException:
+            self._escritor.rollback()
+            raise
+        finally:
+            self._lock_escritura.release()
+
+    # Encola una escritura y devuelve un Future con su resultado, que se resuelve cuando la
+    # transacción de su grupo ya está confirmada. operacion es una sentencia SQL (el resultado es
+    # el número de filas afectadas) o una función que recibe la conexión de escritura y hace
+    # varias sentencias (el resultado es lo que devuelva; no debe confirmar ni revertir la
+    # transacción). Si la escritura falla, el Future tiene
+    # la excepción y las demás escrituras del grupo se confirman igual.
+    def encolar(self, operacion, parametros=()):
+        futuro = Future()
+        with self._lock_creacion:
+            if self._hilo_escritor is None:
+                self._hilo_escritor = threading.Thread(target=self._bucle_escritor, name='escritor-sqlite', daemon=True)
+                self._hilo_escritor.start()
+        self._cola_escrituras.put((operacion, parametros, futuro))
+        return futuro
+
+    # Escritura por la cola: espera la confirmación y devuelve el resultado o lanza la excepción
+    # de esa escritura (por ejemplo, sqlite3.IntegrityError).
+    def escribir(self, operacion, parametros=()):
+        try:
+            return self.encolar(operacion, parametros).result(timeout=ESPERA_MAXIMA_S)
+        except TiempoAgotado:
+            raise sqlite3.OperationalError(f"La escritura en {self.ruta} no se confirmó tras {ESPERA_MAXIMA_S} s")
+
+    def _bucle_escritor(self):
+        while True:
+            grupo = [self._cola_escrituras.get()]
+            if grupo[0] is None:
+                return
+            limite = time.perf_counter() + self.espera_grupo_s
+            while len(grupo) < self.max_escrituras_grupo:
+                try:
+                    escritura = self._cola_escrituras.get(timeout=max(0.0, limite - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if escritura is None:
+                    self._cola_escrituras.put(None)
+                    break
+                grupo.append(escritura)
+            self._confirmar_grupo(grupo)
+
+    def _confirmar_grupo(self, grupo):
+        resultados = []
+        inicio = time.perf_counter()
+        try:
+            with self.escritura() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                for operacion, parametros, futuro in grupo:
+                    if not futuro.set_running_or_notify_cancel():
+                        continue
+                    conn.execute("SAVEPOINT escritura")
+                    try:
+                        resultado = operacion(conn) if callable(operacion) else conn.execute(operacion, parametros).rowcount
+                    except Exception as e:
+                        conn.execute("ROLLBACK TO escritura")
+                        conn.execute("RELEASE escritura")
+                        resultados.append((futuro, None, e))
+                    else:
+                        conn.execute("RELEASE escritura")
+                        resultados.append((futuro, resultado, None))
+        except Exception as e:
+            # No se pudo confirmar la transacción (por ejemplo, la base está bloqueada por otro
+            # proceso): ninguna escritura del grupo quedó guardada.
+            resultados = [(futuro, None, e) for _, _, futuro in grupo if not futuro.cancelled()]
+        commit_ms = (time.perf_counter() - inicio) * 1000
+        with self._lock_metricas:
+            self._grupos += 1
+            self._escrituras_agrupadas += len(resultados)
+            self._escrituras_fallidas += sum(error is not None for _, _, error in resultados)
+            self._commit_ms.append(commit_ms)
+        for futuro, resultado, error in resultados:
+            if error is None:
+                futuro.set_result(resultado)
+            else:
+                futuro.set_exception(error)
+
+    # Registra una función que recibe el texto de cada sentencia SQL que ejecuten las conexiones
+    # del pool, actuales y futuras (sqlite3 set_trace_callback); con None se deja de trazar.
+    # Sirve para contar consultas en benchmarks y perfiles.
+    def trazar(self, funcion):
+        with self._lock_creacion:
+            self._traza = funcion
+            for conn in self._conexiones:
+                conn.set_trace_callback(funcion)
+
+    def metricas(self):
+        with self._lock_metricas:
+            resultado = {}
+            for tipo, metricas in self._metricas.items():
+                resultado[tipo] = dict(metricas)
+                resultado[tipo]['espera_media_ms'] = (
+                    metricas['espera_total_ms'] / metricas['solicitudes'] if metricas['solicitudes'] else 0.0
+                )
+            commits = sorted(self._commit_ms)
+            resultado['cola_escritura'] = {
+                'en_cola': self._cola_escrituras.qsize(),
+                'grupos': self._grupos,
+                'escrituras': self._escrituras_agrupadas,
+                'escrituras_fallidas': self._escrituras_fallidas,
+                'escrituras_por_grupo': round(self._escrituras_agrupadas / self._grupos, 2) if self._grupos else 0.0,
+                'commit_p50_ms': round(commits[len(commits) // 2], 2) if commits else 0.0,
+                'commit_p95_ms': round(commits[int(len(commits) * 0.95)], 2) if commits else 0.0,
+                'commit_max_ms': round(commits[-1], 2) if commits else 0.0,
+            }
+        resultado['lectores_creados'] = self._lectores_creados
+        resultado['lectores_libres'] = self._lectores.qsize()
+        return resultado
+
+    def cerrar(self):
+        # Las escrituras ya encoladas se confirman antes de cerrar la conexión.
+        if self._hilo_escritor is not None:
+            self._cola_escrituras.put(None)
+            self._hilo_escritor.join()
+        while True:
+            try:
+                self._lectores.get_nowait().close()
+            except queue.Empty:
+                break
+        self._escritor.close()
+
+# Pools abiertos en el proceso, uno por archivo de base de datos.
+_pools = {}
+_lock_pools = threading.Lock()
+
+# Función para obtener el pool de una base de datos, creándolo la primera vez.
+# Con migrar=False no se aplican las migraciones de partoseguro.db, y con wal=False no se pasa el
+# archivo a modo WAL (por ejemplo, en db_manager.py, que abre cualquier archivo .db).
+def obtener_pool(ruta='partoseguro.db', migrar=True, wal=True):
+    with _lock_pools:
+        pool = _pools.get(ruta)
+        if pool is None:
+            pool = PoolConexiones(ruta, migrar=migrar, wal=wal)
+            _pools[ruta] = pool
+        return pool
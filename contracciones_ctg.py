@@ -0,0 +1,249 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from trazas_ctg import FORMATO_FECHA, leer_traza
+
+# Detección de contracciones en la tocografía de las trazas de trazas_ctg.py:
+# - la señal se suaviza con una media móvil centrada de SUAVIZADO_S (con sumas acumuladas);
+# - el tono basal es el mínimo de la señal suavizada en los últimos VENTANA_TONO_S, calculado
+#   por bloques de BLOQUE_TONO_S alineados con el inicio de la traza;
+# - una contracción es un tramo que supera el tono en UMBRAL_CONTRACCION durante al menos
+#   DURACION_MINIMA_S (los artefactos por movimiento materno duran unos segundos); su pico es el
+#   máximo del tramo.
+# Todo se calcula sobre la traza completa con operaciones vectorizadas, en tiempo lineal.
+SUAVIZADO_S = 15
+VENTANA_TONO_S = 120
+BLOQUE_TONO_S = 30
+UMBRAL_CONTRACCION = 15
+DURACION_MINIMA_S = 30
+# Fracción de muestras válidas que necesita la media móvil para tener valor.
+FRACCION_VALIDA = 0.5
+# Ventana del conteo que se anota en mediciones.contracciones ("contracciones en 10 min").
+VENTANA_CONTEO_MIN = 10
+# Segundos de señal ya procesada que se releen en cada pasada: el tono de una muestra depende
+# de los VENTANA_TONO_S anteriores; con este margen, las contracciones detectadas por tramos son
+# las mismas que al procesar la traza completa.
+CONTEXTO_S = VENTANA_TONO_S + 3 * BLOQUE_TONO_S
+
+SQL_GUARDAR = (
+    "INSERT OR IGNORE INTO contracciones_ctg (id_paciente, pico, inicio, fin, amplitud) VALUES (?, ?, ?, ?, ?)"
+)
+# Pacientes activas con tocografía y el final de su traza (del último bloque).
+SQL_TRAZAS_TOCO = """
+SELECT id, fin_traza FROM (
+    SELECT p.id,
+           (SELECT datetime(inicio, '+' || CAST(n_muestras / frecuencia_hz AS INTEGER) || ' seconds')
+            FROM trazas_ctg t WHERE t.id_paciente = p.id AND t.senal = 'toco'
+            ORDER BY inicio DESC LIMIT 1) AS fin_traza
+    FROM pacientes p
+    WHERE p.estado_episodio = 'activo'
+)
+WHERE fin_traza IS NOT NULL
+"""
+SQL_ULTIMA_CONTRACCION = "SELECT MAX(pico), MAX(fin) FROM contracciones_ctg WHERE id_paciente = ?"
+# Completa las mediciones sin contracciones anotadas con el conteo de los VENTANA_CONTEO_MIN
+# minutos previos, si la tocografía ya está procesada hasta la medición y registraba al comienzo
+# de la ventana (hay un bloque de trazas_ctg que lo contiene: los bloques duran diez minutos).
+SQL_COMPLETAR_MEDICIONES = f"""
+UPDATE mediciones SET contracciones = (
+    SELECT COUNT(*) FROM contracciones_ctg c
+    WHERE c.id_paciente = mediciones.id_paciente
+      AND c.pico > datetime(mediciones.fecha, '-{VENTANA_CONTEO_MIN} minutes') AND c.pico <= datetime(mediciones.fecha)
+)
+WHERE id_paciente = ? AND contracciones IS NULL AND datetime(fecha) <= ?
+  AND EXISTS (
+    SELECT 1 FROM trazas_ctg t
+    WHERE t.id_paciente = mediciones.id_paciente AND t.senal = 'toco'
+      AND t.inicio > datetime(mediciones.fecha, '-{VENTANA_CONTEO_MIN + 10} minutes')
+      AND t.inicio <= datetime(mediciones.fecha, '-{VENTANA_CONTEO_MIN} minutes')
+  )
+"""
+
+# Media móvil centrada de `ventana` muestras ignorando los NaN; NaN donde hay menos de
+# FRACCION_VALIDA de muestras válidas.
+def _suavizar(valores, ventana):
+    validos = np.isfinite(valores)
+    sumas = np.concatenate([[0.0], np.cumsum(np.where(validos, valores, 0.0))])
+    cuentas = np.concatenate([[0], np.cumsum(validos)])
+    centro = np.arange(len(valores))
+    inicio = np.maximum(0, centro - ventana // 2)
+    fin = np.minimum(len(valores), centro + ventana // 2 + 1)
+    cuenta = cuentas[fin] - cuentas[inicio]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(cuenta >= ventana * FRACCION_VALIDA, (sumas[fin] - sumas[inicio]) / cuenta, np.nan)
+
+# Tono basal de cada muestra: mínimo de su bloque de BLOQUE_TONO_S y de los bloques que cubren
+# los VENTANA_TONO_S anteriores.
+def _tono(suavizada, por_bloque):
+    n_bloques = -(-len(suavizada) // por_bloque)
+    relleno = np.full(n_bloques * por_bloque, np.nan)
+    relleno[:len(suavizada)] = suavizada
+    minimos = np.fmin.reduce(relleno.reshape(n_bloques, por_bloque), axis=1)
+    tono = minimos.copy()
+    for atras in range(1, VENTANA_TONO_S // BLOQUE_TONO_S + 1):
+        tono[atras:] = np.fmin(tono[atras:], minimos[:-atras])
+    return np.repeat(tono, por_bloque)[:len(suavizada)]
+
+# Contracciones de una tocografía cuyas muestras son definitivas hasta el índice `definitivo`:
+# los tramos que llegan hasta ahí siguen en curso y no se cuentan. Devuelve las contracciones,
+# como detectar_contracciones, y el inicio del primer tramo en curso (o None).
+def _contracciones(muestras, frecuencia_hz, definitivo):
+    vacio = {'inicios': np.empty(0, dtype=np.int64), 'picos': np.empty(0, dtype=np.int64),
+             'fines': np.empty(0, dtype=np.int64), 'amplitudes': np.empty(0)}
+    suavizada = _suavizar(np.asarray(muestras, dtype='float64'), int(round(SUAVIZADO_S * frecuencia_hz)))
+    if len(suavizada) == 0:
+        return vacio, None
+    tono = _tono(suavizada, int(round(BLOQUE_TONO_S * frecuencia_hz)))
+    dentro = np.nan_to_num(suavizada - tono, nan=-np.inf) >= UMBRAL_CONTRACCION
+    cambios = np.diff(np.concatenate([[0], dentro.astype(np.int8), [0]]))
+    inicios = np.flatnonzero(cambios == 1)
+    fines = np.flatnonzero(cambios == -1)
+    terminados = fines < definitivo
+    en_curso = int(inicios[~terminados][0]) if not terminados.all() else None
+    validos = terminados & ((fines - inicios) >= DURACION_MINIMA_S * frecuencia_hz)
+    inicios, fines = inicios[validos], fines[validos]
+    if len(inicios) == 0:
+        return vacio, en_curso
+    # Pico de cada tramo: la primera muestra que alcanza el máximo del tramo.
+    bordes = np.zeros(len(suavizada) + 1, dtype=np.int64)
+    bordes[inicios] = 1
+    bordes[fines] = -1
+    en_tramo = np.cumsum(bordes[:-1]) > 0
+    tramo = np.cumsum(bordes[:-1] == 1) - 1
+    maximos = np.maximum.reduceat(np.where(en_tramo, suavizada, -np.inf), inicios)
+    candidatos = np.flatnonzero(en_tramo & (suavizada == maximos[tramo.clip(0)]))
+    _, primeros = np.unique(tramo[candidatos], return_index=True)
+    picos = candidatos[primeros]
+    return {'inicios': inicios, 'picos': picos, 'fines': fines, 'amplitudes': maximos - tono[picos]}, en_curso
+
+# Función para detectar las contracciones de una tocografía completa (muestras en unidades de
+# actividad uterina, NaN sin señal, a frecuencia_hz). Devuelve un diccionario con 'inicios',
+# 'picos' y 'fines' (índices de muestra, fin exclusivo) y 'amplitudes' (pico sobre el tono basal).
+def detectar_contracciones(muestras, frecuencia_hz):
+    return _contracciones(muestras, frecuencia_hz, len(muestras) + 1)[0]
+
+# Comienzo del bloque de tono que contiene una fecha. Los bloques de trazas_ctg empiezan en
+# múltiplos de diez minutos desde la medianoche, así que leer desde aquí conserva la misma
+# división en bloques de tono que la traza completa.
+def _inicio_bloque_tono(fecha):
+    medianoche = datetime.combine(fecha.date(), datetime.min.time())
+    return medianoche + (fecha - medianoche) // timedelta(seconds=BLOQUE_TONO_S) * timedelta(seconds=BLOQUE_TONO_S)
+
+# Conteo actual de contracciones de la sala: pacientes activas cuya tocografía registraba al
+# comienzo de los últimos VENTANA_CONTEO_MIN minutos, con las contracciones de esa ventana.
+SQL_CONTEO_SALA = """
+SELECT p.id AS id_paciente,
+       (SELECT COUNT(*) FROM contracciones_ctg c WHERE c.id_paciente = p.id AND c.pico > ?) AS contracciones_ctg
+FROM pacientes p
+WHERE p.estado_episodio = 'activo'
+  AND EXISTS (
+    SELECT 1 FROM trazas_ctg t
+    WHERE t.id_paciente = p.id AND t.senal = 'toco' AND t.inicio > ? AND t.inicio <= ?
+  )
+"""
+
+# Función para leer el conteo de contracciones de los últimos VENTANA_CONTEO_MIN minutos de
+# cada paciente monitorizada (para el triage). Devuelve un DataFrame con id_paciente y
+# contracciones_ctg.
+def conteo_sala(conn, ahora=None):
+    desde = (ahora or datetime.now()) - timedelta(minutes=VENTANA_CONTEO_MIN)
+    return pd.read_sql_query(SQL_CONTEO_SALA, conn, params=(
+        desde.strftime(FORMATO_FECHA), (desde - timedelta(minutes=10)).strftime(FORMATO_FECHA), desde.strftime(FORMATO_FECHA),
+    ))
+
+# Detector de contracciones por flujo: en cada pasada lee de cada paciente solo la tocografía
+# nueva, más CONTEXTO_S de la ya procesada, y guarda las contracciones que terminaron. Por
+# paciente recuerda hasta dónde la señal es definitiva (la media móvil centrada y el último
+# bloque de tono todavía pueden cambiar, y una contracción en curso se deja para la pasada
+# siguiente) y el último pico guardado, para no repetir contracciones al releer el contexto.
+# El estado avanza solo cuando la escritura se confirma: si falla, la pasada siguiente vuelve a
+# leer el mismo tramo. Al reiniciar, retoma desde la última contracción guardada.
+class ContadorContracciones:
+    def __init__(self, pool):
+        self.pool = pool
+        self.estados = {}
+
+    def _estado(self, conn, id_paciente):
+        if id_paciente not in self.estados:
+            ultimo_pico, ultimo_fin = conn.execute(SQL_ULTIMA_CONTRACCION, (id_paciente,)).fetchone()
+            self.estados[id_paciente] = {
+                'procesado': datetime.strptime(ultimo_fin, FORMATO_FECHA) if ultimo_fin else None,
+                'ultimo_pico': ultimo_pico,
+                'fin_traza': None,
+            }
+        return self.estados[id_paciente]
+
+    # Contracciones nuevas y terminadas de la tocografía de una paciente, como filas de
+    # contracciones_ctg, y el estado de la paciente después de guardarlas (sin modificar el actual).
+    def _contracciones_nuevas(self, conn, id_paciente, estado):
+        estado = dict(estado)
+        desde = None
+        if estado['procesado'] is not None:
+            desde = _inicio_bloque_tono(estado['procesado'] - timedelta(seconds=CONTEXTO_S))
+        traza = leer_traza(conn, id_paciente, 'toco', desde)
+        if traza is None:
+            return [], estado
+        frecuencia_hz = traza.frecuencia_hz
+        # La media móvil de las últimas muestras y el último bloque de tono pueden cambiar con
+        # la señal que falta.
+        por_bloque = int(round(BLOQUE_TONO_S * frecuencia_hz))
+        definitivo = min(len(traza.muestras) - int(round(SUAVIZADO_S * frecuencia_hz)) // 2,
+                         len(traza.muestras) // por_bloque * por_bloque)
+        deteccion, en_curso = _contracciones(traza.muestras, frecuencia_hz, definitivo)
+        # Las contracciones anteriores a lo ya procesado se guardaron en pasadas previas; en el
+        # contexto, además, el tono todavía no tiene su ventana completa.
+        primero = 0
+        if estado['procesado'] is not None:
+            primero = int(round((estado['procesado'] - traza.inicio).total_seconds() * frecuencia_hz))
+        nuevas = deteccion['inicios'] >= primero
+        if en_curso is not None:
+            definitivo = min(definitivo, en_curso)
+
+        def fecha(indice):
+            return (traza.inicio + timedelta(seconds=int(indice) / frecuencia_hz)).strftime(FORMATO_FECHA)
+
+        filas = []
+        for inicio, pico, fin, amplitud in zip(*(deteccion[clave][nuevas] for clave in ('inicios', 'picos', 'fines', 'amplitudes'))):
+            fila = (id_paciente, fecha(pico), fecha(inicio), fecha(fin), round(float(amplitud), 1))
+            if estado['ultimo_pico'] is None or fila[1] > estado['ultimo_pico']:
+                filas.append(fila)
+        if filas:
+            estado['ultimo_pico'] = filas[-1][1]
+        if definitivo > 0:
+            estado['procesado'] = traza.inicio + timedelta(seconds=definitivo / frecuencia_hz)
+        return filas, estado
+
+    # Función para procesar la tocografía nueva de todas las pacientes activas: lee con una sola
+    # conexión y, en una sola escritura, guarda las contracciones detectadas y completa el
+    # conteo de las mediciones sin contracciones anotadas.
+    # Devuelve el número de pacientes procesadas, de contracciones nuevas y de mediciones completadas.
+    def procesar_sala(self):
+        filas = []
+        procesadas = []
+        nuevos_estados = {}
+        with self.pool.lectura() as conn:
+            trazas = conn.execute(SQL_TRAZAS_TOCO).fetchall()
+            for id_paciente, fin_traza in trazas:
+                if self._estado(conn, id_paciente)['fin_traza'] == fin_traza:
+                    continue
+                filas_paciente, estado = self._contracciones_nuevas(conn, id_paciente, self.estados[id_paciente])
+                filas.extend(filas_paciente)
+                estado['fin_traza'] = fin_traza
+                nuevos_estados[id_paciente] = estado
+                if estado['procesado'] is not None:
+                    procesadas.append((id_paciente, estado['procesado'].strftime(FORMATO_FECHA)))
+        # Las pacientes que dejan la sala (parto, archivo) se olvidan.
+        activas = {id_paciente for id_paciente, _ in trazas}
+        for id_paciente in set(self.estados) - activas:
+            del self.estados[id_paciente]
+        completadas = 0
+        if procesadas:
+            def escribir(conn):
+                conn.executemany(SQL_GUARDAR, filas)
+                return conn.executemany(SQL_COMPLETAR_MEDICIONES, procesadas).rowcount
+
+            completadas = self.pool.escribir(escribir)
+        self.estados.update(nuevos_estados)
+        return len(procesadas), len(filas), completadas
@@ -3,6 +3,8 @@ from PIL import Image
 import os
 import sqlite3
 import pandas as pd
+from busqueda import buscar_pacientes
+from conexiones import obtener_pool
 
 # Configuración inicial de la página de Streamlit
 st.set_page_config(
@@ -23,29 +25,38 @@ st.set_page_config(
 def listar_bases_datos(ruta_directorio):
     return [archivo for archivo in os.listdir(ruta_directorio) if archivo.endswith('.db')]
 
+# El pool de cada archivo se comparte entre sesiones; no se aplican las migraciones de
+# partoseguro.db ni se cambia el modo de diario porque el gestor puede abrir cualquier base de
+# datos SQLite.
 def conectar_bd(ruta_bd):
     try:
-        return sqlite3.connect(ruta_bd)
+        return obtener_pool(ruta_bd, migrar=False, wal=False)
     except sqlite3.DatabaseError as e:
         st.error(f"Error al conectar con la base de datos: {e}")
         return None
 
-def obtener_esquema_bd(conn):
-    return pd.read_sql_query("SELECT name FROM sqlite_master WHERE type='table';", conn)
+def obtener_esquema_bd(pool):
+    with pool.lectura() as conn:
+        return pd.read_sql_query("SELECT name FROM sqlite_master WHERE type='table';", conn)
 
-def obtener_datos_tabla(conn, tabla):
-    return pd.read_sql_query(f"SELECT * FROM {tabla};", conn)
+def obtener_datos_tabla(pool, tabla):
+    with pool.lectura() as conn:
+        return pd.read_sql_query(f"SELECT * FROM {tabla};", conn)
 
-def obtener_columnas_tabla(conn, tabla):
-    columnas = pd.read_sql_query(f"PRAGMA table_info({tabla});", conn)
+def obtener_columnas_tabla(pool, tabla):
+    with pool.lectura() as conn:
+        columnas = pd.read_sql_query(f"PRAGMA table_info({tabla});", conn)
     return columnas['name'].tolist()
 
-def actualizar_registro(conn, tabla, id_registro, valores_nuevos):
+# Las bases de PartoSeguro tienen un índice de búsqueda de pacientes (pacientes_busqueda).
+def tiene_busqueda_pacientes(esquema):
+    return 'pacientes_busqueda' in set(esquema['name'])
+
+def actualizar_registro(pool, tabla, id_registro, valores_nuevos):
     columnas = ', '.join([f"{k} = ?" for k in valores_nuevos.keys()])
     valores = list(valores_nuevos.values()) + [id_registro]
     query = f"UPDATE {tabla} SET {columnas} WHERE id = ?"
-    conn.execute(query, valores)
-    conn.commit()
+    pool.escribir(query, valores)
 
 # Carga y muestra el logo de la aplicación.
 logo = Image.open('img/logo_bd.png')
@@ -66,40 +77,47 @@ with st.sidebar:
     base_datos_seleccionada = st.selectbox('Selecciona una base de datos', archivos_db)
 
     if base_datos_seleccionada:
-        conn = conectar_bd(base_datos_seleccionada)
-        if conn:
-            c = conn.cursor()
-            esquema = obtener_esquema_bd(conn)
+        pool = conectar_bd(base_datos_seleccionada)
+        if pool:
+            esquema = obtener_esquema_bd(pool)
             tabla_seleccionada = st.selectbox('Selecciona una tabla', esquema['name'])
 
             # Inserción de registros
             st.subheader(f"Añadir registro a {tabla_seleccionada}")
             if tabla_seleccionada:
-                columnas_tabla = obtener_columnas_tabla(conn, tabla_seleccionada)
+                columnas_tabla = obtener_columnas_tabla(pool, tabla_seleccionada)
                 valores_nuevos = {col: st.text_input(f"Valor para {col}", key=col) for col in columnas_tabla}
                 if st.button(f"Añadir registro a {tabla_seleccionada}"):
                     columnas = ', '.join(valores_nuevos.keys())
                     placeholders = ', '.join(['?'] * len(valores_nuevos))
                     query = f"INSERT INTO {tabla_seleccionada} ({columnas}) VALUES ({placeholders})"
                     try:
-                        c.execute(query, list(valores_nuevos.values()))
-                        conn.commit()
+                        pool.escribir(query, list(valores_nuevos.values()))
                         st.success("Registro añadido exitosamente.")
                     except sqlite3.DatabaseError as e:
                         st.error(f"Error al añadir registro: {e}")
 
+            # Búsqueda de pacientes por ID, nombre o patología, para no tener que conocer el ID
+            if tabla_seleccionada in ('pacientes', 'mediciones') and tiene_busqueda_pacientes(esquema):
+                st.subheader("Buscar paciente")
+                texto_busqueda = st.text_input("ID, nombre o patología", key="buscar_paciente")
+                if texto_busqueda:
+                    with pool.lectura() as conn:
+                        st.dataframe(buscar_pacientes(conn, texto_busqueda), hide_index=True)
+
             # Actualización de registros
             st.subheader(f"Actualizar registro en {tabla_seleccionada}")
             if tabla_seleccionada:
                 id_actualizar = st.text_input("ID del registro a actualizar", key="update")
                 if id_actualizar:
                     try:
-                        registro_actual = pd.read_sql_query(f"SELECT * FROM {tabla_seleccionada} WHERE id = {id_actualizar};", conn)
+                        with pool.lectura() as conn:
+                            registro_actual = pd.read_sql_query(f"SELECT * FROM {tabla_seleccionada} WHERE id = {id_actualizar};", conn)
                         if not registro_actual.empty:
                             st.write("Registro Actual:", registro_actual)
                             valores_actualizados = {col: st.text_input(f"Nuevo valor para {col}", value=str(registro_actual.iloc[0][col]), key=col + "_update") for col in columnas_tabla}
                             if st.button(f"Actualizar registro en {tabla_seleccionada}"):
-                                actualizar_registro(conn, tabla_seleccionada, id_actualizar, valores_actualizados)
+                                actualizar_registro(pool, tabla_seleccionada, id_actualizar, valores_actualizados)
                                 st.success("Registro actualizado exitosamente.")
                     except sqlite3.DatabaseError as e:
                         st.error(f"Error al actualizar registro: {e}")
@@ -110,8 +128,7 @@ with st.sidebar:
                 registro_id = st.text_input("ID del registro a eliminar", key="delete")
                 if st.button(f"Eliminar registro de {tabla_seleccionada}"):
                     try:
-                        c.execute(f"DELETE FROM {tabla_seleccionada} WHERE id = ?", (registro_id,))
-                        conn.commit()
+                        pool.escribir(f"DELETE FROM {tabla_seleccionada} WHERE id = ?", (registro_id,))
                         st.success("Registro eliminado exitosamente.")
                     except sqlite3.DatabaseError as e:
                         st.error(f"Error al eliminar registro: {e}")
@@ -120,13 +137,13 @@ with st.sidebar:
 if base_datos_seleccionada and tabla_seleccionada:
     st.header(f"Datos de la tabla {tabla_seleccionada}")
     try:
-        datos_tabla = obtener_datos_tabla(conn, tabla_seleccionada)
+        datos_tabla = obtener_datos_tabla(pool, tabla_seleccionada)
         st.write(datos_tabla)
     except sqlite3.DatabaseError as e:
         st.error(f"Error al cargar datos de la tabla {tabla_seleccionada}: {e}")
 
-    if conn:
-        conn.close()
+    with st.sidebar.expander("Conexiones a la base de datos"):
+        st.json(pool.metricas())
         
 # Sección de footer.
 st.sidebar.markdown('---')
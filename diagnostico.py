@@ -0,0 +1,234 @@
+import numpy as np
+import pandas as pd
+
+from analisis_ctg import resumen_sala
+from contracciones_ctg import conteo_sala
+from umbrales import (
+    CONTRACCIONES_FRECUENTES, CONTRACCIONES_INSUFICIENTES, DIASTOLICA_HIPERTENSION, DIASTOLICA_HIPOTENSION,
+    DILATACION_COMPLETA, DILATACION_LENTA, FCF_BRADICARDIA, FCF_TAQUICARDIA, SISTOLICA_HIPERTENSION,
+    SISTOLICA_HIPOTENSION,
+)
+
+# Reglas de diagnóstico: estado, recomendación y severidad (mayor es más urgente).
+# La condición de cada regla se evalúa sobre columnas completas en evaluar_mediciones.
+# esquema._REGLAS_SQL repite las condiciones en SQL para el diagnóstico de estado_paciente, con
+# los mismos umbrales (umbrales.py).
+# Las reglas de la cardiotocografía solo se activan donde hay resumen de analisis_ctg.py
+# (columnas de unir_resumen_ctg), así que no tienen equivalente en SQL.
+REGLAS = [
+    {
+        'estado': 'Bradicardia fetal',
+        'recomendacion': "Requiere atención inmediata y evaluación médica.",
+        'severidad': 5,
+    },
+    {
+        'estado': 'Taquicardia fetal',
+        'recomendacion': "Evaluar causas y tomar acciones según protocolo médico.",
+        'severidad': 4,
+    },
+    {
+        'estado': 'Desaceleraciones recurrentes de la FCF',
+        'recomendacion': "Evaluar la cardiotocografía completa, cambiar de posición a la paciente y avisar al médico.",
+        'severidad': 4,
+    },
+    {
+        'estado': 'Variabilidad de la FCF reducida',
+        'recomendacion': "Revisar la cardiotocografía y considerar evaluación médica del bienestar fetal.",
+        'severidad': 4,
+    },
+    {
+        'estado': 'Hipertensión',
+        'recomendacion': "Requerir evaluación médica adicional y considerar manejo para hipertensión.",
+        'severidad': 4,
+    },
+    {
+        'estado': 'Hipotensión',
+        'recomendacion': "Aumentar la monitorización, asegurar hidratación adecuada y considerar evaluación médica.",
+        'severidad': 3,
+    },
+    {
+        'estado': 'Contracciones uterinas frecuentes',
+        'recomendacion': "Evaluar para descartar parto prematuro o hiperestimulación.",
+        'severidad': 3,
+    },
+    {
+        'estado': 'Dilatación completa, preparar para el parto',
+        'recomendacion': "Preparar para el parto inminente y notificar al equipo médico.",
+        'severidad': 3,
+    },
+    {
+        'estado': 'Error en la medición de la presión arterial',
+        'recomendacion': "Verificar la entrada de la presión arterial y volver a medir.",
+        'severidad': 2,
+    },
+    {
+        'estado': 'Contracciones uterinas insuficientes',
+        'recomendacion': "Considerar estimulación si es indicado y está dentro del plan de parto.",
+        'severidad': 2,
+    },
+    {
+        'estado': 'Dilatación cervical lenta',
+        'recomendacion': "Monitorear progreso más de cerca.",
+        'severidad': 1,
+    },
+]
+
+# Umbrales de las reglas de la cardiotocografía, sobre los últimos 30 minutos de traza: la VCP
+# por debajo de 3 ms es el criterio de Dawes-Redman asociado a acidemia fetal.
+VCP_MINIMA_MS = 3.0
+DESACELERACIONES_RECURRENTES = 3
+
+ESTADO_NORMAL = 'Normal'
+RECOMENDACION_NORMAL = "Continuar con el monitoreo rutinario y mantener las prácticas estándar de cuidado prenatal."
+SEPARADOR_ESTADOS = '; '
+
+# Función para separar una serie de presiones arteriales "sistólica/diastólica" en dos columnas.
+# Los valores que no siguen el formato quedan como nulos. Como en una sala se repiten pocas
+# lecturas distintas, se interpreta cada valor único una sola vez y se reparte por código.
+PATRON_PRESION_ARTERIAL = r'^\s*(\d+)\s*/\s*(\d+)\s*$'
+
+def separar_presion_arterial(presion_arterial):
+    codigos, unicos = pd.factorize(presion_arterial, use_na_sentinel=True)
+    partes = pd.Series(unicos, dtype='string').str.extract(PATRON_PRESION_ARTERIAL)
+    valores = [
+        np.append(pd.to_numeric(partes[i], errors='coerce').to_numpy(dtype='float64', na_value=np.nan), np.nan)
+        for i in (0, 1)
+    ]
+    # El código -1 (valor nulo) apunta al NaN añadido al final.
+    return (
+        pd.Series(valores[0][codigos], index=presion_arterial.index),
+        pd.Series(valores[1][codigos], index=presion_arterial.index),
+    )
+
+# Columna numérica opcional de un DataFrame de mediciones (NaN si no está).
+def _columna_opcional(mediciones_df, columna):
+    if columna in mediciones_df:
+        return mediciones_df[columna].astype('float64')
+    return pd.Series(np.nan, index=mediciones_df.index)
+
+# Función para evaluar las condiciones de todas las reglas sobre un DataFrame de mediciones.
+# Devuelve un DataFrame booleano con una columna por estado y el mismo índice que mediciones_df.
+# Si las mediciones traen el resumen de la cardiotocografía (linea_base_fcf, vcp_ms y
+# desaceleraciones_ctg), la bradicardia y la taquicardia se evalúan sobre la línea de base de la
+# traza, como en su definición, y no sobre el valor puntual anotado. Del mismo modo, si traen el
+# conteo de la tocografía (contracciones_ctg), las contracciones se evalúan sobre él.
+def evaluar_reglas(mediciones_df):
+    dilatacion = mediciones_df['dilatacion']
+    linea_base = _columna_opcional(mediciones_df, 'linea_base_fcf')
+    frecuencia = linea_base.fillna(mediciones_df['frecuencia_cardiaca'].astype('float64'))
+    contracciones = _columna_opcional(mediciones_df, 'contracciones_ctg').fillna(mediciones_df['contracciones'].astype('float64'))
+    # Las mediciones leídas de la base de datos traen la presión ya separada (columnas sistolica
+    # y diastolica, ver la migración 5 de esquema.py); si no, se interpreta el texto.
+    if 'sistolica' in mediciones_df and 'diastolica' in mediciones_df:
+        sistolica = mediciones_df['sistolica'].astype('float64')
+        diastolica = mediciones_df['diastolica'].astype('float64')
+    else:
+        sistolica, diastolica = separar_presion_arterial(mediciones_df['presion_arterial'])
+    hipotension = (sistolica < SISTOLICA_HIPOTENSION) | (diastolica < DIASTOLICA_HIPOTENSION)
+
+    condiciones = {
+        'Bradicardia fetal': frecuencia < FCF_BRADICARDIA,
+        'Taquicardia fetal': frecuencia > FCF_TAQUICARDIA,
+        'Desaceleraciones recurrentes de la FCF': _columna_opcional(mediciones_df, 'desaceleraciones_ctg') >= DESACELERACIONES_RECURRENTES,
+        'Variabilidad de la FCF reducida': _columna_opcional(mediciones_df, 'vcp_ms') < VCP_MINIMA_MS,
+        'Hipertensión': ((sistolica > SISTOLICA_HIPERTENSION) | (diastolica > DIASTOLICA_HIPERTENSION)) & ~hipotension.fillna(False),
+        'Hipotensión': hipotension,
+        'Contracciones uterinas frecuentes': contracciones > CONTRACCIONES_FRECUENTES,
+        'Dilatación completa, preparar para el parto': dilatacion >= DILATACION_COMPLETA,
+        'Error en la medición de la presión arterial': sistolica.isna(),
+        'Contracciones uterinas insuficientes': contracciones < CONTRACCIONES_INSUFICIENTES,
+        'Dilatación cervical lenta': dilatacion < DILATACION_LENTA,
+    }
+    return pd.DataFrame(
+        {regla['estado']: condiciones[regla['estado']].fillna(False).astype(bool) for regla in REGLAS},
+        index=mediciones_df.index,
+    )
+
+# Función para generar el diagnóstico de todas las filas de un DataFrame de mediciones.
+# Devuelve, con el mismo índice, las columnas:
+#   'estados': todos los estados activados, de mayor a menor severidad, separados por '; '
+#   'diagnostico' y 'recomendacion': los de la regla más severa (o Normal)
+#   'severidad': severidad de esa regla (0 si es Normal)
+def evaluar_mediciones(mediciones_df):
+    reglas_df = evaluar_reglas(mediciones_df)
+    activadas = reglas_df.to_numpy()
+    severidades = np.array([regla['severidad'] for regla in REGLAS])
+    estados = np.array([regla['estado'] for regla in REGLAS], dtype=object)
+    recomendaciones = np.array([regla['recomendacion'] for regla in REGLAS], dtype=object)
+
+    hay_alguna = activadas.any(axis=1)
+    # Las reglas están ordenadas por severidad, así que la primera activada es la más severa.
+    principal = activadas.argmax(axis=1)
+
+    # Cada combinación de reglas activadas se codifica como máscara de bits; solo se arma
+    # el texto de las combinaciones que aparecen, en lugar de concatenar fila por fila.
+    mascaras = activadas.astype(np.int64) @ (1 << np.arange(len(REGLAS), dtype=np.int64))
+    codigos, combinaciones = pd.factorize(mascaras)
+    textos = np.array([
+        SEPARADOR_ESTADOS.join(estados[(combinacion >> np.arange(len(REGLAS))) & 1 == 1]) or ESTADO_NORMAL
+        for combinacion in combinaciones
+    ], dtype=object)
+
+    return pd.DataFrame({
+        'estados': textos[codigos],
+        'diagnostico': np.where(hay_alguna, estados[principal], ESTADO_NORMAL),
+        'recomendacion': np.where(hay_alguna, recomendaciones[principal], RECOMENDACION_NORMAL),
+        'severidad': np.where(hay_alguna, severidades[principal], 0),
+    }, index=mediciones_df.index)
+
+# Función para obtener la línea de tiempo de estados: solo las filas donde cambia el diagnóstico.
+def linea_de_tiempo(mediciones_df, diagnostico_df=None):
+    if diagnostico_df is None:
+        diagnostico_df = evaluar_mediciones(mediciones_df)
+    cambios = diagnostico_df['estados'].ne(diagnostico_df['estados'].shift())
+    linea = diagnostico_df.loc[cambios, ['estados', 'severidad']]
+    linea.insert(0, 'Fecha', mediciones_df.loc[cambios, 'Fecha'])
+    return linea.reset_index(drop=True)
+
+# Última medición, diagnóstico, próxima medición y velocidad de dilatación de cada paciente,
+# leídos de la tabla estado_paciente que mantienen los triggers (ver esquema.py): una fila por
+# paciente, sin recorrer sus mediciones.
+SQL_ULTIMAS_MEDICIONES_COMPLETAS = """
+SELECT p.id AS id_paciente, p.nombre, e.ultima_fecha AS fecha, e.dilatacion, e.frecuencia_cardiaca,
+       e.contracciones, e.presion_arterial, e.sistolica, e.diastolica, e.n_mediciones,
+       e.proxima_medicion, e.velocidad_dilatacion
+FROM estado_paciente e
+JOIN pacientes p ON p.id = e.id_paciente
+WHERE p.estado_episodio = 'activo'
+"""
+
+# Función para clasificar a todas las pacientes de la sala según su última medición y, si están
+# monitorizadas, la última media hora de su cardiotocografía. Evalúa todas las reglas en una
+# sola pasada y ordena de mayor a menor severidad.
+def triage_sala(conn):
+    ultimas = pd.read_sql_query(SQL_ULTIMAS_MEDICIONES_COMPLETAS, conn)
+    if ultimas.empty:
+        return ultimas.assign(estados=[], diagnostico=[], recomendacion=[], severidad=[])
+    for columna in ['dilatacion', 'frecuencia_cardiaca', 'contracciones', 'sistolica', 'diastolica']:
+        ultimas[columna] = pd.to_numeric(ultimas[columna], errors='coerce').astype('Int64')
+    # Resumen actual de la cardiotocografía y conteo de contracciones de las pacientes monitorizadas.
+    ultimas = ultimas.merge(resumen_sala(conn), on='id_paciente', how='left')
+    ultimas = ultimas.merge(conteo_sala(conn), on='id_paciente', how='left')
+    triage = ultimas.join(evaluar_mediciones(ultimas))
+    return triage.sort_values(['severidad', 'fecha'], ascending=[False, True], ignore_index=True)
+
+# Mediciones con presión arterial alterada (hipertensión o hipotensión) de todas las pacientes,
+# desde una fecha. Los rangos sobre sistolica y diastolica se resuelven con sus índices, sin
+# interpretar el texto de cada medición.
+SQL_PRESION_ALTERADA = f"""
+SELECT m.id_paciente, p.nombre, m.fecha, m.presion_arterial, m.sistolica, m.diastolica,
+       CASE WHEN m.sistolica < {SISTOLICA_HIPOTENSION} OR m.diastolica < {DIASTOLICA_HIPOTENSION}
+            THEN 'Hipotensión' ELSE 'Hipertensión' END AS estado
+FROM mediciones m
+LEFT JOIN pacientes p ON p.id = m.id_paciente
+WHERE (m.sistolica > {SISTOLICA_HIPERTENSION} OR m.diastolica > {DIASTOLICA_HIPERTENSION}
+       OR m.sistolica < {SISTOLICA_HIPOTENSION} OR m.diastolica < {DIASTOLICA_HIPOTENSION})
+"""
+
+# Función para el tamizaje de presión arterial de la sala: mediciones con hipertensión o
+# hipotensión desde `desde` (texto 'YYYY-MM-DD HH:MM:SS'; por defecto, toda la historia).
+def tamizaje_presion_arterial(conn, desde=None):
+    sql, parametros = SQL_PRESION_ALTERADA, ()
+    if desde is not None:
+        sql, parametros = sql + "  AND m.fecha >= ?\n", (desde,)
+    return pd.read_sql_query(sql + "ORDER BY m.fecha DESC, m.id DESC", conn, params=parametros)
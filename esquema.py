@@ -0,0 +1,520 @@
+import sqlite3
+import threading
+
+from umbrales import (
+    CONTRACCIONES_FRECUENTES, CONTRACCIONES_INSUFICIENTES, DIASTOLICA_HIPERTENSION, DIASTOLICA_HIPOTENSION,
+    DILATACION_COMPLETA, DILATACION_LENTA, FCF_BRADICARDIA, FCF_TAQUICARDIA, SISTOLICA_HIPERTENSION,
+    SISTOLICA_HIPOTENSION,
+)
+
+# Expresiones SQL que separan un texto de presión arterial 'sistólica/diastólica' (con espacios
+# opcionales) en sus dos números; los valores que no siguen el formato dan NULL, igual que
+# diagnostico.separar_presion_arterial. Se usan para completar las columnas sistolica y
+# diastolica de las filas escritas sin ellas.
+def _sql_presion(columna, parte):
+    texto = f"replace({columna}, ' ', '')"
+    barra = f"instr({texto}, '/')"
+    sistolica = f"substr({texto}, 1, {barra} - 1)"
+    diastolica = f"substr({texto}, {barra} + 1)"
+    valida = (
+        f"{barra} > 1 AND {sistolica} NOT GLOB '*[^0-9]*' "
+        f"AND {diastolica} <> '' AND {diastolica} NOT GLOB '*[^0-9]*'"
+    )
+    return f"CASE WHEN {valida} THEN CAST({sistolica if parte == 'sistolica' else diastolica} AS INTEGER) END"
+
+SQL_COMPLETAR_PRESION = (
+    f"sistolica = {_sql_presion('presion_arterial', 'sistolica')}, "
+    f"diastolica = {_sql_presion('presion_arterial', 'diastolica')}"
+)
+
+# Valor numérico de una columna, o NULL si guarda texto libre (db_manager.py lo permite):
+# así las comparaciones dan el mismo resultado que pd.to_numeric(errors='coerce').
+def _sql_numero(columna):
+    return f"(CASE WHEN typeof({columna}) IN ('integer', 'real') THEN {columna} END)"
+
+# Reglas de diagnostico.REGLAS en SQL, de mayor a menor severidad, para el diagnóstico actual de
+# estado_paciente. Los umbrales son los de umbrales.py, compartidos con diagnostico.py. Si cambian
+# las reglas o sus umbrales, una migración nueva debe recrear los triggers de estado_paciente.
+_HIPOTENSION_SQL = f"sistolica < {SISTOLICA_HIPOTENSION} OR diastolica < {DIASTOLICA_HIPOTENSION}"
+_REGLAS_SQL = [
+    ('Bradicardia fetal', 5, f"{_sql_numero('frecuencia_cardiaca')} < {FCF_BRADICARDIA}"),
+    ('Taquicardia fetal', 4, f"{_sql_numero('frecuencia_cardiaca')} > {FCF_TAQUICARDIA}"),
+    ('Hipertensión', 4,
+     f"(sistolica > {SISTOLICA_HIPERTENSION} OR diastolica > {DIASTOLICA_HIPERTENSION}) "
+     f"AND NOT COALESCE({_HIPOTENSION_SQL}, 0)"),
+    ('Hipotensión', 3, _HIPOTENSION_SQL),
+    ('Contracciones uterinas frecuentes', 3, f"{_sql_numero('contracciones')} > {CONTRACCIONES_FRECUENTES}"),
+    ('Dilatación completa, preparar para el parto', 3, f"{_sql_numero('dilatacion')} >= {DILATACION_COMPLETA}"),
+    ('Error en la medición de la presión arterial', 2, "sistolica IS NULL"),
+    ('Contracciones uterinas insuficientes', 2, f"{_sql_numero('contracciones')} < {CONTRACCIONES_INSUFICIENTES}"),
+    ('Dilatación cervical lenta', 1, f"{_sql_numero('dilatacion')} < {DILATACION_LENTA}"),
+]
+# Intervalo entre mediciones para la próxima medición de estado_paciente, salvo que la paciente
+# tenga uno propio en intervalos_medicion (igual que proximas_mediciones.INTERVALO_MINUTOS).
+_INTERVALO_MINUTOS_SQL = 30
+
+# Columnas de estado_paciente copiadas de la última medición de la paciente.
+_COLUMNAS_ULTIMA = ['dilatacion', 'frecuencia_cardiaca', 'contracciones', 'presion_arterial']
+
+# Recalcula el estado de las pacientes que cumplen `filtro` (sobre mediciones) a partir de sus
+# mediciones: última y primera medición por el índice (id_paciente, fecha) y el conteo.
+def _sql_estado_recalcular(filtro):
+    return f"""
+        INSERT OR REPLACE INTO estado_paciente (
+            id_paciente, n_mediciones, id_medicion, ultima_fecha, {', '.join(_COLUMNAS_ULTIMA)},
+            sistolica, diastolica, primera_fecha, dilatacion_inicial
+        )
+        SELECT c.id_paciente, c.n, u.id, u.fecha, {', '.join('u.' + columna for columna in _COLUMNAS_ULTIMA)},
+               {_sql_presion('u.presion_arterial', 'sistolica')}, {_sql_presion('u.presion_arterial', 'diastolica')},
+               f.fecha, f.dilatacion
+        FROM (SELECT id_paciente, COUNT(*) AS n FROM mediciones WHERE {filtro} GROUP BY id_paciente) c
+        JOIN mediciones u ON u.id = (
+            SELECT id FROM mediciones WHERE id_paciente = c.id_paciente ORDER BY fecha DESC, id DESC LIMIT 1
+        )
+        JOIN mediciones f ON f.id = (
+            SELECT id FROM mediciones WHERE id_paciente = c.id_paciente ORDER BY fecha, id LIMIT 1
+        )
+    """
+
+# Completa las columnas derivadas (diagnóstico, próxima medición y velocidad de dilatación) de
+# las filas de estado_paciente que cumplen `filtro`.
+def _sql_estado_derivar(filtro):
+    diagnostico = " ".join(f"WHEN {condicion} THEN '{estado}'" for estado, _, condicion in _REGLAS_SQL)
+    severidad = " ".join(f"WHEN {condicion} THEN {nivel}" for _, nivel, condicion in _REGLAS_SQL)
+    horas = "(julianday(ultima_fecha) - julianday(primera_fecha)) * 24"
+    return f"""
+        UPDATE estado_paciente SET
+            diagnostico = CASE {diagnostico} ELSE 'Normal' END,
+            severidad = CASE {severidad} ELSE 0 END,
+            proxima_medicion = datetime(ultima_fecha, '+' || COALESCE(
+                (SELECT intervalo_minutos FROM intervalos_medicion i WHERE i.id_paciente = estado_paciente.id_paciente),
+                {_INTERVALO_MINUTOS_SQL}
+            ) || ' minutes'),
+            velocidad_dilatacion = CASE WHEN {horas} > 0
+                THEN round(({_sql_numero('dilatacion')} - {_sql_numero('dilatacion_inicial')}) / ({horas}), 2) END
+        WHERE {filtro}
+    """
+
+# Sentencias para actualizar el estado de una paciente (expresión SQL) tras editar o eliminar
+# sus mediciones: se borra y se vuelve a calcular, así que desaparece si ya no tiene mediciones.
+def _sql_estado_paciente(id_paciente):
+    return (
+        f"DELETE FROM estado_paciente WHERE id_paciente = {id_paciente};"
+        f"{_sql_estado_recalcular(f'id_paciente = {id_paciente}')};"
+        f"{_sql_estado_derivar(f'id_paciente = {id_paciente}')};"
+    )
+
+# Al insertar, el estado se actualiza sin recorrer las mediciones de la paciente: se suma al
+# conteo y la nueva medición reemplaza a la última (o a la primera) según su fecha.
+def _sql_estado_insertar():
+    es_ultima = "(COALESCE(excluded.ultima_fecha, ''), excluded.id_medicion) > (COALESCE(ultima_fecha, ''), id_medicion)"
+    es_primera = "COALESCE(excluded.primera_fecha, '') < COALESCE(primera_fecha, '')"
+    ultima = ['id_medicion', 'ultima_fecha'] + _COLUMNAS_ULTIMA + ['sistolica', 'diastolica']
+    asignaciones = ",\n".join(
+        [f"{columna} = CASE WHEN {es_ultima} THEN excluded.{columna} ELSE {columna} END" for columna in ultima]
+        + [f"{columna} = CASE WHEN {es_primera} THEN excluded.{columna} ELSE {columna} END"
+           for columna in ('primera_fecha', 'dilatacion_inicial')]
+    )
+    return f"""
+        INSERT INTO estado_paciente (
+            id_paciente, n_mediciones, id_medicion, ultima_fecha, {', '.join(_COLUMNAS_ULTIMA)},
+            sistolica, diastolica, primera_fecha, dilatacion_inicial
+        ) VALUES (
+            NEW.id_paciente, 1, NEW.id, NEW.fecha, {', '.join('NEW.' + columna for columna in _COLUMNAS_ULTIMA)},
+            {_sql_presion('NEW.presion_arterial', 'sistolica')}, {_sql_presion('NEW.presion_arterial', 'diastolica')},
+            NEW.fecha, NEW.dilatacion
+        )
+        ON CONFLICT(id_paciente) DO UPDATE SET
+            n_mediciones = n_mediciones + 1,
+            {asignaciones};
+        {_sql_estado_derivar('id_paciente = NEW.id_paciente')};
+    """
+
+# Migraciones del esquema de partoseguro.db, en orden. Cada una lleva la base de datos a la
+# versión indicada (guardada en PRAGMA user_version) y no debe modificarse una vez publicada:
+# los cambios nuevos se agregan como una migración adicional al final de la lista.
+MIGRACIONES = [
+    (1, "Tablas base y patologías comunes", [
+        """
+        CREATE TABLE IF NOT EXISTS patologias (
+            nombre TEXT PRIMARY KEY
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS pacientes (
+            id TEXT PRIMARY KEY,
+            nombre TEXT,
+            edad INTEGER,
+            fum DATE,
+            patologia TEXT,
+            FOREIGN KEY(patologia) REFERENCES patologias(nombre)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS mediciones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_paciente TEXT,
+            fecha TIMESTAMP,
+            dilatacion INTEGER,
+            frecuencia_cardiaca INTEGER,
+            contracciones INTEGER,
+            presion_arterial TEXT,
+            FOREIGN KEY(id_paciente) REFERENCES pacientes(id)
+        )
+        """,
+        """
+        INSERT INTO patologias (nombre)
+        SELECT nombre FROM (
+            SELECT 'Hipertensión' AS nombre UNION ALL SELECT 'Diabetes Gestacional' UNION ALL SELECT 'Anemia'
+            UNION ALL SELECT 'Tiroides' UNION ALL SELECT 'Preeclampsia' UNION ALL SELECT 'Sin patologías'
+        )
+        WHERE NOT EXISTS (SELECT 1 FROM patologias)
+        """,
+    ]),
+    (2, "Índices para la última medición por paciente y por rango de fechas", [
+        "CREATE INDEX IF NOT EXISTS idx_mediciones_paciente_fecha ON mediciones (id_paciente, fecha)",
+        "CREATE INDEX IF NOT EXISTS idx_mediciones_fecha ON mediciones (fecha)",
+    ]),
+    (3, "Revisiones por paciente para invalidar el almacén de mediciones", [
+        # Se incrementan cuando una medición se actualiza, se elimina o se inserta con un id menor
+        # al último asignado; así se detectan también los cambios hechos desde otras aplicaciones.
+        """
+        CREATE TABLE IF NOT EXISTS mediciones_revisiones (
+            id_paciente TEXT PRIMARY KEY,
+            revision INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_mediciones_revision_update AFTER UPDATE ON mediciones
+        BEGIN
+            INSERT INTO mediciones_revisiones (id_paciente, revision) VALUES (OLD.id_paciente, 1)
+                ON CONFLICT(id_paciente) DO UPDATE SET revision = revision + 1;
+            INSERT INTO mediciones_revisiones (id_paciente, revision) VALUES (NEW.id_paciente, 1)
+                ON CONFLICT(id_paciente) DO UPDATE SET revision = revision + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_mediciones_revision_delete AFTER DELETE ON mediciones
+        BEGIN
+            INSERT INTO mediciones_revisiones (id_paciente, revision) VALUES (OLD.id_paciente, 1)
+                ON CONFLICT(id_paciente) DO UPDATE SET revision = revision + 1;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_mediciones_revision_insert AFTER INSERT ON mediciones
+        WHEN NEW.id < (SELECT seq FROM sqlite_sequence WHERE name = 'mediciones')
+        BEGIN
+            INSERT INTO mediciones_revisiones (id_paciente, revision) VALUES (NEW.id_paciente, 1)
+                ON CONFLICT(id_paciente) DO UPDATE SET revision = revision + 1;
+        END
+        """,
+    ]),
+    (4, "Intervalos de medición por paciente y alertas del planificador", [
+        """
+        CREATE TABLE IF NOT EXISTS intervalos_medicion (
+            id_paciente TEXT PRIMARY KEY,
+            intervalo_minutos INTEGER NOT NULL CHECK (intervalo_minutos > 0),
+            FOREIGN KEY(id_paciente) REFERENCES pacientes(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS alertas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            id_paciente TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            vence TIMESTAMP NOT NULL,
+            emitida TIMESTAMP NOT NULL,
+            resuelta TIMESTAMP,
+            FOREIGN KEY(id_paciente) REFERENCES pacientes(id)
+        )
+        """,
+        # Una sola alerta abierta por paciente y tipo, aunque haya varios planificadores corriendo.
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_alertas_abiertas ON alertas (id_paciente, tipo) WHERE resuelta IS NULL",
+    ]),
+    (5, "Presión arterial sistólica y diastólica como columnas enteras", [
+        "ALTER TABLE mediciones ADD COLUMN sistolica INTEGER",
+        "ALTER TABLE mediciones ADD COLUMN diastolica INTEGER",
+        # La revisión solo debe cambiar cuando cambian los datos de la medición, no cuando se
+        # completan las columnas derivadas: el trigger se recrea limitado a esas columnas, después
+        # de rellenar las filas existentes en una sola sentencia.
+        "DROP TRIGGER IF EXISTS trg_mediciones_revision_update",
+        f"UPDATE mediciones SET {SQL_COMPLETAR_PRESION}",
+        """
+        CREATE TRIGGER trg_mediciones_revision_update
+        AFTER UPDATE OF id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial ON mediciones
+        BEGIN
+            INSERT INTO mediciones_revisiones (id_paciente, revision) VALUES (OLD.id_paciente, 1)
+                ON CONFLICT(id_paciente) DO UPDATE SET revision = revision + 1;
+            INSERT INTO mediciones_revisiones (id_paciente, revision) VALUES (NEW.id_paciente, 1)
+                ON CONFLICT(id_paciente) DO UPDATE SET revision = revision + 1;
+        END
+        """,
+        # Las aplicaciones guardan sistolica y diastolica al escribir; estos triggers cubren a los
+        # escritores que no las conocen (db_manager.py, que edita cualquier columna, o procesos
+        # con una versión anterior de las aplicaciones).
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_mediciones_presion_insert AFTER INSERT ON mediciones
+        WHEN NEW.sistolica IS NULL AND NEW.presion_arterial IS NOT NULL
+        BEGIN
+            UPDATE mediciones SET {SQL_COMPLETAR_PRESION} WHERE id = NEW.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_mediciones_presion_update AFTER UPDATE OF presion_arterial ON mediciones
+        BEGIN
+            UPDATE mediciones SET {SQL_COMPLETAR_PRESION} WHERE id = NEW.id;
+        END
+        """,
+        # Tamizaje de hipertensión e hipotensión en toda la sala por rango de valores.
+        "CREATE INDEX IF NOT EXISTS idx_mediciones_sistolica ON mediciones (sistolica)",
+        "CREATE INDEX IF NOT EXISTS idx_mediciones_diastolica ON mediciones (diastolica)",
+    ]),
+    (6, "Estado materializado por paciente", [
+        # Resumen de cada paciente con mediciones, mantenido por triggers: la vista de la sala lo
+        # lee en una sola consulta sin agregar mediciones. La presión arterial se separa del
+        # texto de la medición, sin depender del orden en que corren los triggers de la migración 5.
+        """
+        CREATE TABLE IF NOT EXISTS estado_paciente (
+            id_paciente TEXT PRIMARY KEY,
+            n_mediciones INTEGER NOT NULL,
+            id_medicion INTEGER NOT NULL,
+            ultima_fecha TIMESTAMP,
+            dilatacion INTEGER,
+            frecuencia_cardiaca INTEGER,
+            contracciones INTEGER,
+            presion_arterial TEXT,
+            sistolica INTEGER,
+            diastolica INTEGER,
+            primera_fecha TIMESTAMP,
+            dilatacion_inicial INTEGER,
+            diagnostico TEXT,
+            severidad INTEGER,
+            proxima_medicion TIMESTAMP,
+            velocidad_dilatacion REAL
+        )
+        """,
+        _sql_estado_recalcular('1'),
+        _sql_estado_derivar('1'),
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_estado_paciente_insert AFTER INSERT ON mediciones
+        BEGIN
+            {_sql_estado_insertar()}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_estado_paciente_update
+        AFTER UPDATE OF id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial ON mediciones
+        BEGIN
+            {_sql_estado_paciente('OLD.id_paciente')}
+            {_sql_estado_paciente('NEW.id_paciente')}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_estado_paciente_delete AFTER DELETE ON mediciones
+        BEGIN
+            {_sql_estado_paciente('OLD.id_paciente')}
+        END
+        """,
+        # La próxima medición depende del intervalo de cada paciente.
+        *[
+            f"""
+            CREATE TRIGGER IF NOT EXISTS trg_estado_paciente_intervalo_{evento.lower()} AFTER {evento} ON intervalos_medicion
+            BEGIN
+                {_sql_estado_derivar(f'id_paciente = {fila}.id_paciente')};
+            END
+            """
+            for evento, fila in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD'))
+        ],
+        # Pacientes activas: medidas desde una fecha.
+        "CREATE INDEX IF NOT EXISTS idx_estado_paciente_ultima_fecha ON estado_paciente (ultima_fecha)",
+    ]),
+    (7, "Índice de búsqueda de texto completo sobre pacientes", [
+        # Índice FTS5 con contenido externo: guarda solo los términos de id, nombre y patología
+        # (sin acentos, con prefijos de 1 a 3 caracteres precalculados) y lee las filas de
+        # pacientes por rowid. Los triggers lo mantienen al día con cualquier escritura.
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS pacientes_busqueda USING fts5(
+            id, nombre, patologia,
+            content='pacientes', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+        )
+        """,
+        "INSERT INTO pacientes_busqueda (pacientes_busqueda) VALUES ('rebuild')",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_pacientes_busqueda_insert AFTER INSERT ON pacientes
+        BEGIN
+            INSERT INTO pacientes_busqueda (rowid, id, nombre, patologia)
+                VALUES (NEW.rowid, NEW.id, NEW.nombre, NEW.patologia);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_pacientes_busqueda_delete AFTER DELETE ON pacientes
+        BEGIN
+            INSERT INTO pacientes_busqueda (pacientes_busqueda, rowid, id, nombre, patologia)
+                VALUES ('delete', OLD.rowid, OLD.id, OLD.nombre, OLD.patologia);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_pacientes_busqueda_update AFTER UPDATE ON pacientes
+        BEGIN
+            INSERT INTO pacientes_busqueda (pacientes_busqueda, rowid, id, nombre, patologia)
+                VALUES ('delete', OLD.rowid, OLD.id, OLD.nombre, OLD.patologia);
+            INSERT INTO pacientes_busqueda (rowid, id, nombre, patologia)
+                VALUES (NEW.rowid, NEW.id, NEW.nombre, NEW.patologia);
+        END
+        """,
+    ]),
+    (8, "Estado del episodio de parto y archivo de episodios cerrados", [
+        # Cada fila de pacientes es un episodio de parto: activo mientras dura el trabajo de parto
+        # y finalizado al registrar el parto. archivo_historico.py mueve los episodios finalizados
+        # a la base de archivo, así que partoseguro.db solo guarda el conjunto vivo.
+        "ALTER TABLE pacientes ADD COLUMN estado_episodio TEXT NOT NULL DEFAULT 'activo' "
+        "CHECK (estado_episodio IN ('activo', 'finalizado'))",
+        "ALTER TABLE pacientes ADD COLUMN fecha_finalizacion TIMESTAMP",
+        "CREATE INDEX IF NOT EXISTS idx_pacientes_episodio ON pacientes (estado_episodio, fecha_finalizacion)",
+        # Episodios que se están archivando, solo dentro de la transacción del archivo: sus
+        # mediciones se borran en bloque sin recalcular estado_paciente ni las revisiones fila
+        # por fila, porque la paciente entera sale de la base en la misma transacción.
+        """
+        CREATE TABLE IF NOT EXISTS episodios_archivando (
+            id_paciente TEXT PRIMARY KEY
+        )
+        """,
+        "DROP TRIGGER IF EXISTS trg_estado_paciente_delete",
+        f"""
+        CREATE TRIGGER trg_estado_paciente_delete AFTER DELETE ON mediciones
+        WHEN NOT EXISTS (SELECT 1 FROM episodios_archivando WHERE id_paciente = OLD.id_paciente)
+        BEGIN
+            {_sql_estado_paciente('OLD.id_paciente')}
+        END
+        """,
+        "DROP TRIGGER IF EXISTS trg_mediciones_revision_delete",
+        """
+        CREATE TRIGGER trg_mediciones_revision_delete AFTER DELETE ON mediciones
+        WHEN NOT EXISTS (SELECT 1 FROM episodios_archivando WHERE id_paciente = OLD.id_paciente)
+        BEGIN
+            INSERT INTO mediciones_revisiones (id_paciente, revision) VALUES (OLD.id_paciente, 1)
+                ON CONFLICT(id_paciente) DO UPDATE SET revision = revision + 1;
+        END
+        """,
+        # El índice de búsqueda solo cambia con las columnas que indexa, no con el estado del episodio.
+        "DROP TRIGGER IF EXISTS trg_pacientes_busqueda_update",
+        """
+        CREATE TRIGGER trg_pacientes_busqueda_update AFTER UPDATE OF id, nombre, patologia ON pacientes
+        BEGIN
+            INSERT INTO pacientes_busqueda (pacientes_busqueda, rowid, id, nombre, patologia)
+                VALUES ('delete', OLD.rowid, OLD.id, OLD.nombre, OLD.patologia);
+            INSERT INTO pacientes_busqueda (rowid, id, nombre, patologia)
+                VALUES (NEW.rowid, NEW.id, NEW.nombre, NEW.patologia);
+        END
+        """,
+    ]),
+    (9, "Trazas de cardiotocografía en bloques comprimidos", [
+        # Cada fila es un bloque de BLOQUE_MINUTOS minutos de una señal (ver trazas_ctg.py): las
+        # muestras van como enteros de 16 bits comprimidos en datos, no como una fila por muestra.
+        # inicio está alineado al comienzo del bloque y version cambia con cada escritura.
+        """
+        CREATE TABLE IF NOT EXISTS trazas_ctg (
+            id_paciente TEXT NOT NULL,
+            senal TEXT NOT NULL CHECK (senal IN ('fcf', 'toco')),
+            inicio TIMESTAMP NOT NULL,
+            frecuencia_hz REAL NOT NULL CHECK (frecuencia_hz > 0),
+            n_muestras INTEGER NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1,
+            datos BLOB NOT NULL,
+            PRIMARY KEY (id_paciente, senal, inicio),
+            FOREIGN KEY(id_paciente) REFERENCES pacientes(id)
+        )
+        """,
+    ]),
+    (10, "Resumen por minuto de la cardiotocografía", [
+        # Una fila por paciente y minuto de traza analizado (ver analisis_ctg.py): línea de base,
+        # variabilidad y eventos de la frecuencia cardíaca fetal. Es una tabla derivada de
+        # trazas_ctg; el análisis la completa a medida que llegan muestras.
+        """
+        CREATE TABLE IF NOT EXISTS analisis_ctg (
+            id_paciente TEXT NOT NULL,
+            minuto TIMESTAMP NOT NULL,
+            linea_base REAL,
+            vcp_ms REAL,
+            amplitud_lpm REAL,
+            aceleraciones INTEGER NOT NULL DEFAULT 0,
+            desaceleraciones INTEGER NOT NULL DEFAULT 0,
+            calidad REAL NOT NULL,
+            PRIMARY KEY (id_paciente, minuto),
+            FOREIGN KEY(id_paciente) REFERENCES pacientes(id)
+        )
+        """,
+    ]),
+    (11, "Contracciones detectadas en la tocografía", [
+        # Una fila por contracción detectada (ver contracciones_ctg.py), identificada por su pico;
+        # inicio y fin son los cruces del umbral sobre el tono basal. El conteo en 10 minutos que
+        # se completa en mediciones.contracciones sale de esta tabla.
+        """
+        CREATE TABLE IF NOT EXISTS contracciones_ctg (
+            id_paciente TEXT NOT NULL,
+            pico TIMESTAMP NOT NULL,
+            inicio TIMESTAMP NOT NULL,
+            fin TIMESTAMP NOT NULL,
+            amplitud REAL NOT NULL,
+            PRIMARY KEY (id_paciente, pico),
+            FOREIGN KEY(id_paciente) REFERENCES pacientes(id)
+        )
+        """,
+    ]),
+]
+
+VERSION_ACTUAL = MIGRACIONES[-1][0]
+
+# Rutas ya migradas en este proceso, para no repetir el trabajo en cada rerun de Streamlit.
+_bases_inicializadas = set()
+_lock = threading.Lock()
+
+# Función para leer la versión del esquema de una conexión.
+def obtener_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+# Función para aplicar las migraciones pendientes hasta la versión indicada (por defecto, la última).
+# Cada migración corre en su propia transacción; BEGIN IMMEDIATE serializa a los procesos que
+# arrancan a la vez, y la versión se vuelve a leer dentro de la transacción.
+def aplicar_migraciones(conn, hasta=VERSION_ACTUAL):
+    aplicadas = []
+    if obtener_version(conn) >= hasta:
+        return aplicadas
+    for version, descripcion, sentencias in MIGRACIONES:
+        if version > hasta:
+            break
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if obtener_version(conn) >= version:
+                conn.rollback()
+                continue
+            for sql in sentencias:
+                conn.execute(sql)
+            conn.execute(f"PRAGMA user_version = {version:d}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        aplicadas.append((version, descripcion))
+    return aplicadas
+
+# Función para migrar una base de datos una sola vez por proceso.
+def inicializar_bd(ruta):
+    with _lock:
+        if ruta in _bases_inicializadas:
+            return
+        conn = sqlite3.connect(ruta)
+        try:
+            aplicar_migraciones(conn)
+        finally:
+            conn.close()
+        _bases_inicializadas.add(ruta)
+
+# Función para abrir una conexión con el esquema al día y las claves foráneas activadas.
+# PRAGMA foreign_keys es propio de cada conexión, por eso se activa en cada apertura.
+def conectar(ruta, **kwargs):
+    inicializar_bd(ruta)
+    conn = sqlite3.connect(ruta, **kwargs)
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
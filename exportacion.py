@@ -0,0 +1,178 @@
+import argparse
+import csv
+import os
+import time
+import uuid
+
+import pandas as pd
+
+# Filas que se leen y se escriben por lote: la memoria usada depende de este tamaño y no del
+# tamaño de la tabla.
+TAMANO_LOTE = 10000
+FORMATOS = ('csv', 'parquet')
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+# Carpeta privada (no la sirve Streamlit) donde se escriben las exportaciones del tablero antes
+# de entregarlas con st.download_button. Se resuelve junto a este módulo para no depender del
+# directorio desde el que se lanza la aplicación.
+CARPETA_EXPORTACIONES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'exportaciones')
+# Las exportaciones del tablero se borran pasada una hora.
+VIGENCIA_EXPORTACIONES_S = 3600
+
+COLUMNAS_EXPORTACION = [
+    'id_medicion', 'id_paciente', 'nombre', 'edad', 'fum', 'patologia',
+    'fecha', 'dilatacion', 'frecuencia_cardiaca', 'contracciones', 'presion_arterial',
+]
+COLUMNAS_ENTERAS = ['edad', 'dilatacion', 'frecuencia_cardiaca', 'contracciones']
+
+SQL_EXPORTACION = """
+SELECT m.id, m.id_paciente, p.nombre, p.edad, p.fum, p.patologia,
+       m.fecha, m.dilatacion, m.frecuencia_cardiaca, m.contracciones, m.presion_arterial
+FROM mediciones m
+LEFT JOIN pacientes p ON p.id = m.id_paciente
+"""
+
+# Función para armar la consulta de exportación con los filtros indicados. Las fechas se
+# comparan como texto 'YYYY-MM-DD HH:MM:SS', que es como las guardan las aplicaciones.
+def _consulta(desde=None, hasta=None, id_pacientes=None):
+    condiciones, parametros = [], []
+    if desde is not None:
+        condiciones.append("m.fecha >= ?")
+        parametros.append(desde.strftime(FORMATO_FECHA))
+    if hasta is not None:
+        condiciones.append("m.fecha <= ?")
+        parametros.append(hasta.strftime(FORMATO_FECHA))
+    if id_pacientes:
+        condiciones.append(f"m.id_paciente IN ({', '.join('?' * len(id_pacientes))})")
+        parametros.extend(id_pacientes)
+    sql = SQL_EXPORTACION
+    if condiciones:
+        sql += "WHERE " + " AND ".join(condiciones) + "\n"
+    # Con filtro por paciente, el índice (id_paciente, fecha) resuelve filtro y orden.
+    sql += "ORDER BY m.id_paciente, m.fecha, m.id" if id_pacientes else "ORDER BY m.id"
+    return sql, parametros
+
+# Generador de lotes de filas (tuplas) de mediciones con los datos de su paciente.
+# Usa un solo cursor con fetchmany, así que nunca hay más de tamano_lote filas en memoria.
+def iterar_lotes(conn, desde=None, hasta=None, id_pacientes=None, tamano_lote=TAMANO_LOTE):
+    sql, parametros = _consulta(desde, hasta, id_pacientes)
+    cursor = conn.execute(sql, parametros)
+    try:
+        while True:
+            filas = cursor.fetchmany(tamano_lote)
+            if not filas:
+                break
+            yield filas
+    finally:
+        cursor.close()
+
+def _escribir_csv(lotes, destino):
+    filas = 0
+    with open(destino, 'w', newline='', encoding='utf-8') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(COLUMNAS_EXPORTACION)
+        for lote in lotes:
+            escritor.writerows(lote)
+            filas += len(lote)
+    return filas
+
+# Parquet requiere pyarrow, que es opcional. El esquema es fijo para que todos los lotes
+# coincidan; los valores numéricos que no son números (db_manager.py permite texto libre)
+# se exportan como nulos.
+def _escribir_parquet(lotes, destino):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ValueError(f"Para exportar a Parquet se necesita pyarrow: {e}")
+    esquema = pa.schema([
+        (columna, pa.int64() if columna in COLUMNAS_ENTERAS + ['id_medicion'] else pa.string())
+        for columna in COLUMNAS_EXPORTACION
+    ])
+    filas = 0
+    with pq.ParquetWriter(destino, esquema) as escritor:
+        for lote in lotes:
+            df = pd.DataFrame(lote, columns=COLUMNAS_EXPORTACION)
+            for columna in COLUMNAS_ENTERAS:
+                df[columna] = pd.to_numeric(df[columna], errors='coerce').astype('Int64')
+            for columna in COLUMNAS_EXPORTACION:
+                if columna not in COLUMNAS_ENTERAS and columna != 'id_medicion':
+                    df[columna] = df[columna].astype('string')
+            escritor.write_table(pa.Table.from_pandas(df, schema=esquema, preserve_index=False))
+            filas += len(lote)
+    return filas
+
+# Función para exportar las mediciones (con los datos de cada paciente) a un archivo CSV o
+# Parquet, lote por lote, filtrando opcionalmente por rango de fechas y pacientes.
+# Devuelve un resumen con las filas escritas, el tamaño del archivo y el tiempo empleado.
+def exportar_mediciones(pool, destino, formato='csv', desde=None, hasta=None, id_pacientes=None,
+                        tamano_lote=TAMANO_LOTE):
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportación desconocido: {formato}")
+    inicio = time.perf_counter()
+    with pool.lectura() as conn:
+        lotes = iterar_lotes(conn, desde, hasta, id_pacientes, tamano_lote)
+        if formato == 'csv':
+            filas = _escribir_csv(lotes, destino)
+        else:
+            filas = _escribir_parquet(lotes, destino)
+    segundos = time.perf_counter() - inicio
+    return {
+        'filas': filas,
+        'bytes': os.path.getsize(destino),
+        'segundos': round(segundos, 3),
+        'filas_por_segundo': round(filas / segundos) if segundos else 0,
+    }
+
+# Función para exportar desde el tablero: escribe el archivo en la carpeta de exportaciones con
+# un nombre único y borra las exportaciones vencidas. Devuelve (ruta, resumen).
+def exportar_para_descarga(pool, formato='csv', carpeta=CARPETA_EXPORTACIONES, **filtros):
+    os.makedirs(carpeta, exist_ok=True)
+    limpiar_exportaciones(carpeta)
+    nombre = f"mediciones_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}.{formato}"
+    ruta = os.path.join(carpeta, nombre)
+    try:
+        resumen = exportar_mediciones(pool, ruta, formato, **filtros)
+    except BaseException:
+        if os.path.exists(ruta):
+            os.remove(ruta)
+        raise
+    return ruta, resumen
+
+# Función para borrar las exportaciones más antiguas que la vigencia indicada.
+def limpiar_exportaciones(carpeta=CARPETA_EXPORTACIONES, vigencia_s=VIGENCIA_EXPORTACIONES_S):
+    if not os.path.isdir(carpeta):
+        return
+    limite = time.time() - vigencia_s
+    for entrada in os.scandir(carpeta):
+        if entrada.is_file() and entrada.name.startswith('mediciones_') and entrada.stat().st_mtime < limite:
+            os.remove(entrada.path)
+
+# Uso: python exportacion.py salida.csv [--bd partoseguro.db] [--desde 2024-01-01] [--paciente ID ...]
+def main():
+    from conexiones import obtener_pool
+
+    parser = argparse.ArgumentParser(description="Exporta las mediciones con los datos de cada paciente a CSV o Parquet.")
+    parser.add_argument('destino', help="Archivo de salida (.csv o .parquet)")
+    parser.add_argument('--bd', default='partoseguro.db', help="Base de datos de origen (por defecto: partoseguro.db)")
+    parser.add_argument('--formato', choices=FORMATOS, help="Formato de salida (por defecto, según la extensión)")
+    parser.add_argument('--desde', type=pd.Timestamp, help="Fecha u hora inicial, por ejemplo 2024-01-01 o '2024-01-01 08:00'")
+    parser.add_argument('--hasta', type=pd.Timestamp, help="Fecha u hora final")
+    parser.add_argument('--paciente', action='append', dest='id_pacientes', help="ID de paciente (se puede repetir)")
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help=f"Filas por lote (por defecto: {TAMANO_LOTE})")
+    args = parser.parse_args()
+    formato = args.formato or ('parquet' if args.destino.lower().endswith(('.parquet', '.pq')) else 'csv')
+
+    pool = obtener_pool(args.bd)
+    try:
+        resumen = exportar_mediciones(pool, args.destino, formato, args.desde, args.hasta, args.id_pacientes, args.lote)
+    except ValueError as e:
+        parser.exit(1, f"Error: {e}\n")
+    finally:
+        pool.cerrar()
+    for clave, valor in resumen.items():
+        print(f"{clave}: {valor}")
+
+
+if __name__ == '__main__':
+    main()
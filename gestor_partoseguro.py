@@ -2,49 +2,62 @@ import streamlit as st
 import pandas as pd
 import sqlite3
 from datetime import datetime
+from archivo_historico import HORAS_RETENCION, RUTA_ARCHIVO, archivar_episodios
+from busqueda import buscar_pacientes, etiqueta_paciente
+from conexiones import obtener_pool
+from importacion import COLUMNAS_REQUERIDAS, importar_mediciones
+from paneles import panel_exportacion
+from validacion import separar_presion
 
-# Conexión con la base de datos SQLite
-conn = sqlite3.connect('partoseguro.db', check_same_thread=False)
-c = conn.cursor()
+# Pool de conexiones con la base de datos SQLite, compartido por todas las sesiones. Las
+# escrituras van por la cola del pool (pool.escribir), que confirma juntas las que llegan a la vez.
+pool = obtener_pool('partoseguro.db')
 
 # Funciones CRUD para la tabla 'pacientes'
 def create_patient(id, nombre, edad, fum, patologia):
-    c.execute("INSERT INTO pacientes (id, nombre, edad, fum, patologia) VALUES (?, ?, ?, ?, ?)", 
-              (id, nombre, edad, fum, patologia))
-    conn.commit()
+    pool.escribir("INSERT INTO pacientes (id, nombre, edad, fum, patologia) VALUES (?, ?, ?, ?, ?)", (id, nombre, edad, fum, patologia))
 
 def read_patients():
-    return pd.read_sql("SELECT * FROM pacientes", conn)
+    with pool.lectura() as conn:
+        return pd.read_sql("SELECT * FROM pacientes", conn)
 
 def update_patient(id, nombre, edad, fum, patologia):
-    c.execute("UPDATE pacientes SET nombre=?, edad=?, fum=?, patologia=? WHERE id=?", 
-              (nombre, edad, fum, patologia, id))
-    conn.commit()
+    pool.escribir("UPDATE pacientes SET nombre=?, edad=?, fum=?, patologia=? WHERE id=?", (nombre, edad, fum, patologia, id))
 
 def delete_patient(id):
-    c.execute("DELETE FROM pacientes WHERE id=?", (id,))
-    conn.commit()
+    pool.escribir("DELETE FROM pacientes WHERE id=?", (id,))
 
 # Funciones CRUD para 'mediciones'
 def create_medicion(id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial):
-    c.execute("INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial) VALUES (?, ?, ?, ?, ?, ?)", 
-              (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial))
-    conn.commit()
+    sistolica, diastolica = separar_presion(presion_arterial)
+    pool.escribir("INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial, sistolica, diastolica) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial, sistolica, diastolica))
 
-def read_mediciones():
-    return pd.read_sql("SELECT * FROM mediciones", conn)
+# Solo las últimas mediciones: la tabla completa se descarga con la exportación por lotes.
+MEDICIONES_VISIBLES = 1000
+
+def read_mediciones(limite=MEDICIONES_VISIBLES):
+    with pool.lectura() as conn:
+        return pd.read_sql("SELECT * FROM mediciones ORDER BY id DESC LIMIT ?", conn, params=(limite,))
 
 # Funciones CRUD para 'patologias'
 def create_patologia(nombre):
-    c.execute("INSERT INTO patologias (nombre) VALUES (?)", (nombre,))
-    conn.commit()
+    pool.escribir("INSERT INTO patologias (nombre) VALUES (?)", (nombre,))
 
 def read_patologias():
-    return pd.read_sql("SELECT * FROM patologias", conn)
+    with pool.lectura() as conn:
+        return pd.read_sql("SELECT * FROM patologias", conn)
 
 def delete_patologia(nombre):
-    c.execute("DELETE FROM patologias WHERE nombre=?", (nombre,))
-    conn.commit()
+    pool.escribir("DELETE FROM patologias WHERE nombre=?", (nombre,))
+
+# Búsqueda de pacientes por ID, nombre o patología en el índice de texto completo.
+def search_patients(texto, solo_activos=False):
+    with pool.lectura() as conn:
+        return buscar_pacientes(conn, texto, solo_activos=solo_activos)
+
+def read_patient_ids():
+    with pool.lectura() as conn:
+        return [p[0] for p in conn.execute("SELECT id FROM pacientes")]
 
 # UI de la aplicación Streamlit
 st.title("Gestor de Base de Datos PartoSeguro")
@@ -63,7 +76,10 @@ if option == 'pacientes':
         new_patologia = st.text_input("Patología de Base")
         submit_button = st.form_submit_button(label='Agregar Paciente')
         if submit_button:
-            create_patient(new_id, new_name, new_age, new_fum, new_patologia)
+            try:
+                create_patient(new_id, new_name, new_age, new_fum, new_patologia)
+            except sqlite3.IntegrityError as e:
+                st.error(f"No se pudo agregar el paciente: {e}")
 
     # Mostrar los pacientes existentes
     st.write("Pacientes existentes:")
@@ -79,30 +95,76 @@ if option == 'pacientes':
         update_patologia = st.text_input("Nueva Patología")
         update_button = st.form_submit_button(label='Actualizar Paciente')
         if update_button:
-            update_patient(update_id, update_name, update_age, update_fum, update_patologia)
+            try:
+                update_patient(update_id, update_name, update_age, update_fum, update_patologia)
+            except sqlite3.IntegrityError as e:
+                st.error(f"No se pudo actualizar el paciente: {e}")
 
     # Formulario para eliminar un paciente
     delete_id = st.text_input("ID del Paciente a eliminar")
     if st.button('Eliminar Paciente'):
-        delete_patient(delete_id)
+        try:
+            delete_patient(delete_id)
+        except sqlite3.IntegrityError as e:
+            st.error(f"No se pudo eliminar el paciente (¿tiene mediciones registradas?): {e}")
+
+    # Archivo de episodios cerrados: mueve los partos ya finalizados, con sus mediciones, a la
+    # base de archivo para que la base viva solo tenga a las pacientes en curso.
+    with st.form(key='archive_episodes_form'):
+        st.write(f"Archivar episodios finalizados en {RUTA_ARCHIVO}")
+        horas_retencion = st.number_input("Horas desde la finalización", min_value=0, value=HORAS_RETENCION)
+        compactar = st.checkbox("Compactar la base de datos después (VACUUM)")
+        archive_button = st.form_submit_button(label='Archivar Episodios')
+        if archive_button:
+            resumen = archivar_episodios(pool, horas_retencion=horas_retencion, vacuum=compactar)
+            st.success(f"Se archivaron {resumen['episodios']} episodios con {resumen['mediciones']} mediciones.")
+            st.json(resumen)
 
 elif option == 'mediciones':
     # Funcionalidades para 'mediciones'
+    # La paciente se elige entre los resultados de la búsqueda, no entre todo el censo.
+    texto_busqueda = st.text_input("Buscar paciente", placeholder="ID, nombre o patología")
+    solo_activas = st.checkbox("Solo pacientes activas")
+    resultados = search_patients(texto_busqueda, solo_activas)
+    etiquetas = {fila['id']: etiqueta_paciente(fila) for _, fila in resultados.iterrows()}
     with st.form(key='new_medicion_form'):
         st.write("Agregar nueva medición")
-        new_id_paciente = st.selectbox("ID del Paciente", options=[p[0] for p in c.execute("SELECT id FROM pacientes").fetchall()])
+        new_id_paciente = st.selectbox("ID del Paciente", options=list(etiquetas), format_func=etiquetas.get)
         new_fecha = st.date_input("Fecha de la medición")
         new_dilatacion = st.number_input("Dilatación cervical (cm)", min_value=0, max_value=10)
         new_frecuencia_cardiaca = st.number_input("Frecuencia Cardíaca Fetal (latidos/min)", min_value=60, max_value=200)
         new_contracciones = st.number_input("Contracciones uterinas (en 10 min)", min_value=0, max_value=30)
         new_presion_arterial = st.text_input("Presión Arterial (mmHg)")
         submit_medicion_button = st.form_submit_button(label='Agregar Medición')
-        if submit_medicion_button:
+        if submit_medicion_button and new_id_paciente is not None:
             create_medicion(new_id_paciente, new_fecha, new_dilatacion, new_frecuencia_cardiaca, new_contracciones, new_presion_arterial)
 
-    st.write("Mediciones existentes:")
+    # Importación masiva de mediciones desde un archivo CSV o Parquet
+    with st.form(key='import_mediciones_form'):
+        st.write("Importar mediciones desde un archivo")
+        st.caption("Columnas requeridas: " + ", ".join(COLUMNAS_REQUERIDAS))
+        archivo_mediciones = st.file_uploader("Archivo CSV o Parquet", type=['csv', 'parquet'])
+        import_button = st.form_submit_button(label='Importar Mediciones')
+        if import_button and archivo_mediciones is not None:
+            try:
+                resumen = importar_mediciones(pool, archivo_mediciones)
+            except (ValueError, sqlite3.IntegrityError) as e:
+                st.error(f"No se pudo importar el archivo: {e}")
+            else:
+                rechazadas = resumen.pop('filas_rechazadas')
+                st.success(f"Se importaron {resumen['insertadas']} mediciones ({resumen['filas_por_segundo']} filas/s).")
+                st.json(resumen)
+                if not rechazadas.empty:
+                    st.warning(f"Se rechazaron {len(rechazadas)} filas.")
+                    st.dataframe(rechazadas, hide_index=True)
+
+    st.write(f"Últimas {MEDICIONES_VISIBLES} mediciones:")
     st.write(read_mediciones())
 
+    # Exportación de todas las mediciones, con los datos de cada paciente
+    with st.expander("Exportar mediciones"):
+        panel_exportacion(pool, read_patient_ids())
+
 elif option == 'patologias':
     # Funcionalidades para 'patologias'
     with st.form(key='new_patologia_form'):
@@ -110,16 +172,21 @@ elif option == 'patologias':
         new_nombre_patologia = st.text_input("Nombre de la Patología")
         submit_patologia_button = st.form_submit_button(label='Agregar Patología')
         if submit_patologia_button:
-            create_patologia(new_nombre_patologia)
+            try:
+                create_patologia(new_nombre_patologia)
+            except sqlite3.IntegrityError as e:
+                st.error(f"No se pudo agregar la patología: {e}")
 
     st.write("Patologías existentes:")
     st.write(read_patologias())
 
     delete_nombre_patologia = st.text_input("Nombre de la Patología a eliminar")
     if st.button('Eliminar Patología'):
-        delete_patologia(delete_nombre_patologia)
-
-# Cerrar la conexión a la base de datos
-def close_connection():
-    conn.close()
-    st.sidebar.button("Cerrar la conexión a la base de datos", on_click=close_connection)
\ No newline at end of file
+        try:
+            delete_patologia(delete_nombre_patologia)
+        except sqlite3.IntegrityError as e:
+            st.error(f"No se pudo eliminar la patología (¿está asignada a pacientes?): {e}")
+
+# Métricas del pool de conexiones
+with st.sidebar.expander("Conexiones a la base de datos"):
+    st.json(pool.metricas())
@@ -0,0 +1,102 @@
+import io
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.dates as mdates
+import pandas as pd
+from matplotlib.figure import Figure
+
+from submuestreo import reducir_serie
+
+# Métricas que se grafican por paciente: (columna, color, título).
+METRICAS = [
+    ('dilatacion', 'blue', 'Evolución de la Dilatación'),
+    ('frecuencia_cardiaca', 'red', 'Evolución de la Frecuencia Cardíaca Fetal'),
+    ('contracciones', 'green', 'Evolución de las Contracciones'),
+]
+
+# Estilos de gráfica disponibles: tamaño de la figura en pulgadas y resolución del PNG.
+ESTILOS = {
+    'estandar': {'figsize': (10, 15), 'dpi': 100},
+    'compacto': {'figsize': (8, 10), 'dpi': 80},
+}
+
+# Método de submuestreo por defecto para series densas (ver submuestreo.py).
+SUBMUESTREO = 'lttb'
+
+# Función para dibujar las gráficas de un paciente y devolverlas como bytes PNG (o SVG con
+# formato='svg').
+# Se usa Figure directamente (sin pyplot) para que la figura no quede registrada en el
+# gestor global de matplotlib y se libere al terminar, aunque el servidor lleve horas activo.
+# Cada serie se reduce al ancho en píxeles de su eje: más puntos no se verían y solo
+# encarecen el dibujo. Con submuestreo=None se grafican todos los puntos.
+def renderizar_grafica(mediciones_df, estilo='estandar', submuestreo=SUBMUESTREO, formato='png'):
+    config = ESTILOS[estilo]
+    fig = Figure(figsize=config['figsize'])
+    try:
+        axes = fig.subplots(len(METRICAS), 1)
+        for ax, (column, color, title) in zip(axes, METRICAS):
+            fechas, valores = mediciones_df['Fecha'], mediciones_df[column].astype('float64')
+            if submuestreo is not None:
+                ancho_px = int(ax.get_position().width * config['figsize'][0] * config['dpi'])
+                fechas, valores = reducir_serie(fechas, valores, ancho_px, submuestreo)
+            ax.plot(fechas, valores, color=color)
+            ax.set_title(title)
+            ax.set_xlabel('Fecha')
+            ax.set_ylabel(column)
+            ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M'))
+            ax.xaxis.set_tick_params(rotation=45)
+
+            # Añadir estilo a la gráfica
+            ax.grid(True)
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=formato, dpi=config['dpi'])
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+# Paneles de la cardiotocografía: (señal, color, título, límites del eje y).
+PANELES_CTG = [
+    ('fcf', 'red', 'Frecuencia cardíaca fetal (lpm)', (50, 210)),
+    ('toco', 'green', 'Actividad uterina', (0, 100)),
+]
+# Rango normal de la línea de base de la frecuencia cardíaca fetal, marcado en la gráfica.
+RANGO_NORMAL_FCF = (110, 160)
+
+# Función para dibujar la cardiotocografía de una paciente (trazas de trazas_ctg.py, None si no
+# hay señal) y devolverla como bytes PNG. Una traza de horas a 4 Hz tiene cientos de miles de
+# muestras: se reduce con min/máx al ancho del eje, que conserva picos y desaceleraciones.
+def renderizar_traza(traza_fcf, traza_toco, estilo='estandar', submuestreo='minmax', formato='png'):
+    config = ESTILOS[estilo]
+    ancho = config['figsize'][0]
+    fig = Figure(figsize=(ancho, ancho * 0.6))
+    try:
+        # Márgenes fijos: tight_layout mide todos los textos y cuesta más que dibujar la traza.
+        fig.subplots_adjust(left=0.07, right=0.98, top=0.94, bottom=0.08, hspace=0.25)
+        axes = fig.subplots(len(PANELES_CTG), 1, sharex=True, gridspec_kw={'height_ratios': [3, 2]})
+        for ax, traza, (senal, color, title, limites) in zip(axes, (traza_fcf, traza_toco), PANELES_CTG):
+            if traza is not None:
+                fechas, valores = pd.Series(traza.fechas()), pd.Series(traza.muestras, dtype='float64')
+                if submuestreo is not None:
+                    ancho_px = int(ax.get_position().width * ancho * config['dpi'])
+                    fechas, valores = reducir_serie(fechas, valores, ancho_px, submuestreo)
+                ax.plot(fechas, valores, color=color, linewidth=0.6)
+            if senal == 'fcf':
+                for limite in RANGO_NORMAL_FCF:
+                    ax.axhline(limite, color='gray', linestyle='--', linewidth=0.8)
+            ax.set_ylim(*limites)
+            ax.set_title(title)
+            ax.grid(True)
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+        axes[-1].xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=formato, dpi=config['dpi'])
+        return buffer.getvalue()
+    finally:
+        fig.clear()
@@ -0,0 +1,190 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from diagnostico import separar_presion_arterial
+from trazas_ctg import pacientes_con_senal
+from validacion import MENSAJE_SIN_CONTRACCIONES, RANGOS, validar_presiones_arteriales
+
+# Columnas que debe tener un archivo de mediciones para importarse.
+COLUMNAS_REQUERIDAS = ['id_paciente', 'fecha', 'dilatacion', 'frecuencia_cardiaca', 'contracciones', 'presion_arterial']
+# Filas por transacción: cada lote se confirma por separado para no retener la conexión de
+# escritura durante toda la importación (las estaciones pueden seguir registrando mediciones).
+TAMANO_LOTE = 5000
+# Columnas que se insertan: las del archivo y la presión arterial separada.
+COLUMNAS_INSERCION = COLUMNAS_REQUERIDAS + ['sistolica', 'diastolica']
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+SQL_INSERTAR_MEDICION = (
+    "INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial, "
+    "sistolica, diastolica) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Función para leer un archivo CSV o Parquet de mediciones. El formato se deduce de la extensión
+# si no se indica; origen puede ser una ruta o un archivo abierto (por ejemplo, de st.file_uploader).
+# Parquet requiere pyarrow, que es opcional.
+def leer_archivo(origen, formato=None):
+    if formato is None:
+        nombre = origen if isinstance(origen, str) else getattr(origen, 'name', '')
+        formato = 'parquet' if os.path.splitext(nombre)[1].lower() in ('.parquet', '.pq') else 'csv'
+    if formato == 'csv':
+        # Todo como texto: los ids de pacientes pueden tener ceros a la izquierda.
+        return pd.read_csv(origen, dtype=str, keep_default_na=False, na_values=[''])
+    if formato == 'parquet':
+        try:
+            return pd.read_parquet(origen)
+        except ImportError as e:
+            raise ValueError(f"Para importar archivos Parquet se necesita pyarrow: {e}")
+    raise ValueError(f"Formato de archivo desconocido: {formato}")
+
+# Las fechas con zona horaria (un equipo que envía, por ejemplo, +02:00) se pasan a la hora local
+# sin zona, que es como guardan las fechas las aplicaciones.
+def _a_hora_local(fecha):
+    if pd.isna(fecha) or fecha.tzinfo is None:
+        return fecha
+    return pd.Timestamp(fecha.to_pydatetime().astimezone().replace(tzinfo=None))
+
+def _interpretar_fecha(valor):
+    try:
+        return _a_hora_local(pd.to_datetime(valor, format='mixed'))
+    except (ValueError, TypeError, OverflowError):
+        return pd.NaT
+
+# Función para interpretar una columna de fechas de una vez. Si mezcla zonas horarias (o fechas
+# con y sin zona), pandas no puede interpretarla entera y se interpreta fecha por fecha, para que
+# solo se rechacen las filas con fechas que no se entienden.
+def _interpretar_fechas(valores):
+    try:
+        fechas = pd.to_datetime(valores, format='mixed', errors='coerce')
+    except ValueError:
+        return pd.to_datetime(valores.map(_interpretar_fecha))
+    if getattr(fechas.dt, 'tz', None) is not None:
+        fechas = pd.to_datetime(fechas.map(_a_hora_local))
+    return fechas
+
+# Función para validar y normalizar un DataFrame de mediciones de forma vectorizada.
+# ids_pacientes son los ids existentes en la base de datos. Como en la barra lateral, las
+# contracciones pueden venir vacías solo para las pacientes de ids_con_tocografia: el analizador
+# de cardiotocografías las completa desde la traza (ver contracciones_ctg.py). Devuelve
+# (validas, rechazadas): validas tiene las columnas de COLUMNAS_INSERCION listas para insertar
+# (contracciones None si vinieron vacías); rechazadas tiene las filas originales con su número
+# de fila en el archivo y el motivo del rechazo.
+def normalizar_mediciones(df, ids_pacientes, ids_con_tocografia=()):
+    df = df.rename(columns=lambda columna: str(columna).strip().lower())
+    faltantes = [columna for columna in COLUMNAS_REQUERIDAS if columna not in df.columns]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en el archivo: {', '.join(faltantes)}")
+    df = df.reset_index(drop=True)
+
+    motivos = pd.Series(pd.NA, index=df.index, dtype='object')
+    # Cada validación solo anota el motivo de las filas que aún no tienen uno.
+    def rechazar(mascara, motivo):
+        motivos[mascara & motivos.isna()] = motivo
+
+    id_paciente = df['id_paciente'].astype('string').str.strip()
+    rechazar(id_paciente.isna() | (id_paciente == ''), "Falta el ID del paciente")
+    rechazar(~id_paciente.isin(set(ids_pacientes)), "El paciente no existe")
+
+    fechas = _interpretar_fechas(df['fecha'])
+    rechazar(fechas.isna(), "Fecha inválida")
+
+    numericas = {}
+    sin_contracciones = df['contracciones'].isna() | (df['contracciones'].astype('string').str.strip() == '')
+    rechazar(sin_contracciones & ~id_paciente.isin(set(ids_con_tocografia)), MENSAJE_SIN_CONTRACCIONES)
+    for columna, (minimo, maximo) in RANGOS.items():
+        valores = pd.to_numeric(df[columna], errors='coerce')
+        invalidos = valores.isna() | (valores != valores.round())
+        if columna == 'contracciones':
+            invalidos &= ~sin_contracciones
+        rechazar(invalidos, f"{columna} no es un número entero")
+        rechazar((valores < minimo) | (valores > maximo), f"{columna} fuera de rango ({minimo}-{maximo})")
+        numericas[columna] = valores
+
+    presion_arterial = df['presion_arterial'].astype('string').str.replace(r'\s+', '', regex=True)
+    errores_presion = validar_presiones_arteriales(presion_arterial.astype('object'))
+    sistolica, diastolica = separar_presion_arterial(presion_arterial.astype('object'))
+    rechazar(errores_presion.notna(), errores_presion)
+
+    validas = motivos.isna()
+    normalizadas = pd.DataFrame({
+        'id_paciente': id_paciente[validas].astype(object),
+        'fecha': fechas[validas].dt.strftime(FORMATO_FECHA),
+        **{columna: numericas[columna][validas].astype('int64') for columna in RANGOS if columna != 'contracciones'},
+        # Enteros de Python o None, como los espera sqlite3.
+        'contracciones': pd.Series(
+            [None if valor != valor else int(valor) for valor in numericas['contracciones'][validas].tolist()],
+            index=id_paciente[validas].index, dtype=object,
+        ),
+        'presion_arterial': presion_arterial[validas].astype(object),
+        'sistolica': sistolica[validas].astype('int64'),
+        'diastolica': diastolica[validas].astype('int64'),
+    })[COLUMNAS_INSERCION]
+    rechazadas = df[~validas].copy()
+    # Número de fila en el archivo CSV (la fila 1 es el encabezado).
+    rechazadas.insert(0, 'fila', rechazadas.index + 2)
+    rechazadas['motivo'] = motivos[~validas]
+    return normalizadas, rechazadas.reset_index(drop=True)
+
+# Función para importar mediciones desde un archivo a la base de datos del pool.
+# Valida todas las filas antes de escribir e inserta las válidas con executemany, un lote por
+# transacción. Devuelve un resumen con conteos, tiempos, filas por segundo y las filas rechazadas.
+def importar_mediciones(pool, origen, formato=None, tamano_lote=TAMANO_LOTE):
+    inicio = time.perf_counter()
+    df = leer_archivo(origen, formato)
+    with pool.lectura() as conn:
+        ids_pacientes = [fila[0] for fila in conn.execute("SELECT id FROM pacientes")]
+        ids_con_tocografia = pacientes_con_senal(conn, 'toco')
+    validas, rechazadas = normalizar_mediciones(df, ids_pacientes, ids_con_tocografia)
+    fin_validacion = time.perf_counter()
+
+    filas = list(validas.itertuples(index=False, name=None))
+    for desde in range(0, len(filas), tamano_lote):
+        lote = filas[desde:desde + tamano_lote]
+        pool.escribir(lambda conn: conn.executemany(SQL_INSERTAR_MEDICION, lote))
+    fin = time.perf_counter()
+
+    return {
+        'filas_leidas': len(df),
+        'insertadas': len(filas),
+        'rechazadas': len(rechazadas),
+        'lotes': -(-len(filas) // tamano_lote),
+        'validacion_s': round(fin_validacion - inicio, 3),
+        'insercion_s': round(fin - fin_validacion, 3),
+        'filas_por_segundo': round(len(filas) / (fin - inicio)) if fin > inicio else 0,
+        'filas_rechazadas': rechazadas,
+    }
+
+# Uso: python importacion.py mediciones.csv [--bd partoseguro.db] [--rechazadas rechazadas.csv]
+def main():
+    from conexiones import obtener_pool
+
+    parser = argparse.ArgumentParser(description="Importa mediciones desde un archivo CSV o Parquet.")
+    parser.add_argument('archivo', help="Archivo CSV o Parquet con las columnas " + ', '.join(COLUMNAS_REQUERIDAS))
+    parser.add_argument('--bd', default='partoseguro.db', help="Base de datos de destino (por defecto: partoseguro.db)")
+    parser.add_argument('--formato', choices=['csv', 'parquet'], help="Formato del archivo (por defecto, según la extensión)")
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help=f"Filas por transacción (por defecto: {TAMANO_LOTE})")
+    parser.add_argument('--rechazadas', help="Archivo CSV donde guardar las filas rechazadas y su motivo")
+    args = parser.parse_args()
+
+    pool = obtener_pool(args.bd)
+    try:
+        resumen = importar_mediciones(pool, args.archivo, args.formato, args.lote)
+    except ValueError as e:
+        parser.exit(1, f"Error: {e}\n")
+    finally:
+        pool.cerrar()
+    rechazadas = resumen.pop('filas_rechazadas')
+    for clave, valor in resumen.items():
+        print(f"{clave}: {valor}")
+    if not rechazadas.empty:
+        if args.rechazadas:
+            rechazadas.to_csv(args.rechazadas, index=False)
+            print(f"Filas rechazadas guardadas en {args.rechazadas}")
+        else:
+            print(rechazadas.head(20).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from importacion import COLUMNAS_REQUERIDAS, FORMATO_FECHA, SQL_INSERTAR_MEDICION, normalizar_mediciones
+from trazas_ctg import pacientes_con_senal
+
+# Puertos por defecto del servicio (HTTP y TCP con una lectura JSON por línea).
+PUERTO_HTTP = 8765
+PUERTO_TCP = 8766
+# Un lote se escribe al juntar TAMANO_LOTE lecturas o cuando la primera lleva INTERVALO_LOTE_MS
+# esperando, lo que ocurra antes.
+TAMANO_LOTE = 500
+INTERVALO_LOTE_MS = 50
+# Lecturas que pueden esperar en memoria; por encima se responde que el servicio está saturado
+# y el equipo debe reintentar.
+MAX_PENDIENTES = 20000
+MAX_CUERPO_BYTES = 1024 * 1024
+# Muestras que se guardan para calcular los percentiles de latencia.
+MUESTRAS_LATENCIA = 10000
+
+MOTIVO_SATURADO = "Servicio saturado, reintente"
+ESTADOS_HTTP = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                413: 'Payload Too Large', 503: 'Service Unavailable'}
+
+def _percentiles(muestras):
+    if not muestras:
+        return {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    p50, p95, p99 = np.percentile(np.fromiter(muestras, dtype='float64'), [50, 95, 99])
+    return {'p50': round(p50, 2), 'p95': round(p95, 2), 'p99': round(p99, 2), 'max': round(max(muestras), 2)}
+
+# Servicio de ingesta de lecturas de monitores fetales y tensiómetros.
+# Las lecturas llegan por HTTP o TCP y esperan en memoria; una sola tarea las valida con las
+# reglas de la barra lateral y de la importación (normalizar_mediciones) y las escribe en lotes,
+# un INSERT con executemany y un commit por lote, en un hilo aparte para no detener el bucle de
+# eventos. Cada equipo recibe la respuesta de sus lecturas cuando su lote ya está confirmado.
+class ServicioIngesta:
+    def __init__(self, pool, tamano_lote=TAMANO_LOTE, intervalo_lote_ms=INTERVALO_LOTE_MS,
+                 max_pendientes=MAX_PENDIENTES):
+        self.pool = pool
+        self.tamano_lote = tamano_lote
+        self.intervalo_lote_s = intervalo_lote_ms / 1000
+        self.max_pendientes = max_pendientes
+        self._pendientes = []   # (lectura, futuro, recibida)
+        self._senal = None
+        self._tarea = None
+        self._cerrando = False
+        self.recibidas = 0
+        self.aceptadas = 0
+        self.rechazadas = 0
+        self.saturadas = 0
+        self.errores = 0
+        self.lotes = 0
+        self._lecturas_en_lotes = 0
+        self.ultimo_error = None
+        self._commit_ms = deque(maxlen=MUESTRAS_LATENCIA)
+        self._extremo_ms = deque(maxlen=MUESTRAS_LATENCIA)
+
+    # Arranca la tarea que escribe los lotes; se llama desde el bucle de eventos.
+    def iniciar(self):
+        self._senal = asyncio.Event()
+        self._tarea = asyncio.create_task(self._bucle_escritura())
+
+    # Escribe lo que quede pendiente, sin esperar el intervalo, y detiene la tarea de escritura.
+    async def cerrar(self):
+        if self._tarea is not None:
+            self._cerrando = True
+            self._senal.set()
+            await self._tarea
+
+    # Encola las lecturas y espera a que su lote se escriba. Devuelve, por lectura, None si se
+    # guardó o el motivo del rechazo.
+    async def registrar(self, lecturas):
+        self.recibidas += len(lecturas)
+        if len(self._pendientes) + len(lecturas) > self.max_pendientes:
+            self.saturadas += len(lecturas)
+            return [MOTIVO_SATURADO] * len(lecturas)
+        loop = asyncio.get_running_loop()
+        recibida = time.perf_counter()
+        fecha_recepcion = datetime.now().strftime(FORMATO_FECHA)
+        habia_pendientes = bool(self._pendientes)
+        futuros = []
+        for lectura in lecturas:
+            if not isinstance(lectura, dict):
+                futuros.append(None)
+                continue
+            if lectura.get('fecha') is None:
+                # Sin hora de la lectura se usa la de recepción.
+                lectura = {**lectura, 'fecha': fecha_recepcion}
+            futuro = loop.create_future()
+            self._pendientes.append((lectura, futuro, recibida))
+            futuros.append(futuro)
+        # Solo se despierta a la tarea de escritura cuando hay algo nuevo que decidir: la
+        # primera lectura de un lote o un lote completo.
+        if not habia_pendientes or len(self._pendientes) >= self.tamano_lote:
+            self._senal.set()
+        resultados = []
+        for futuro in futuros:
+            if futuro is None:
+                self.rechazadas += 1
+                resultados.append("La lectura debe ser un objeto JSON")
+            else:
+                resultados.append(await futuro)
+        return resultados
+
+    async def _bucle_escritura(self):
+        while True:
+            if not self._pendientes:
+                if self._cerrando:
+                    return
+                self._senal.clear()
+                await self._senal.wait()
+                continue
+            espera = self._pendientes[0][2] + self.intervalo_lote_s - time.perf_counter()
+            if len(self._pendientes) < self.tamano_lote and espera > 0 and not self._cerrando:
+                self._senal.clear()
+                try:
+                    await asyncio.wait_for(self._senal.wait(), espera)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            lote = self._pendientes[:self.tamano_lote]
+            del self._pendientes[:self.tamano_lote]
+            await self._escribir_lote(lote)
+
+    async def _escribir_lote(self, lote):
+        inicio = time.perf_counter()
+        try:
+            motivos = await asyncio.to_thread(self._validar_y_escribir, [lectura for lectura, _, _ in lote])
+        except Exception as e:
+            # Un error de la base de datos revierte el lote entero; los equipos deben reintentar.
+            self.errores += len(lote)
+            self.ultimo_error = repr(e)
+            motivos = {indice: f"No se pudo guardar la lectura: {e}" for indice in range(len(lote))}
+        else:
+            self.rechazadas += len(motivos)
+            self.aceptadas += len(lote) - len(motivos)
+        fin = time.perf_counter()
+        self.lotes += 1
+        self._lecturas_en_lotes += len(lote)
+        self._commit_ms.append((fin - inicio) * 1000)
+        for indice, (_, futuro, recibida) in enumerate(lote):
+            self._extremo_ms.append((fin - recibida) * 1000)
+            if not futuro.done():
+                futuro.set_result(motivos.get(indice))
+
+    # Valida el lote como la importación masiva y guarda las lecturas válidas en una sola
+    # transacción. Devuelve {posición en el lote: motivo} de las rechazadas.
+    # El id de cada lectura se pasa a texto antes de armar el DataFrame: si no, un id numérico se
+    # vuelve float (123 -> '123.0') en cuanto otra lectura del lote no trae id.
+    def _validar_y_escribir(self, lecturas):
+        lecturas = [
+            {**lectura, 'id_paciente': str(lectura['id_paciente'])} if lectura.get('id_paciente') is not None else lectura
+            for lectura in lecturas
+        ]
+        df = pd.DataFrame.from_records(lecturas).reindex(columns=COLUMNAS_REQUERIDAS)
+        ids_lote = df['id_paciente'].dropna().astype(str).str.strip().unique().tolist()
+        with self.pool.lectura() as conn:
+            ids_pacientes = [fila[0] for fila in conn.execute(
+                "SELECT id FROM pacientes WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(ids_lote),)
+            )]
+            ids_con_tocografia = pacientes_con_senal(conn, 'toco', ids_lote)
+        validas, rechazadas = normalizar_mediciones(df, ids_pacientes, ids_con_tocografia)
+        if not validas.empty:
+            filas = list(validas.itertuples(index=False, name=None))
+            self.pool.escribir(lambda conn: conn.executemany(SQL_INSERTAR_MEDICION, filas))
+        return {int(fila) - 2: motivo for fila, motivo in zip(rechazadas['fila'], rechazadas['motivo'])}
+
+    def estadisticas(self):
+        return {
+            'recibidas': self.recibidas,
+            'aceptadas': self.aceptadas,
+            'rechazadas': self.rechazadas,
+            'saturadas': self.saturadas,
+            'errores': self.errores,
+            'ultimo_error': self.ultimo_error,
+            'en_cola': len(self._pendientes),
+            'lotes': self.lotes,
+            'lecturas_por_lote': round(self._lecturas_en_lotes / self.lotes, 1) if self.lotes else 0.0,
+            'commit_ms': _percentiles(self._commit_ms),
+            'extremo_a_extremo_ms': _percentiles(self._extremo_ms),
+        }
+
+# Respuesta a un envío de lecturas: cuántas se guardaron y el motivo de cada rechazo.
+def _resumen(motivos):
+    rechazadas = [{'indice': indice, 'motivo': motivo} for indice, motivo in enumerate(motivos) if motivo is not None]
+    return {'aceptadas': len(motivos) - len(rechazadas), 'rechazadas': rechazadas}
+
+# Interpreta un cuerpo JSON con una lectura (objeto) o varias (lista).
+def _leer_lecturas(datos):
+    lecturas = json.loads(datos)
+    if isinstance(lecturas, dict):
+        return [lecturas]
+    if isinstance(lecturas, list):
+        return lecturas
+    raise ValueError("Se espera un objeto JSON o una lista de objetos")
+
+# HTTP/1.1 mínimo, con conexiones persistentes:
+#   POST /mediciones  cuerpo: una lectura o una lista de lecturas
+#   GET  /estado      estadísticas del servicio
+async def _atender_http(servicio, lector, escritor):
+    try:
+        while True:
+            linea = await lector.readline()
+            if not linea:
+                break
+            try:
+                metodo, ruta, version = linea.decode('latin-1').split()
+            except ValueError:
+                await _responder_http(escritor, 400, {'error': "Solicitud mal formada"}, cerrar=True)
+                break
+            encabezados = {}
+            while True:
+                encabezado = await lector.readline()
+                if encabezado in (b'\r\n', b'\n', b''):
+                    break
+                nombre, _, valor = encabezado.decode('latin-1').partition(':')
+                encabezados[nombre.strip().lower()] = valor.strip()
+            try:
+                largo = int(encabezados.get('content-length', 0) or 0)
+            except ValueError:
+                largo = -1
+            if largo < 0:
+                await _responder_http(escritor, 400, {'error': "Content-Length inválido"}, cerrar=True)
+                break
+            cerrar = encabezados.get('connection', '').lower() == 'close' or version == 'HTTP/1.0'
+            if largo > MAX_CUERPO_BYTES:
+                await _responder_http(escritor, 413, {'error': "Cuerpo demasiado grande"}, cerrar=True)
+                break
+            cuerpo = await lector.readexactly(largo) if largo else b''
+
+            if ruta == '/estado' and metodo == 'GET':
+                estado, respuesta = 200, servicio.estadisticas()
+            elif ruta == '/mediciones' and metodo == 'POST':
+                try:
+                    lecturas = _leer_lecturas(cuerpo)
+                except ValueError as e:
+                    estado, respuesta = 400, {'error': f"JSON inválido: {e}"}
+                else:
+                    motivos = await servicio.registrar(lecturas)
+                    estado = 503 if MOTIVO_SATURADO in motivos else 200
+                    respuesta = _resumen(motivos)
+            elif ruta in ('/estado', '/mediciones'):
+                estado, respuesta = 405, {'error': f"Método no permitido: {metodo}"}
+            else:
+                estado, respuesta = 404, {'error': f"Ruta desconocida: {ruta}"}
+            await _responder_http(escritor, estado, respuesta, cerrar)
+            if cerrar:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        escritor.close()
+
+async def _responder_http(escritor, estado, respuesta, cerrar=False):
+    cuerpo = json.dumps(respuesta, ensure_ascii=False).encode()
+    escritor.write(
+        f"HTTP/1.1 {estado} {ESTADOS_HTTP[estado]}\r\nContent-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(cuerpo)}\r\nConnection: {'close' if cerrar else 'keep-alive'}\r\n\r\n".encode() + cuerpo
+    )
+    await escritor.drain()
+
+# TCP: cada línea es una lectura o una lista de lecturas en JSON y recibe una línea de respuesta.
+async def _atender_tcp(servicio, lector, escritor):
+    try:
+        while True:
+            linea = await lector.readline()
+            if not linea:
+                break
+            if not linea.strip():
+                continue
+            try:
+                lecturas = _leer_lecturas(linea)
+            except ValueError as e:
+                respuesta = {'error': f"JSON inválido: {e}"}
+            else:
+                respuesta = _resumen(await servicio.registrar(lecturas))
+            escritor.write(json.dumps(respuesta, ensure_ascii=False).encode() + b'\n')
+            await escritor.drain()
+    except ConnectionError:
+        pass
+    finally:
+        escritor.close()
+
+# Arranca el servicio y los servidores HTTP y TCP (un puerto None no se abre; 0 elige uno libre).
+# Devuelve (servicio, servidores); los puertos reales están en servidor.sockets.
+async def iniciar_servicio(pool, host='127.0.0.1', puerto_http=PUERTO_HTTP, puerto_tcp=PUERTO_TCP,
+                           tamano_lote=TAMANO_LOTE, intervalo_lote_ms=INTERVALO_LOTE_MS,
+                           max_pendientes=MAX_PENDIENTES):
+    servicio = ServicioIngesta(pool, tamano_lote, intervalo_lote_ms, max_pendientes)
+    servicio.iniciar()
+    servidores = []
+    if puerto_http is not None:
+        servidores.append(await asyncio.start_server(
+            lambda lector, escritor: _atender_http(servicio, lector, escritor), host, puerto_http))
+    if puerto_tcp is not None:
+        servidores.append(await asyncio.start_server(
+            lambda lector, escritor: _atender_tcp(servicio, lector, escritor), host, puerto_tcp))
+    return servicio, servidores
+
+# Cierra los servidores y escribe las lecturas que quedaban en cola.
+async def detener_servicio(servicio, servidores):
+    for servidor in servidores:
+        servidor.close()
+        await servidor.wait_closed()
+    await servicio.cerrar()
+
+# Uso: python ingesta.py [--bd partoseguro.db] [--http 8765] [--tcp 8766] [--lote 500] [--intervalo-ms 50]
+def main():
+    from conexiones import obtener_pool
+
+    parser = argparse.ArgumentParser(description="Servicio de ingesta de lecturas de monitores fetales y tensiómetros.")
+    parser.add_argument('--bd', default='partoseguro.db', help="Base de datos de destino (por defecto: partoseguro.db)")
+    parser.add_argument('--host', default='127.0.0.1', help="Dirección donde escuchar (por defecto: 127.0.0.1)")
+    parser.add_argument('--http', type=int, default=PUERTO_HTTP, help=f"Puerto HTTP; -1 para no abrirlo (por defecto: {PUERTO_HTTP})")
+    parser.add_argument('--tcp', type=int, default=PUERTO_TCP, help=f"Puerto TCP; -1 para no abrirlo (por defecto: {PUERTO_TCP})")
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help=f"Lecturas por transacción como máximo (por defecto: {TAMANO_LOTE})")
+    parser.add_argument('--intervalo-ms', type=float, default=INTERVALO_LOTE_MS,
+                        help=f"Espera máxima de una lectura antes de escribir su lote (por defecto: {INTERVALO_LOTE_MS})")
+    args = parser.parse_args()
+
+    async def servir():
+        servicio, servidores = await iniciar_servicio(
+            pool, args.host, args.http if args.http >= 0 else None, args.tcp if args.tcp >= 0 else None,
+            args.lote, args.intervalo_ms)
+        for servidor in servidores:
+            for socket in servidor.sockets:
+                print(f"Escuchando en {socket.getsockname()}")
+        try:
+            await asyncio.gather(*(servidor.serve_forever() for servidor in servidores))
+        finally:
+            await detener_servicio(servicio, servidores)
+            print(json.dumps(servicio.estadisticas(), ensure_ascii=False))
+
+    pool = obtener_pool(args.bd)
+    try:
+        asyncio.run(servir())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.cerrar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+import os
+from datetime import datetime, time, timedelta
+from functools import partial
+
+import pandas as pd
+import streamlit as st
+
+import perfilado
+from almacen_mediciones import version_datos
+from analisis_ctg import VENTANA_DIAGNOSTICO_MIN, unir_resumen_ctg
+from archivo_historico import HORAS_RETENCION, RUTA_ARCHIVO, finalizar_episodio, historia_paciente, lectura_historica, reabrir_episodio
+from busqueda import buscar_pacientes
+from diagnostico import evaluar_mediciones, linea_de_tiempo
+from exportacion import FORMATOS, exportar_para_descarga
+from graficas import renderizar_traza
+from proximas_mediciones import calcular_cuentas_regresivas
+from trazas_ctg import SENALES, leer_traza_mapeada
+from ventanas import leer_ventana, resumen_por_hora
+
+# Cada cuántos segundos se actualiza el panel de próximas mediciones.
+INTERVALO_REFRESCO_S = 30
+# Cada cuántos segundos se revisa si terminaron las gráficas que espera la página.
+INTERVALO_GRAFICAS_S = 2
+
+# Listas de opciones de los formularios. Se guardan en caché por versión de los datos, así que
+# los formularios no consultan la base de datos mientras no haya pacientes nuevos.
+@st.cache_data(max_entries=4)
+def listar_patologias(_pool, version):
+    with _pool.lectura() as conn:
+        return [p[0] for p in conn.execute("SELECT nombre FROM patologias")]
+
+@st.cache_data(max_entries=4)
+def listar_pacientes(_pool, version):
+    with _pool.lectura() as conn:
+        return [id[0] for id in conn.execute("SELECT id FROM pacientes")]
+
+# Resultados de la búsqueda de pacientes de la barra lateral, en caché por texto, filtro y
+# versión de los datos (máximo LIMITE_RESULTADOS filas, ver busqueda.py).
+@st.cache_data(max_entries=64, ttl=300)
+def buscar_pacientes_en_cache(_pool, texto, solo_activos, version):
+    with _pool.lectura() as conn:
+        return buscar_pacientes(conn, texto, solo_activos=solo_activos)
+
+# Panel de alertas y cuenta regresiva. Es un fragmento que se vuelve a ejecutar solo cada
+# INTERVALO_REFRESCO_S segundos, sin recorrer el resto de la página. Si detecta que los datos
+# cambiaron (por ejemplo, otra estación registró una medición), pide un rerun completo para
+# que los paneles de pacientes y el triage se actualicen.
+# Los vencimientos salen del estado ya calculado por el planificador; solo se consulta la
+# marca de versión de los datos.
+@st.fragment(run_every=INTERVALO_REFRESCO_S)
+def panel_proximas_mediciones(pool, planificador):
+    st.title("Próximas Mediciones")
+    solo_activos = st.checkbox("Solo pacientes activas (últimas 24 h)", key="solo_activos")
+
+    # Intervalo entre mediciones por paciente (por ejemplo, 15 minutos en fase activa)
+    with st.expander("Intervalo de medición por paciente"):
+        with st.form("form_intervalo_medicion"):
+            id_paciente = st.selectbox("Paciente", list(planificador.estado()['id']))
+            minutos = st.number_input("Intervalo (minutos)", min_value=5, max_value=240, step=5, value=planificador.intervalo_minutos)
+            if st.form_submit_button("Guardar intervalo") and id_paciente is not None:
+                planificador.configurar_intervalo(id_paciente, None if minutos == planificador.intervalo_minutos else minutos)
+
+    with pool.lectura() as conn:
+        version = version_datos(conn)
+    estado = planificador.estado()
+    if solo_activos:
+        limite = datetime.now() - timedelta(hours=planificador.horas_actividad)
+        fechas = pd.to_datetime(estado['ultima_fecha'], format='ISO8601', errors='coerce')
+        estado = estado[fechas >= limite]
+    proximas_mediciones = calcular_cuentas_regresivas(estado, intervalo_minutos=estado['intervalo_minutos'])
+
+    version_anterior = st.session_state.get('version_datos')
+    st.session_state['version_datos'] = version
+    if version_anterior is not None and version_anterior != version:
+        st.rerun()
+
+    for paciente in proximas_mediciones.itertuples(index=False):
+        if paciente.estado == 'sin_mediciones':
+            st.warning(f"No hay mediciones registradas para {paciente.nombre} (ID: {paciente.id}).")
+        elif paciente.estado == 'fecha_invalida':
+            st.error("No se pudo interpretar la última fecha de medición.")
+        elif paciente.estado == 'vencida':
+            st.error(f"¡Hora de realizar nueva medición para {paciente.nombre} (ID: {paciente.id})!")
+        else:
+            st.info(f"Próxima medición para {paciente.nombre} (ID: {paciente.id}) en: {paciente.cuenta_regresiva}")
+
+# Resumen por hora de las mediciones anteriores a la ventana. Se guarda en caché por paciente,
+# inicio de la ventana y versión de los datos, así que solo se recalcula si algo cambia.
+@st.cache_data(max_entries=256)
+def obtener_resumen_por_hora(_pool, id_paciente, hasta, version):
+    with _pool.lectura() as conn:
+        return resumen_por_hora(conn, id_paciente, hasta)
+
+# Panel de un paciente: tabla, gráficas, diagnóstico y línea de tiempo de la ventana
+# (desde, hasta) elegida; con hasta=None la ventana llega hasta ahora y se sirve del almacén.
+# Es un fragmento para que las interacciones dentro del panel no vuelvan a ejecutar la página.
+# En un rerun completo, un paciente sin mediciones nuevas solo lee la marca de revisión: la
+# historia sale del almacén incremental y la gráfica del servicio de gráficas, que la renderiza
+# en otro proceso; mientras tanto se muestra la anterior.
+@st.fragment
+def panel_paciente(pool, paciente, almacen_mediciones, servicio_graficas, estilo_grafica, ventana=(None, None)):
+    # Contenedor personalizado para cada paciente
+    st.markdown(f"<div class='paciente-container'>", unsafe_allow_html=True)
+
+    # Subtítulo con estilo personalizado
+    st.markdown(f"<h2 class='paciente-header'>Paciente: {paciente[1]} (ID: {paciente[0]}) - Edad: {paciente[2]} - FUM: {paciente[3]} - Patología: {paciente[4]}</h2>", unsafe_allow_html=True)
+
+    # Obtener las mediciones del paciente en la ventana, leyendo de la base de datos solo las nuevas
+    desde, hasta = ventana
+    with perfilado.etapa('consulta_paciente'), pool.lectura() as conn:
+        if hasta is None:
+            mediciones_df = almacen_mediciones.obtener(conn, paciente[0], desde=desde)
+        else:
+            mediciones_df = leer_ventana(conn, paciente[0], desde, hasta)
+        # Resumen de la cardiotocografía al momento de cada medición, para el diagnóstico.
+        mediciones_ctg = unir_resumen_ctg(conn, paciente[0], mediciones_df)
+
+    # Verificar si hay mediciones disponibles para el paciente
+    if not mediciones_df.empty:
+        # Mostrar la tabla de mediciones
+        with perfilado.etapa('tabla'):
+            st.dataframe(mediciones_df)
+
+        # Graficar cada métrica: la imagen se renderiza fuera de la página y se reutiliza mientras
+        # no haya mediciones nuevas
+        clave_grafica = (paciente[0], int(mediciones_df['id'].iloc[-1]), estilo_grafica, desde, hasta)
+        with perfilado.etapa('grafica'):
+            ruta_grafica = servicio_graficas.obtener(clave_grafica, mediciones_df, estilo_grafica)
+        with perfilado.etapa('imagen'):
+            if ruta_grafica is None:
+                st.session_state.setdefault('graficas_esperadas', set()).add(clave_grafica)
+                st.caption("Gráfica en preparación...")
+                ruta_grafica = servicio_graficas.ultima(paciente[0])
+            if ruta_grafica is not None:
+                try:
+                    st.image(ruta_grafica)
+                except FileNotFoundError:
+                    pass  # desalojada de la caché entretanto; llegará con la nueva
+
+        # Diagnóstico y Recomendación: se evalúan todas las reglas sobre toda la ventana
+        with perfilado.etapa('diagnostico'):
+            diagnostico_df = evaluar_mediciones(mediciones_ctg)
+        ultimo_diagnostico = diagnostico_df.iloc[-1]
+        ultimo_ctg = mediciones_ctg.iloc[-1]
+        if 'linea_base_fcf' in mediciones_ctg and pd.notna(ultimo_ctg['linea_base_fcf']):
+            st.caption(
+                f"Cardiotocografía (últimos {VENTANA_DIAGNOSTICO_MIN} min): línea de base {ultimo_ctg['linea_base_fcf']:.0f} lpm, "
+                f"VCP {ultimo_ctg['vcp_ms']:.1f} ms, {ultimo_ctg['aceleraciones_ctg']:.0f} aceleraciones, "
+                f"{ultimo_ctg['desaceleraciones_ctg']:.0f} desaceleraciones"
+            )
+
+        # Mostrar diagnóstico y recomendación con estilo personalizado
+        st.markdown(f"<div class='diagnostico-recomendacion'><strong>Diagnóstico:</strong> {ultimo_diagnostico['estados']}</div>", unsafe_allow_html=True)
+        st.markdown(f"<div class='diagnostico-recomendacion'><strong>Recomendación:</strong> {ultimo_diagnostico['recomendacion']}</div>", unsafe_allow_html=True)
+
+        # Línea de tiempo con los cambios de estado del paciente
+        with st.expander("Línea de tiempo de estados"), perfilado.etapa('linea_de_tiempo'):
+            st.dataframe(linea_de_tiempo(mediciones_df, diagnostico_df))
+
+    else:
+        st.write("No hay mediciones disponibles para este paciente en la ventana seleccionada.")
+
+    # Historia anterior a la ventana, resumida por hora; solo se consulta si se pide.
+    if desde is not None and st.toggle("Resumen por hora antes de la ventana", key=f"resumen_{paciente[0]}"):
+        version = st.session_state.get('version_datos')
+        st.dataframe(obtener_resumen_por_hora(pool, paciente[0], desde, version), hide_index=True)
+
+    # Cardiotocografía de la ventana: la traza se lee de su copia mapeada en memoria y se dibuja
+    # solo si se pide.
+    if st.toggle("Cardiotocografía", key=f"ctg_{paciente[0]}"):
+        with perfilado.etapa('ctg'):
+            with pool.lectura() as conn:
+                trazas = {senal: leer_traza_mapeada(conn, paciente[0], senal, desde, hasta) for senal in SENALES}
+            imagen = renderizar_traza(trazas['fcf'], trazas['toco'], estilo_grafica) if any(trazas.values()) else None
+        if imagen is None:
+            st.write("No hay cardiotocografía registrada para este paciente en la ventana seleccionada.")
+        else:
+            st.image(imagen)
+
+    # Registro del parto: el episodio se cierra, la paciente sale del tablero y del planificador
+    # y se archiva pasadas HORAS_RETENCION horas (ver archivo_historico.py).
+    if st.button("Registrar parto y cerrar episodio", key=f"finalizar_{paciente[0]}",
+                 help=f"La historia se podrá consultar en 'Historia clínica'; se archiva a las {HORAS_RETENCION} h."):
+        finalizar_episodio(pool, paciente[0])
+        st.rerun()
+
+    # Cierra el contenedor personalizado
+    st.markdown("</div>", unsafe_allow_html=True)
+
+# Panel del servicio de gráficas: muestra la cola y, cuando termina alguna gráfica que la
+# página está esperando, vuelve a ejecutar la página para mostrarla.
+@st.fragment(run_every=INTERVALO_GRAFICAS_S)
+def panel_servicio_graficas(servicio_graficas):
+    estadisticas = servicio_graficas.estadisticas()
+    st.caption(f"Gráficas en cola: {estadisticas['en_cola']} ({estadisticas['trabajadores']} procesos), "
+               f"aciertos de caché: {estadisticas['tasa_aciertos']:.0%}")
+    esperadas = st.session_state.get('graficas_esperadas')
+    if esperadas and servicio_graficas.alguna_lista(esperadas):
+        st.session_state['graficas_esperadas'] = set()
+        st.rerun()
+
+# Función que lee una exportación del tablero; st.download_button la llama al pulsar el botón.
+def _leer_exportacion(ruta):
+    with open(ruta, 'rb') as archivo:
+        return archivo.read()
+
+# Panel para exportar mediciones a CSV o Parquet con filtros de fechas y pacientes.
+# El archivo se escribe por lotes en la carpeta de exportaciones y se entrega con
+# st.download_button de forma diferida: solo se lee del disco cuando se pulsa el botón, y nunca
+# queda publicado en una URL sin autenticación.
+@st.fragment
+def panel_exportacion(pool, id_pacientes):
+    with st.form("form_exportar_mediciones"):
+        formato = st.radio("Formato", FORMATOS, horizontal=True, format_func=str.upper)
+        filtrar_fechas = st.checkbox("Filtrar por fechas")
+        fecha_desde = st.date_input("Desde", key="exportar_desde")
+        fecha_hasta = st.date_input("Hasta", key="exportar_hasta")
+        pacientes = st.multiselect("Pacientes (todos si se deja vacío)", id_pacientes)
+        exportar = st.form_submit_button("Exportar")
+    if not exportar:
+        return
+
+    filtros = {'id_pacientes': pacientes or None}
+    if filtrar_fechas:
+        filtros['desde'] = datetime.combine(fecha_desde, time.min)
+        filtros['hasta'] = datetime.combine(fecha_hasta, time.max.replace(microsecond=0))
+    try:
+        ruta, resumen = exportar_para_descarga(pool, formato, **filtros)
+    except ValueError as e:
+        st.error(f"No se pudo exportar: {e}")
+        return
+    st.success(f"Se exportaron {resumen['filas']} mediciones ({resumen['bytes'] / 1e6:.1f} MB).")
+    nombre = os.path.basename(ruta)
+    st.download_button(f"Descargar {nombre}", partial(_leer_exportacion, ruta), file_name=nombre, on_click='ignore')
+
+# Panel para consultar la historia completa de una paciente por ID, esté en la base viva o en
+# la de archivo. Solo abre la conexión histórica (con el archivo adjunto) después de una consulta.
+# Un episodio finalizado por error que aún no se archivó se puede reabrir: la paciente vuelve al
+# tablero y al planificador.
+@st.fragment
+def panel_historia_clinica(pool, ruta_archivo=RUTA_ARCHIVO):
+    with st.form("form_historia_clinica"):
+        id_paciente = st.text_input("ID de la paciente", key="historia_id_paciente")
+        if st.form_submit_button("Consultar"):
+            st.session_state['historia_consultada'] = id_paciente.strip()
+    # La paciente consultada se guarda en la sesión para seguir mostrándola al pulsar "Reabrir".
+    id_paciente = st.session_state.get('historia_consultada')
+    if not id_paciente:
+        return
+    with lectura_historica(pool.ruta, ruta_archivo) as conn:
+        paciente, mediciones = historia_paciente(conn, id_paciente)
+    if paciente.empty:
+        st.warning(f"No se encontró la paciente {id_paciente}.")
+        return
+    st.dataframe(paciente, hide_index=True)
+    if paciente['origen'].iloc[0] == 'viva' and paciente['estado_episodio'].iloc[0] == 'finalizado':
+        if st.button("Reabrir episodio", key="reabrir_episodio",
+                     help=f"Para un parto registrado por error; después de {HORAS_RETENCION} h el episodio se archiva."):
+            reabrir_episodio(pool, id_paciente)
+            st.rerun()
+    st.caption(f"{len(mediciones)} mediciones")
+    st.dataframe(mediciones, hide_index=True)
+
+# Panel de perfilado: tiempo y sentencias SQL por etapa de la última ejecución completa de la
+# página y resumen de las últimas ejecuciones de la sesión. Los tiempos son inclusivos: 'fechas'
+# también cuenta dentro de 'consulta_paciente'.
+def panel_perfilado(perfil, historia):
+    st.caption(f"Última ejecución: {perfil.total_ms:.0f} ms, {perfil.sql} sentencias SQL")
+    etapas = pd.DataFrame.from_dict(perfil.etapas, orient='index').sort_values('ms', ascending=False)
+    etapas['%'] = (100 * etapas['ms'] / perfil.total_ms).round(1)
+    etapas['ms'] = etapas['ms'].round(1)
+    st.dataframe(etapas[['ms', '%', 'llamadas', 'sql']])
+    totales = pd.Series([ejecucion['total_ms'] for ejecucion in historia])
+    sentencias = pd.Series([ejecucion['sql'] for ejecucion in historia])
+    st.caption(
+        f"Últimas {len(historia)} ejecuciones: mediana {totales.median():.0f} ms, "
+        f"p95 {totales.quantile(0.95):.0f} ms, {sentencias.mean():.0f} sentencias SQL en promedio"
+    )
@@ -1,11 +1,19 @@
 import streamlit as st
 from PIL import Image
-import pandas as pd
 import sqlite3
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from datetime import datetime, timedelta
-from streamlit_autorefresh import st_autorefresh
+from datetime import datetime
+import perfilado
+from conexiones import obtener_pool
+from servicio_graficas import ServicioGraficas
+from almacen_mediciones import AlmacenMediciones, version_datos
+from diagnostico import tamizaje_presion_arterial, triage_sala
+from analisis_ctg import AnalizadorCTG
+from planificador import PlanificadorMediciones
+from trazas_ctg import senales_paciente
+from validacion import MENSAJE_SIN_CONTRACCIONES, separar_presion, validar_presion_arterial
+from ventanas import FORMATO_FECHA, VENTANAS_HORAS, VENTANA_POR_DEFECTO, inicio_ventana
+from busqueda import etiqueta_paciente
+from paneles import listar_patologias, listar_pacientes, buscar_pacientes_en_cache, panel_proximas_mediciones, panel_paciente, panel_servicio_graficas, panel_exportacion, panel_historia_clinica, panel_perfilado
 
 # Configuración inicial de la página de Streamlit.
 st.set_page_config(
@@ -19,12 +27,40 @@ st.set_page_config(
     }
 )
 
-# Esto recargará la página cada 30 segundos, lo que actualizará la cuenta regresiva
-st_autorefresh(interval=30 * 1000, key="autorefresh")
+# Perfilado opcional de cada ejecución (PARTOSEGURO_PERFIL=1 o ?perfil=1 en la URL): tiempos y
+# sentencias SQL por etapa, en un panel de la barra lateral y en el registro perfil_reruns.jsonl.
+perfilando = perfilado.activo(st.query_params)
+if perfilando:
+    perfilado.iniciar()
 
-# Carga y muestra el logo de la aplicación.
-logo = Image.open('img/logo.png')
-st.image(logo, width=250)
+# Estilo de las gráficas por paciente.
+ESTILO_GRAFICA = 'estandar'
+
+# Servicio de gráficas compartido por todas las sesiones del proceso: un pool de procesos
+# renderiza las gráficas en disco (cache/graficas) y la página solo muestra las terminadas.
+# El número de procesos se configura con PARTOSEGURO_TRABAJADORES_GRAFICAS.
+@st.cache_resource
+def obtener_servicio_graficas():
+    return ServicioGraficas()
+
+servicio_graficas = obtener_servicio_graficas()
+
+# Almacén incremental de mediciones compartido por todas las sesiones del proceso.
+# Cuando una medición se edita o elimina, descarta también las gráficas del paciente.
+@st.cache_resource
+def obtener_almacen_mediciones():
+    return AlmacenMediciones(al_invalidar=servicio_graficas.invalidar_paciente)
+
+almacen_mediciones = obtener_almacen_mediciones()
+
+# Carga el logo de la aplicación una sola vez por proceso y lo muestra.
+@st.cache_resource
+def cargar_logo():
+    logo = Image.open('img/logo.png')
+    logo.load()
+    return logo
+
+st.image(cargar_logo(), width=250)
 
 # Título principal y descripción de la aplicación.
 st.title('PartoSeguro Monitor')
@@ -33,185 +69,150 @@ Esta aplicación permite el seguimiento continuo y detallado del trabajo de part
 registrando y visualizando datos clave como la dilatación cervical, frecuencia cardíaca fetal y contracciones.
 """)
 
-# Conexión con la base de datos SQLite.
-conn = sqlite3.connect('partoseguro.db')
-c = conn.cursor()
-
-# Creación de las tablas en la base de datos si no existen.
-# Tabla de pacientes.
-c.execute('''
-CREATE TABLE IF NOT EXISTS pacientes (
-    id TEXT PRIMARY KEY,
-    nombre TEXT,
-    edad INTEGER,
-    fum DATE,
-    patologia TEXT,
-    FOREIGN KEY(patologia) REFERENCES patologias(nombre)
-)
-''')
-
-# Tabla de mediciones.
-c.execute('''
-CREATE TABLE IF NOT EXISTS mediciones (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    id_paciente TEXT,
-    fecha TIMESTAMP,
-    dilatacion INTEGER,
-    frecuencia_cardiaca INTEGER,
-    contracciones INTEGER,
-    presion_arterial TEXT,
-    FOREIGN KEY(id_paciente) REFERENCES pacientes(id)
-)
-''')
+# Pool de conexiones con la base de datos SQLite, compartido por todas las sesiones.
+# Las tablas, índices y patologías comunes se crean con las migraciones de esquema.py,
+# que se aplican una sola vez por proceso y no en cada rerun.
+with perfilado.etapa('esquema'):
+    pool = obtener_pool('partoseguro.db')
+if perfilando:
+    perfilado.trazar_pool(pool)
 
-# Tabla de patologías.
-c.execute('''
-CREATE TABLE IF NOT EXISTS patologias (
-    nombre TEXT PRIMARY KEY
-)
-''')
+# Planificador de mediciones en segundo plano, uno por proceso: calcula los vencimientos y
+# registra las alertas aunque nadie tenga la página abierta.
+@st.cache_resource
+def obtener_planificador():
+    return PlanificadorMediciones(pool).iniciar()
+
+planificador = obtener_planificador()
+
+# Análisis de las cardiotocografías en segundo plano, uno por proceso: resume cada minuto nuevo
+# de las trazas para el diagnóstico (ver analisis_ctg.py).
+@st.cache_resource
+def obtener_analizador_ctg():
+    return AnalizadorCTG(pool).iniciar()
+
+analizador_ctg = obtener_analizador_ctg()
 
-# Inserción de patologías comunes en la base de datos.
-patologias_comunes = ["Hipertensión", "Diabetes Gestacional", "Anemia", "Tiroides", "Preeclampsia", "Sin patologías"]
-c.execute("SELECT * FROM patologias")
-if len(c.fetchall()) == 0:
-    for patologia in patologias_comunes:
-        c.execute("INSERT INTO patologias (nombre) VALUES (?)", (patologia,))
-    conn.commit()
+# Marca de versión de los datos, leída al inicio de cada ejecución completa y después de cada
+# escritura. Las listas de los formularios se guardan en caché con esta marca, así que solo se
+# vuelven a consultar cuando cambian los datos. El panel de próximas mediciones la compara con
+# la actual para saber si hace falta volver a ejecutar la página.
+def leer_version_datos():
+    with perfilado.etapa('barra_lateral'), pool.lectura() as conn:
+        version = version_datos(conn)
+    st.session_state['version_datos'] = version
+    return version
+
+version = leer_version_datos()
 
 # Función para agregar pacientes a la base de datos.
 def agregar_paciente(id, nombre, edad, fum, patologia):
-    c.execute("INSERT INTO pacientes (id, nombre, edad, fum, patologia) VALUES (?, ?, ?, ?, ?)", (id, nombre, edad, fum, patologia))
-    conn.commit()
+    pool.escribir("INSERT INTO pacientes (id, nombre, edad, fum, patologia) VALUES (?, ?, ?, ?, ?)", (id, nombre, edad, fum, patologia))
 
 # Función para agregar mediciones a la base de datos.
+# La presión arterial se guarda también separada en sistólica y diastólica.
 def agregar_medicion(id_paciente, fecha_hora, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial):
-    c.execute("INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial) VALUES (?, ?, ?, ?, ?, ?)", (id_paciente, fecha_hora, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial))
-    conn.commit()
-
-# Función para generar diagnósticos y recomendaciones basados en las mediciones.
-def generar_diagnostico(dilatacion, frecuencia_cardiaca, contracciones, presion_arterial):
-    estado = 'Normal'
-    recomendacion = "Continuar con el monitoreo rutinario y mantener las prácticas estándar de cuidado prenatal."
-    
-    # Evaluar la dilatación cervical
-    if dilatacion < 4:
-        estado = 'Dilatación cervical lenta'
-        recomendacion = "Monitorear progreso más de cerca."
-    elif dilatacion >= 10:
-        estado = 'Dilatación completa, preparar para el parto'
-        recomendacion = "Preparar para el parto inminente y notificar al equipo médico."
-    
-    # Evaluar la frecuencia cardíaca fetal
-    if frecuencia_cardiaca < 110:
-        estado = 'Bradicardia fetal'
-        recomendacion = "Requiere atención inmediata y evaluación médica."
-    elif frecuencia_cardiaca > 160:
-        estado = 'Taquicardia fetal'
-        recomendacion = "Evaluar causas y tomar acciones según protocolo médico."
-    
-    # Evaluar las contracciones uterinas
-    if contracciones < 3:
-        estado = 'Contracciones uterinas insuficientes'
-        recomendacion = "Considerar estimulación si es indicado y está dentro del plan de parto."
-    elif contracciones > 5:
-        estado = 'Contracciones uterinas frecuentes'
-        recomendacion = "Evaluar para descartar parto prematuro o hiperestimulación."
-    
-    # Evaluar la presión arterial
-    try:
-        sistolica, diastolica = map(int, presion_arterial.split('/'))
-        if sistolica < 90 or diastolica < 60:
-            estado = 'Hipotensión'
-            recomendacion = "Aumentar la monitorización, asegurar hidratación adecuada y considerar evaluación médica."
-        elif sistolica > 140 or diastolica > 90:
-            estado = 'Hipertensión'
-            recomendacion = "Requerir evaluación médica adicional y considerar manejo para hipertensión."
-    except ValueError:
-        estado = 'Error en la medición de la presión arterial'
-        recomendacion = "Verificar la entrada de la presión arterial y volver a medir."
-
-    return estado, recomendacion
-
-# Función para parsear fechas de diferentes formatos.
-def parse_fecha(fecha_str):
-    # Asegúrate de que la entrada es una cadena, ya que strptime espera una cadena
-    if isinstance(fecha_str, str):
-        for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
-            try:
-                return datetime.strptime(fecha_str, fmt)
-            except ValueError:
-                continue
-    return None  # Devuelve None si no se reconoce el formato o no es una cadena
-
-# Función para calcular la diferencia de tiempo y mostrar una cuenta regresiva
-def mostrar_cuenta_regresiva(fecha_ultima_medicion, intervalo_minutos=30):
-    ahora = datetime.now()
-    tiempo_transcurrido = ahora - fecha_ultima_medicion
-    tiempo_restante = timedelta(minutes=intervalo_minutos) - tiempo_transcurrido
-    if tiempo_restante.total_seconds() > 0:
-        # Calcular horas y minutos para la cuenta regresiva
-        horas, rem = divmod(tiempo_restante.seconds, 3600)
-        minutos, segundos = divmod(rem, 60)
-        return f"{horas:02d}:{minutos:02d}:{segundos:02d}"
-    else:
-        return "00:00:00"
+    sistolica, diastolica = separar_presion(presion_arterial)
+    pool.escribir("INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial, sistolica, diastolica) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (id_paciente, fecha_hora, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial, sistolica, diastolica))
+    planificador.notificar_medicion(id_paciente, fecha_hora)
+
+# Función para saber si el episodio de parto de una paciente sigue activo: a un episodio
+# finalizado no se le agregan mediciones, porque se archivarían con él sin que nadie las vea.
+def episodio_activo(id_paciente):
+    with pool.lectura() as conn:
+        fila = conn.execute("SELECT estado_episodio FROM pacientes WHERE id = ?", (id_paciente,)).fetchone()
+    return fila is not None and fila[0] == 'activo'
+
+# Función para saber si una paciente tiene tocografía (sus contracciones se cuentan solas).
+def tiene_tocografia(id_paciente):
+    with pool.lectura() as conn:
+        return 'toco' in senales_paciente(conn, id_paciente)
 
 # Sección de la interfaz de usuario para agregar pacientes.
+# Los campos van en un formulario: escribir en ellos no vuelve a ejecutar la página.
 st.sidebar.title("Agregar Paciente")
-id_paciente = st.sidebar.text_input("ID del Paciente", placeholder="Ejemplo: 12345678")
-nombre_paciente = st.sidebar.text_input("Nombre del Paciente", placeholder="Ejemplo: Maria Perez")
-edad_paciente = st.sidebar.number_input("Edad del Paciente", min_value=0, max_value=100, step=1, value=30)
-fum_paciente = st.sidebar.date_input("Fecha de Última Menstruación")
-c.execute("SELECT nombre FROM patologias")
-patologias_opciones = [p[0] for p in c.fetchall()]
-patologia_paciente = st.sidebar.selectbox("Patología de Base", patologias_opciones)
-if st.sidebar.button("Agregar Paciente"):
-    agregar_paciente(id_paciente, nombre_paciente, edad_paciente, fum_paciente, patologia_paciente)
-    st.sidebar.success("Paciente agregado con éxito.")
+with perfilado.etapa('barra_lateral'):
+    patologias = listar_patologias(pool, version)
+with st.sidebar.form("form_agregar_paciente", clear_on_submit=True):
+    id_paciente = st.text_input("ID del Paciente", placeholder="Ejemplo: 12345678")
+    nombre_paciente = st.text_input("Nombre del Paciente", placeholder="Ejemplo: Maria Perez")
+    edad_paciente = st.number_input("Edad del Paciente", min_value=0, max_value=100, step=1, value=30)
+    fum_paciente = st.date_input("Fecha de Última Menstruación")
+    patologia_paciente = st.selectbox("Patología de Base", patologias)
+    enviar_paciente = st.form_submit_button("Agregar Paciente")
+if enviar_paciente:
+    try:
+        agregar_paciente(id_paciente, nombre_paciente, edad_paciente, fum_paciente, patologia_paciente)
+        version = leer_version_datos()
+        st.sidebar.success("Paciente agregado con éxito.")
+    except sqlite3.IntegrityError as e:
+        st.sidebar.error(f"No se pudo agregar el paciente: {e}")
 
 # Sección de la interfaz de usuario para agregar mediciones.
+# La paciente se elige entre los resultados de una búsqueda por ID, nombre o patología (índice
+# de texto completo), así la lista no crece con el censo histórico.
 st.sidebar.title("Agregar Mediciones")
-c.execute("SELECT id FROM pacientes")
-lista_pacientes = [id[0] for id in c.fetchall()]
-id_paciente_medicion = st.sidebar.selectbox("Seleccionar Paciente", lista_pacientes, key="paciente_seleccionado")
-fecha_medicion = st.sidebar.date_input("Fecha de Medición", key="fecha_medicion")
-hora_medicion = st.sidebar.time_input("Hora de Medición", key="hora_medicion")
+texto_busqueda = st.sidebar.text_input("Buscar paciente", placeholder="ID, nombre o patología", key="buscar_paciente")
+solo_activas_busqueda = st.sidebar.checkbox("Solo pacientes activas", key="buscar_solo_activas")
+with perfilado.etapa('barra_lateral'):
+    resultados_busqueda = buscar_pacientes_en_cache(pool, texto_busqueda, solo_activas_busqueda, version)
+    id_pacientes = listar_pacientes(pool, version)
+etiquetas_busqueda = {fila['id']: etiqueta_paciente(fila) for _, fila in resultados_busqueda.iterrows()}
+with st.sidebar.form("form_agregar_medicion"):
+    id_paciente_medicion = st.selectbox("Seleccionar Paciente", list(etiquetas_busqueda), format_func=etiquetas_busqueda.get, key="paciente_seleccionado")
+    fecha_medicion = st.date_input("Fecha de Medición", key="fecha_medicion")
+    hora_medicion = st.time_input("Hora de Medición", key="hora_medicion")
+    dilatacion = st.number_input("Dilatación cervical (cm)", min_value=0, max_value=10, step=1, key="dilatacion", value=3)
+    frecuencia_cardiaca = st.number_input("Frecuencia Cardíaca Fetal (latidos/min)", min_value=60, max_value=200, step=1, key="frecuencia_cardiaca", value=120)
+    # Vacío solo en pacientes con tocografía: el analizador completa el conteo desde la traza.
+    # El formulario no se vuelve a ejecutar al elegir la paciente, así que se comprueba al enviar.
+    contracciones = st.number_input("Contracciones uterinas (en 10 min)", min_value=0, max_value=30, step=1, key="contracciones", value=None,
+                                    placeholder="Obligatorio sin cardiotocografía", help="Puede quedar vacío solo si la paciente tiene tocografía: se cuentan las contracciones de la traza.")
+    presion_arterial = st.text_input("Presión Arterial (mmHg)", key="presion_arterial", placeholder="Ejemplo: 120/80")
+    enviar_medicion = st.form_submit_button("Registrar Medicion")
 fecha_hora_medicion = datetime.combine(fecha_medicion, hora_medicion)
-dilatacion = st.sidebar.number_input("Dilatación cervical (cm)", min_value=0, max_value=10, step=1, key="dilatacion", value=3)
-frecuencia_cardiaca = st.sidebar.number_input("Frecuencia Cardíaca Fetal (latidos/min)", min_value=60, max_value=200, step=1, key="frecuencia_cardiaca", value=120)
-contracciones = st.sidebar.number_input("Contracciones uterinas (en 10 min)", min_value=0, max_value=30, step=1, key="contracciones", value=5)
-presion_arterial = st.sidebar.text_input("Presión Arterial (mmHg)", key="presion_arterial", placeholder="Ejemplo: 120/80")
-if st.sidebar.button("Registrar Medicion", key="boton_registrar_medicion"):
-    # Validación de la presión arterial
-    try:
-        sistolica, diastolica = map(int, presion_arterial.split('/'))
-        if sistolica < 50 or diastolica < 30:
-            st.sidebar.error("La presión arterial sistólica y diastólica parece muy baja.")
-        elif sistolica > 250 or diastolica > 150:
-            st.sidebar.error("La presión arterial sistólica y diastólica parece muy alta.")
-        else:
-            agregar_medicion(id_paciente_medicion, fecha_hora_medicion, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial)
-            st.sidebar.success("Medición registrada con éxito.")
-    except ValueError:
-        st.sidebar.error("Por favor ingresa la presión arterial en el formato correcto (sistólica/diastólica).")
-
-# Sección de la interfaz de usuario para alertas y cuenta regresiva
-st.sidebar.title("Próximas Mediciones")
-for paciente in c.execute("SELECT id, nombre FROM pacientes").fetchall():
-    ultima_medicion = c.execute("SELECT MAX(fecha) FROM mediciones WHERE id_paciente = ?", (paciente[0],)).fetchone()[0]
-    if ultima_medicion:
-        ultima_medicion_date = parse_fecha(ultima_medicion)
-        if ultima_medicion_date:
-            cuenta_regresiva = mostrar_cuenta_regresiva(ultima_medicion_date)
-            if cuenta_regresiva == "00:00:00":
-                st.sidebar.error(f"¡Hora de realizar nueva medición para {paciente[1]} (ID: {paciente[0]})!")
-            else:
-                st.sidebar.info(f"Próxima medición para {paciente[1]} (ID: {paciente[0]}) en: {cuenta_regresiva}")
-        else:
-            st.sidebar.error("No se pudo interpretar la última fecha de medición.")
+if enviar_medicion:
+    # Validación de la presión arterial (ver validacion.py, compartida con la importación masiva)
+    error_presion = validar_presion_arterial(presion_arterial)
+    if id_paciente_medicion is None:
+        st.sidebar.error("Busca y selecciona una paciente.")
+    elif not episodio_activo(id_paciente_medicion):
+        st.sidebar.error("El episodio de parto de esta paciente está cerrado; si se cerró por error, reábralo desde \"Historia clínica\".")
+    elif contracciones is None and not tiene_tocografia(id_paciente_medicion):
+        st.sidebar.error(MENSAJE_SIN_CONTRACCIONES + ".")
+    elif error_presion:
+        st.sidebar.error(error_presion)
     else:
-        st.sidebar.warning(f"No hay mediciones registradas para {paciente[1]} (ID: {paciente[0]}).")
+        agregar_medicion(id_paciente_medicion, fecha_hora_medicion, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial)
+        version = leer_version_datos()
+        st.sidebar.success("Medición registrada con éxito.")
+
+# Sección de la interfaz de usuario para elegir la ventana de visualización de los pacientes.
+# Las consultas se limitan a la ventana, así que el costo del tablero no crece con la duración
+# del monitoreo; la historia anterior se puede ver resumida por hora en cada paciente.
+st.sidebar.title("Ventana de Visualización")
+opciones_ventana = [f"Últimas {horas} h" for horas in VENTANAS_HORAS] + ["Personalizada", "Toda la historia"]
+opcion_ventana = st.sidebar.selectbox(
+    "Mostrar mediciones", opciones_ventana, index=VENTANAS_HORAS.index(VENTANA_POR_DEFECTO), key="ventana"
+)
+if opcion_ventana == "Toda la historia":
+    ventana = (None, None)
+elif opcion_ventana == "Personalizada":
+    ahora = datetime.now()
+    fecha_desde = st.sidebar.date_input("Desde", value=ahora.date(), key="ventana_fecha_desde")
+    hora_desde = st.sidebar.time_input("Hora desde", value=datetime.min.time(), key="ventana_hora_desde")
+    fecha_hasta = st.sidebar.date_input("Hasta", value=ahora.date(), key="ventana_fecha_hasta")
+    hora_hasta = st.sidebar.time_input("Hora hasta", value=datetime.max.time().replace(microsecond=0), key="ventana_hora_hasta")
+    ventana = (datetime.combine(fecha_desde, hora_desde), datetime.combine(fecha_hasta, hora_hasta))
+    if ventana[0] > ventana[1]:
+        st.sidebar.error("El inicio de la ventana debe ser anterior al final.")
+else:
+    ventana = (inicio_ventana(VENTANAS_HORAS[opciones_ventana.index(opcion_ventana)]), None)
+
+# Sección de la interfaz de usuario para alertas y cuenta regresiva.
+# Se actualiza por sí sola cada 30 segundos sin volver a ejecutar el resto de la página.
+with st.sidebar, perfilado.etapa('proximas_mediciones'):
+    panel_proximas_mediciones(pool, planificador)
 
 # Al inicio de tu script, añade estas líneas para el estilo CSS
 st.markdown(
@@ -255,91 +256,59 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+# Triage de la sala: pacientes ordenadas por la severidad de su última medición
+st.header("Triage de la Sala")
+with perfilado.etapa('triage'), pool.lectura() as conn:
+    triage = triage_sala(conn)
+if not triage.empty:
+    st.dataframe(triage[['id_paciente', 'nombre', 'fecha', 'severidad', 'estados', 'velocidad_dilatacion']], hide_index=True)
+else:
+    st.write("No hay mediciones registradas.")
+
+# Tamizaje de presión arterial de toda la sala: una consulta sobre los índices de sistólica y
+# diastólica, sin interpretar el texto de cada medición.
+with st.expander(f"Presión arterial alterada (últimas {VENTANA_POR_DEFECTO} h)"):
+    with perfilado.etapa('tamizaje_presion'), pool.lectura() as conn:
+        tamizaje = tamizaje_presion_arterial(conn, inicio_ventana(VENTANA_POR_DEFECTO).strftime(FORMATO_FECHA))
+    st.dataframe(tamizaje, hide_index=True)
+
 # Visualización de Datos y Generación de Diagnósticos
-for paciente in c.execute("SELECT * FROM pacientes").fetchall():
+# Solo las pacientes con el episodio de parto activo; los episodios cerrados se consultan en la
+# historia clínica y se mueven a la base de archivo (archivo_historico.py).
+with perfilado.etapa('consulta_pacientes'), pool.lectura() as conn:
+    pacientes = conn.execute("SELECT * FROM pacientes WHERE estado_episodio = 'activo'").fetchall()
+for paciente in pacientes:
     # Contenedor personalizado para cada paciente
     with st.container():
-        # Contenedor personalizado para cada paciente
-        st.markdown(f"<div class='paciente-container'>", unsafe_allow_html=True)
-        
-        # Subtítulo con estilo personalizado
-        st.markdown(f"<h2 class='paciente-header'>Paciente: {paciente[1]} (ID: {paciente[0]}) - Edad: {paciente[2]} - FUM: {paciente[3]} - Patología: {paciente[4]}</h2>", unsafe_allow_html=True)
-        
-        # Obtener las mediciones del paciente de la base de datos
-        mediciones_df = pd.read_sql_query(
-            "SELECT id, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial FROM mediciones WHERE id_paciente = ? ORDER BY fecha",
-            conn,
-            params=(paciente[0],)
-        )
-
-        # Verificar si hay mediciones disponibles para el paciente
-        if not mediciones_df.empty:
-            # Conversión y limpieza de la columna de fecha
-            mediciones_df['Fecha'] = pd.to_datetime(mediciones_df['fecha']).dt.tz_localize(None)
-            mediciones_df.drop(columns=['fecha'], inplace=True) # Eliminar la columna original para evitar duplicados
-
-            # Mostrar la tabla de mediciones con la opción de descarga
-            st.dataframe(mediciones_df)
-            
-            # Añadir una clave única para cada botón de descarga
-            #unique_key = f"download_{paciente[0]}"  # Usando el ID del paciente
-            #st.download_button(
-            #    label="Descargar mediciones como CSV",
-            #    data=mediciones_df.to_csv(index=False),
-            #    file_name=f'mediciones_{paciente[0]}.csv',
-            #    mime='text/csv',
-            #    key=unique_key
-            #)
-
-            # Graficar cada métrica en una gráfica separada
-            fig, axes = plt.subplots(3, 1, figsize=(10, 15))
-            
-            # Añadir gráficas al contenedor de figuras
-            for i, (ax, column, color, title) in enumerate(zip(
-                    axes,
-                    ['dilatacion', 'frecuencia_cardiaca', 'contracciones'],
-                    ['blue', 'red', 'green'],
-                    ['Evolución de la Dilatación', 'Evolución de la Frecuencia Cardíaca Fetal', 'Evolución de las Contracciones']
-                )):
-                ax.plot(mediciones_df['Fecha'], mediciones_df[column], color=color)
-                ax.set_title(title)
-                ax.set_xlabel('Fecha')
-                ax.set_ylabel(column)
-                ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d %H:%M'))
-                ax.xaxis.set_tick_params(rotation=45)
-
-                # Añadir estilo a la gráfica
-                ax.grid(True)
-                ax.spines['top'].set_visible(False)
-                ax.spines['right'].set_visible(False)
-            
-            # Mostrar las figuras
-            plt.tight_layout()
-            st.pyplot(fig)
-        
-            # Diagnóstico y Recomendación
-            ultima_medicion = mediciones_df.iloc[-1]
-            diagnostico, recomendacion = generar_diagnostico(
-                ultima_medicion["dilatacion"],
-                ultima_medicion["frecuencia_cardiaca"],
-                ultima_medicion["contracciones"],
-                ultima_medicion["presion_arterial"]
-            )
-            
-            # Mostrar diagnóstico y recomendación con estilo personalizado
-            st.markdown(f"<div class='diagnostico-recomendacion'><strong>Diagnóstico:</strong> {diagnostico}</div>", unsafe_allow_html=True)
-            st.markdown(f"<div class='diagnostico-recomendacion'><strong>Recomendación:</strong> {recomendacion}</div>", unsafe_allow_html=True)
-        
-        else:
-            st.write("No hay mediciones disponibles para este paciente.")
-            
-        # Cierra el contenedor personalizado
-        st.markdown("</div>", unsafe_allow_html=True)
-        
-    st.markdown("---")  # Separador visual para la siguiente sección    
-     
-# Cerrar conexión con la base de datos
-conn.close()
+        panel_paciente(pool, paciente, almacen_mediciones, servicio_graficas, ESTILO_GRAFICA, ventana)
+
+    st.markdown("---")  # Separador visual para la siguiente sección
+
+# Exportación de mediciones para auditoría e investigación.
+with st.sidebar.expander("Exportar mediciones"):
+    panel_exportacion(pool, id_pacientes)
+
+# Historia clínica completa de una paciente, incluidos los episodios archivados.
+with st.sidebar.expander("Historia clínica"):
+    panel_historia_clinica(pool)
+
+# Cola y estadísticas del servicio de gráficas.
+with st.sidebar:
+    panel_servicio_graficas(servicio_graficas)
+with st.sidebar.expander("Servicio de gráficas"):
+    st.json(servicio_graficas.estadisticas())
+with st.sidebar.expander("Almacén de mediciones"):
+    st.json(almacen_mediciones.estadisticas())
+with st.sidebar.expander("Planificador de mediciones"):
+    st.json(planificador.metricas())
+with st.sidebar.expander("Análisis de cardiotocografías"):
+    st.json(analizador_ctg.metricas())
+with st.sidebar.expander("Conexiones a la base de datos"):
+    st.json(pool.metricas())
+if perfilando:
+    perfil = perfilado.finalizar()
+    with st.sidebar.expander("Perfil de rendimiento", expanded=True):
+        panel_perfilado(perfil, perfilado.agregar_a_historia(st.session_state, perfil))
 
 # Sección de footer.
 st.sidebar.markdown('---')
@@ -1,7 +1,7 @@
 import streamlit as st
 from PIL import Image
 import pandas as pd
-import sqlite3
+from conexiones import obtener_pool
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 from datetime import datetime, timedelta
@@ -29,61 +29,17 @@ Esta aplicación permite el seguimiento continuo y detallado del trabajo de part
 registrando y visualizando datos clave como la dilatación cervical, frecuencia cardíaca fetal y contracciones.
 """)
 
-# Conexión con la base de datos SQLite.
-conn = sqlite3.connect('partoseguro.db')
-c = conn.cursor()
-
-# Creación de las tablas en la base de datos si no existen.
-# Tabla de pacientes.
-c.execute('''
-CREATE TABLE IF NOT EXISTS pacientes (
-    id TEXT PRIMARY KEY,
-    nombre TEXT,
-    edad INTEGER,
-    fum DATE,
-    patologia TEXT,
-    FOREIGN KEY(patologia) REFERENCES patologias(nombre)
-)
-''')
-
-# Tabla de mediciones.
-c.execute('''
-CREATE TABLE IF NOT EXISTS mediciones (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    id_paciente TEXT,
-    fecha TIMESTAMP,
-    dilatacion INTEGER,
-    frecuencia_cardiaca INTEGER,
-    contracciones INTEGER,
-    presion_arterial TEXT,
-    FOREIGN KEY(id_paciente) REFERENCES pacientes(id)
-)
-''')
-
-# Tabla de patologías.
-c.execute('''
-CREATE TABLE IF NOT EXISTS patologias (
-    nombre TEXT PRIMARY KEY
-)
-''')
-
-# Inserción de patologías comunes en la base de datos.
-patologias_comunes = ["Hipertensión", "Diabetes Gestacional", "Anemia", "Tiroides", "Preeclampsia", "Sin patologías"]
-c.execute("SELECT * FROM patologias")
-if len(c.fetchall()) == 0:
-    for patologia in patologias_comunes:
-        c.execute("INSERT INTO patologias (nombre) VALUES (?)", (patologia,))
-    conn.commit()
+# Pool de conexiones con la base de datos SQLite, compartido por todas las sesiones.
+# Las tablas y patologías comunes se crean con las migraciones de esquema.py.
+pool = obtener_pool('partoseguro.db')
 
 # Función para agregar pacientes a la base de datos.
 def agregar_paciente(id, nombre, edad, fum, patologia):
-    c.execute("INSERT INTO pacientes (id, nombre, edad, fum, patologia) VALUES (?, ?, ?, ?, ?)", (id, nombre, edad, fum, patologia))
-    conn.commit()
+    pool.escribir("INSERT INTO pacientes (id, nombre, edad, fum, patologia) VALUES (?, ?, ?, ?, ?)", (id, nombre, edad, fum, patologia))
 
 # Función para agregar mediciones a la base de datos.
 def agregar_medicion(id_paciente, fecha_hora, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial):
-    c.execute("INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial) VALUES (?, ?, ?, ?, ?, ?)", (id_paciente, fecha_hora, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial))
-    conn.commit()
+    pool.escribir("INSERT INTO mediciones (id_paciente, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial) VALUES (?, ?, ?, ?, ?, ?)", (id_paciente, fecha_hora, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial))
 
 # Función para generar diagnósticos y recomendaciones basados en las mediciones.
 def generar_diagnostico(dilatacion, frecuencia_cardiaca, contracciones, presion_arterial):
@@ -159,8 +115,8 @@ id_paciente = st.sidebar.text_input("ID del Paciente", placeholder="Ejemplo: 123
 nombre_paciente = st.sidebar.text_input("Nombre del Paciente", placeholder="Ejemplo: Maria Perez")
 edad_paciente = st.sidebar.number_input("Edad del Paciente", min_value=0, max_value=100, step=1, value=30)
 fum_paciente = st.sidebar.date_input("Fecha de Última Menstruación")
-c.execute("SELECT nombre FROM patologias")
-patologias_opciones = [p[0] for p in c.fetchall()]
+with pool.lectura() as conn:
+    patologias_opciones = [p[0] for p in conn.execute("SELECT nombre FROM patologias")]
 patologia_paciente = st.sidebar.selectbox("Patología de Base", patologias_opciones)
 if st.sidebar.button("Agregar Paciente"):
     agregar_paciente(id_paciente, nombre_paciente, edad_paciente, fum_paciente, patologia_paciente)
@@ -168,8 +124,8 @@ if st.sidebar.button("Agregar Paciente"):
 
 # Sección de la interfaz de usuario para agregar mediciones.
 st.sidebar.title("Agregar Mediciones")
-c.execute("SELECT id FROM pacientes")
-lista_pacientes = [id[0] for id in c.fetchall()]
+with pool.lectura() as conn:
+    lista_pacientes = [id[0] for id in conn.execute("SELECT id FROM pacientes")]
 id_paciente_medicion = st.sidebar.selectbox("Seleccionar Paciente", lista_pacientes, key="paciente_seleccionado")
 fecha_medicion = st.sidebar.date_input("Fecha de Medición", key="fecha_medicion")
 hora_medicion = st.sidebar.time_input("Hora de Medición", key="hora_medicion")
@@ -194,8 +150,12 @@ if st.sidebar.button("Registrar Medicion", key="boton_registrar_medicion"):
 
 # Sección de la interfaz de usuario para alertas y cuenta regresiva
 st.sidebar.title("Próximas Mediciones")
-for paciente in c.execute("SELECT id, nombre FROM pacientes").fetchall():
-    ultima_medicion = c.execute("SELECT MAX(fecha) FROM mediciones WHERE id_paciente = ?", (paciente[0],)).fetchone()[0]
+with pool.lectura() as conn:
+    ultimas_mediciones = conn.execute(
+        "SELECT p.id, p.nombre, (SELECT MAX(m.fecha) FROM mediciones m WHERE m.id_paciente = p.id) FROM pacientes p"
+    ).fetchall()
+for paciente in ultimas_mediciones:
+    ultima_medicion = paciente[2]
     if ultima_medicion:
         try:
             ultima_medicion_date = parse_fecha(ultima_medicion)
@@ -209,15 +169,18 @@ for paciente in c.execute("SELECT id, nombre FROM pacientes").fetchall():
             st.sidebar.error(f"Error en el formato de fecha para {paciente[1]} (ID: {paciente[0]}): {e}")
 
 # Visualización de Datos y Generación de Diagnósticos
-for paciente in c.execute("SELECT * FROM pacientes").fetchall():
+with pool.lectura() as conn:
+    pacientes = conn.execute("SELECT * FROM pacientes").fetchall()
+for paciente in pacientes:
     st.subheader(f"Paciente: {paciente[1]} (ID: {paciente[0]}) - Edad: {paciente[2]} - FUM: {paciente[3]} - Patología: {paciente[4]}")
     
     # Obtener las mediciones del paciente de la base de datos
-    mediciones_df = pd.read_sql_query(
-        "SELECT id, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial FROM mediciones WHERE id_paciente = ? ORDER BY fecha",
-        conn,
-        params=(paciente[0],)
-    )
+    with pool.lectura() as conn:
+        mediciones_df = pd.read_sql_query(
+            "SELECT id, fecha, dilatacion, frecuencia_cardiaca, contracciones, presion_arterial FROM mediciones WHERE id_paciente = ? ORDER BY fecha",
+            conn,
+            params=(paciente[0],)
+        )
 
     # Verificar si hay mediciones disponibles para el paciente
     if not mediciones_df.empty:
@@ -262,8 +225,6 @@ for paciente in c.execute("SELECT * FROM pacientes").fetchall():
         st.write(f"Diagnóstico: {diagnostico}")
         st.write(f"Recomendación: {recomendacion}")
 
-# Cerrar conexión con la base de datos
-conn.close()
 
 # Sección de footer.
 st.sidebar.markdown('---')
@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+# Perfilado opcional de las ejecuciones del tablero (partoseguro_main.py).
+# Se activa con la variable de entorno PARTOSEGURO_PERFIL=1 o abriendo la página con ?perfil=1.
+# Cada ejecución completa de la página mide el tiempo de sus etapas (esquema, barra lateral,
+# triage, consulta de cada paciente, lectura de fechas, gráfica, tabla, diagnóstico...), cuenta
+# las sentencias SQL de cada una y agrega una línea JSON al registro de perfiles.
+# Desactivado, etapa() devuelve un contexto vacío y el pool no tiene función de traza, así que
+# el costo es una búsqueda en un threading.local por etapa.
+VARIABLE_ENTORNO = 'PARTOSEGURO_PERFIL'
+ARCHIVO_REGISTRO = os.environ.get('PARTOSEGURO_PERFIL_REGISTRO', 'perfil_reruns.jsonl')
+# Ejecuciones que se guardan por sesión para el panel de perfilado.
+HISTORIA_SESION = 20
+
+_local = threading.local()
+_NULO = nullcontext()
+_pools_trazados = set()
+_lock_registro = threading.Lock()
+
+# Perfil de una ejecución de la página. Los tiempos de cada etapa son inclusivos (una etapa
+# anidada también cuenta en la que la contiene) y cada sentencia SQL se atribuye a la etapa
+# más interna abierta en el momento de ejecutarse.
+class Perfil:
+    def __init__(self):
+        self.fecha = datetime.now().isoformat(timespec='seconds')
+        self.inicio = time.perf_counter()
+        self.total_ms = None
+        self.sql = 0
+        self.etapas = {}
+        self._pila = []
+        self._ms_primer_nivel = 0.0
+
+    @contextmanager
+    def etapa(self, nombre):
+        self._pila.append(nombre)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            self._pila.pop()
+            etapa = self.etapas.setdefault(nombre, {'ms': 0.0, 'llamadas': 0, 'sql': 0})
+            etapa['ms'] += ms
+            etapa['llamadas'] += 1
+            if not self._pila:
+                self._ms_primer_nivel += ms
+
+    def contar_sql(self):
+        self.sql += 1
+        nombre = self._pila[-1] if self._pila else 'otros'
+        etapa = self.etapas.setdefault(nombre, {'ms': 0.0, 'llamadas': 0, 'sql': 0})
+        etapa['sql'] += 1
+
+    def cerrar(self):
+        self.total_ms = (time.perf_counter() - self.inicio) * 1000
+        otros = self.etapas.setdefault('otros', {'ms': 0.0, 'llamadas': 0, 'sql': 0})
+        otros['ms'] = max(0.0, self.total_ms - self._ms_primer_nivel)
+        otros['llamadas'] = 1
+
+    def como_dict(self):
+        return {
+            'fecha': self.fecha,
+            'total_ms': round(self.total_ms, 2),
+            'sql': self.sql,
+            'etapas': {
+                nombre: {'ms': round(etapa['ms'], 2), 'llamadas': etapa['llamadas'], 'sql': etapa['sql']}
+                for nombre, etapa in self.etapas.items()
+            },
+        }
+
+# Función para saber si el perfilado está pedido, por variable de entorno o por la URL.
+def activo(query_params=None):
+    if os.environ.get(VARIABLE_ENTORNO, '').lower() in ('1', 'true', 'si', 'sí'):
+        return True
+    return query_params is not None and query_params.get('perfil') == '1'
+
+# Función para empezar a perfilar la ejecución del hilo actual. Devuelve el perfil.
+def iniciar():
+    _local.perfil = Perfil()
+    return _local.perfil
+
+# Función para medir una etapa: `with perfilado.etapa('grafica'): ...`.
+# Sin un perfil en curso en el hilo, no hace nada.
+def etapa(nombre):
+    perfil = getattr(_local, 'perfil', None)
+    return _NULO if perfil is None else perfil.etapa(nombre)
+
+def _contar_sentencia(sql):
+    perfil = getattr(_local, 'perfil', None)
+    # Las sentencias de los triggers se reportan como comentarios '-- ...'.
+    if perfil is not None and not sql.startswith('--'):
+        perfil.contar_sql()
+
+# Función para contar las sentencias SQL de un pool en el perfil del hilo que las ejecuta.
+# La traza queda instalada para el resto del proceso; las sentencias de hilos sin perfil
+# (por ejemplo, el planificador) se ignoran.
+def trazar_pool(pool):
+    if id(pool) not in _pools_trazados:
+        _pools_trazados.add(id(pool))
+        pool.trazar(_contar_sentencia)
+
+# Función para cerrar el perfil del hilo actual y agregarlo al registro JSON (una línea por
+# ejecución). Devuelve el perfil cerrado, o None si no había uno en curso.
+def finalizar(archivo=ARCHIVO_REGISTRO):
+    perfil = getattr(_local, 'perfil', None)
+    if perfil is None:
+        return None
+    _local.perfil = None
+    perfil.cerrar()
+    if archivo:
+        linea = json.dumps(perfil.como_dict(), ensure_ascii=False)
+        with _lock_registro, open(archivo, 'a', encoding='utf-8') as registro:
+            registro.write(linea + '\n')
+    return perfil
+
+# Función para guardar un perfil en la historia de la sesión (para el panel) y devolverla.
+def agregar_a_historia(estado_sesion, perfil):
+    historia = estado_sesion.setdefault('perfiles', deque(maxlen=HISTORIA_SESION))
+    historia.append(perfil.como_dict())
+    return historia
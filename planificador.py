@@ -0,0 +1,350 @@
+import argparse
+import heapq
+import queue
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from almacen_mediciones import version_datos
+from proximas_mediciones import HORAS_ACTIVIDAD, INTERVALO_MINUTOS, SQL_ULTIMAS_MEDICIONES
+
+# Cada cuántos segundos se buscan cambios hechos por otras aplicaciones o procesos
+# (mediciones importadas, registradas desde el gestor, intervalos configurados, etc.).
+INTERVALO_SONDEO_S = 5
+# Eventos pendientes de leer como máximo; si nadie los consume, se descartan los nuevos.
+MAX_EVENTOS = 1000
+TIPO_MEDICION_VENCIDA = 'medicion_vencida'
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+# Función para interpretar una fecha de mediciones.fecha; devuelve None si no es válida.
+def _interpretar_fecha(valor):
+    if valor is None:
+        return None
+    try:
+        fecha = datetime.fromisoformat(str(valor))
+        return fecha.replace(tzinfo=None) if fecha.tzinfo else fecha
+    except ValueError:
+        pass
+    # Formatos menos comunes (por ejemplo, cargados con db_manager.py).
+    fecha = pd.to_datetime(valor, format='ISO8601', errors='coerce')
+    if pd.isna(fecha):
+        return None
+    return fecha.tz_localize(None).to_pydatetime() if fecha.tzinfo else fecha.to_pydatetime()
+
+# Planificador de mediciones en segundo plano.
+# Mantiene en memoria la última medición de cada paciente y un montículo (heapq) con el
+# vencimiento de su próxima medición, según su intervalo (tabla intervalos_medicion o
+# INTERVALO_MINUTOS). Un hilo espera hasta el próximo vencimiento y, para las pacientes activas
+# (medidas en las últimas horas_actividad horas), registra una alerta en la tabla alertas y
+# publica un evento en la cola `eventos`. Una medición nueva resuelve la alerta abierta y
+# reprograma solo a esa paciente: con notificar_medicion si se registró en este proceso, o
+# al sondear los ids nuevos de mediciones si la registró otra aplicación.
+# Los tableros leen el estado ya calculado con estado(), sin consultar la base de datos.
+class PlanificadorMediciones:
+    def __init__(self, pool, intervalo_minutos=INTERVALO_MINUTOS, horas_actividad=HORAS_ACTIVIDAD,
+                 intervalo_sondeo_s=INTERVALO_SONDEO_S):
+        self.pool = pool
+        self.intervalo_minutos = intervalo_minutos
+        self.horas_actividad = horas_actividad
+        self.intervalo_sondeo_s = intervalo_sondeo_s
+        self.eventos = queue.Queue(maxsize=MAX_EVENTOS)
+        self._pacientes = {}
+        self._intervalos = {}
+        self._monticulo = []
+        self._por_resolver = set()
+        self._ultimo_id = -1
+        self._version = None
+        self._condicion = threading.Condition()
+        self._detener = threading.Event()
+        self._hilo = None
+        self.alertas_emitidas = 0
+        self.eventos_descartados = 0
+        self.actualizaciones = 0
+        self.recargas = 0
+
+    # Vencimiento de una paciente, o None si no tiene una medición con fecha válida.
+    def _vencimiento(self, id_paciente):
+        paciente = self._pacientes[id_paciente]
+        if paciente['fecha'] is None:
+            return None
+        minutos = self._intervalos.get(id_paciente, self.intervalo_minutos)
+        return paciente['fecha'] + timedelta(minutes=minutos)
+
+    # Vuelve a poner a la paciente en el montículo. Las entradas anteriores no se buscan para
+    # borrarlas: al salir del montículo se descartan si ya no coinciden con su vencimiento.
+    def _programar(self, id_paciente):
+        vence = self._vencimiento(id_paciente)
+        self._pacientes[id_paciente]['vence'] = vence
+        if vence is not None and not self._pacientes[id_paciente]['alerta']:
+            heapq.heappush(self._monticulo, (vence, id_paciente))
+
+    def _nueva_paciente(self, id_paciente, nombre):
+        self._pacientes[id_paciente] = {
+            'nombre': nombre, 'ultima_fecha': None, 'fecha': None, 'vence': None, 'alerta': False,
+        }
+
+    def _aplicar_medicion(self, id_paciente, fecha_texto):
+        paciente = self._pacientes.get(id_paciente)
+        if paciente is None:
+            self._nueva_paciente(id_paciente, None)
+            paciente = self._pacientes[id_paciente]
+        fecha = _interpretar_fecha(fecha_texto)
+        # Una medición con fecha anterior a la última no cambia el vencimiento.
+        if fecha is None or (paciente['fecha'] is not None and fecha <= paciente['fecha']):
+            return
+        paciente['ultima_fecha'] = fecha_texto
+        paciente['fecha'] = fecha
+        if paciente['alerta']:
+            paciente['alerta'] = False
+            self._por_resolver.add(id_paciente)
+        self._programar(id_paciente)
+        self.actualizaciones += 1
+
+    # Carga completa: pacientes, última medición, intervalos y alertas abiertas.
+    # El último id se lee antes que las mediciones; lo insertado entretanto se vuelve a leer en
+    # el siguiente sondeo, y aplicar una medición dos veces no cambia nada.
+    def _cargar(self, conn):
+        ultimo_id = conn.execute("SELECT COALESCE(MAX(id), -1) FROM mediciones").fetchone()[0]
+        ultimas = conn.execute(SQL_ULTIMAS_MEDICIONES).fetchall()
+        intervalos = dict(conn.execute("SELECT id_paciente, intervalo_minutos FROM intervalos_medicion"))
+        con_alerta = {fila[0] for fila in conn.execute(
+            "SELECT id_paciente FROM alertas WHERE tipo = ? AND resuelta IS NULL", (TIPO_MEDICION_VENCIDA,)
+        )}
+        with self._condicion:
+            self._pacientes = {}
+            self._intervalos = intervalos
+            self._monticulo = []
+            for id_paciente, nombre, ultima_fecha in ultimas:
+                self._nueva_paciente(id_paciente, nombre)
+                paciente = self._pacientes[id_paciente]
+                paciente['ultima_fecha'] = ultima_fecha
+                paciente['fecha'] = _interpretar_fecha(ultima_fecha)
+                paciente['alerta'] = id_paciente in con_alerta
+                # Una alerta abierta de una paciente medida mientras el planificador no corría.
+                vence = self._vencimiento(id_paciente)
+                if paciente['alerta'] and vence is not None and vence > datetime.now():
+                    paciente['alerta'] = False
+                    self._por_resolver.add(id_paciente)
+                self._programar(id_paciente)
+            self._ultimo_id = ultimo_id
+        self.recargas += 1
+
+    # Busca cambios en la base de datos. Con la marca de versión sin cambios no hace nada más;
+    # si solo hay mediciones nuevas, las lee por rango de ids; si se editaron o eliminaron
+    # mediciones, o se finalizó o archivó algún episodio, recarga todo.
+    # Solo sigue a las pacientes con el episodio de parto activo. La versión vista se guarda solo
+    # después de aplicar los cambios: si la carga falla, el sondeo siguiente lo vuelve a intentar.
+    def _sondear(self):
+        with self.pool.lectura() as conn:
+            version = version_datos(conn)
+            anterior = self._version
+            if (anterior is None or version[1] != anterior[1] or version[2] < anterior[2]
+                    or version[4] != anterior[4]):
+                self._cargar(conn)
+                self._version = version
+                return
+            if version[2:] != anterior[2:]:
+                nombres = conn.execute("SELECT id, nombre FROM pacientes WHERE estado_episodio = 'activo'").fetchall()
+                with self._condicion:
+                    for id_paciente, nombre in nombres:
+                        if id_paciente in self._pacientes:
+                            self._pacientes[id_paciente]['nombre'] = nombre
+                        else:
+                            self._nueva_paciente(id_paciente, nombre)
+            intervalos = dict(conn.execute("SELECT id_paciente, intervalo_minutos FROM intervalos_medicion"))
+            nuevas = []
+            if version[0] != anterior[0]:
+                # CROSS JOIN fija el orden: primero el rango de ids nuevos y después cada paciente
+                # por su clave, en lugar de recorrer todas las pacientes activas.
+                nuevas = conn.execute(
+                    "SELECT m.id, m.id_paciente, m.fecha FROM mediciones m CROSS JOIN pacientes p ON p.id = m.id_paciente "
+                    "WHERE m.id > ? AND p.estado_episodio = 'activo' ORDER BY m.id", (self._ultimo_id,)
+                ).fetchall()
+        with self._condicion:
+            for id_medicion, id_paciente, fecha in nuevas:
+                self._aplicar_medicion(id_paciente, fecha)
+                self._ultimo_id = max(self._ultimo_id, id_medicion)
+            if intervalos != self._intervalos:
+                cambiadas = set(intervalos.items()) ^ set(self._intervalos.items())
+                self._intervalos = intervalos
+                for id_paciente in {id_paciente for id_paciente, _ in cambiadas}:
+                    if id_paciente in self._pacientes:
+                        self._programar(id_paciente)
+            self._version = version
+
+    # Saca del montículo lo vencido y registra las alertas de las pacientes activas.
+    # El estado en memoria solo cambia después de confirmar la escritura: si falla, las entradas
+    # vuelven al montículo y las alertas por resolver a su conjunto, y el ciclo siguiente lo
+    # vuelve a intentar (INSERT OR IGNORE hace que repetir una alerta no la duplique).
+    def _emitir_vencidas(self, ahora):
+        candidatas = []
+        with self._condicion:
+            limite_actividad = ahora - timedelta(hours=self.horas_actividad)
+            while self._monticulo and self._monticulo[0][0] <= ahora:
+                vence, id_paciente = heapq.heappop(self._monticulo)
+                paciente = self._pacientes.get(id_paciente)
+                if paciente is None or paciente['vence'] != vence or paciente['alerta']:
+                    continue  # entrada reemplazada por una medición o un intervalo nuevos
+                if paciente['fecha'] < limite_actividad:
+                    continue  # paciente sin mediciones recientes (por ejemplo, dada de alta)
+                candidatas.append((id_paciente, paciente['nombre'], vence))
+            por_resolver = set(self._por_resolver)
+        if not por_resolver and not candidatas:
+            return
+
+        emitida = ahora.strftime(FORMATO_FECHA)
+        def registrar_alertas(conn):
+            conn.executemany(
+                "UPDATE alertas SET resuelta = ? WHERE id_paciente = ? AND tipo = ? AND resuelta IS NULL",
+                [(emitida, id_paciente, TIPO_MEDICION_VENCIDA) for id_paciente in por_resolver],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO alertas (id_paciente, tipo, vence, emitida) VALUES (?, ?, ?, ?)",
+                [(id_paciente, TIPO_MEDICION_VENCIDA, vence.strftime(FORMATO_FECHA), emitida)
+                 for id_paciente, _, vence in candidatas],
+            )
+        try:
+            self.pool.escribir(registrar_alertas)
+        except BaseException:
+            with self._condicion:
+                for id_paciente, _, vence in candidatas:
+                    heapq.heappush(self._monticulo, (vence, id_paciente))
+            raise
+
+        nuevas_alertas = []
+        with self._condicion:
+            self._por_resolver -= por_resolver
+            for id_paciente, nombre, vence in candidatas:
+                paciente = self._pacientes.get(id_paciente)
+                if paciente is None or paciente['vence'] != vence:
+                    # Medida mientras se escribía la alerta: queda registrada, así que se resuelve
+                    # en el ciclo siguiente.
+                    self._por_resolver.add(id_paciente)
+                    continue
+                paciente['alerta'] = True
+                nuevas_alertas.append((id_paciente, nombre, vence))
+        for id_paciente, nombre, vence in nuevas_alertas:
+            self.alertas_emitidas += 1
+            try:
+                self.eventos.put_nowait({
+                    'tipo': TIPO_MEDICION_VENCIDA, 'id_paciente': id_paciente, 'nombre': nombre, 'vence': vence,
+                })
+            except queue.Full:
+                self.eventos_descartados += 1
+
+    # Un ciclo del planificador: sondeo y emisión de alertas. Devuelve los segundos hasta el
+    # próximo vencimiento o sondeo.
+    def ciclo(self, ahora=None):
+        self._sondear()
+        ahora = ahora or datetime.now()
+        self._emitir_vencidas(ahora)
+        with self._condicion:
+            espera = self.intervalo_sondeo_s
+            if self._monticulo:
+                espera = min(espera, max(0.0, (self._monticulo[0][0] - ahora).total_seconds()))
+        return espera
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                espera = self.ciclo()
+            except Exception:
+                # Un error puntual (por ejemplo, la base ocupada) no debe detener las alertas.
+                espera = self.intervalo_sondeo_s
+            with self._condicion:
+                if not self._por_resolver and not self._detener.is_set():
+                    self._condicion.wait(espera)
+
+    # Arranca el hilo del planificador. La primera carga se hace antes de volver, para que
+    # estado() ya tenga a todas las pacientes.
+    def iniciar(self):
+        if self._hilo is None:
+            self._sondear()
+            self._hilo = threading.Thread(target=self._bucle, name='planificador-mediciones', daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self):
+        self._detener.set()
+        with self._condicion:
+            self._condicion.notify_all()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    # Avisa al planificador de una medición registrada en este proceso, sin esperar al sondeo.
+    def notificar_medicion(self, id_paciente, fecha):
+        fecha_texto = fecha.strftime(FORMATO_FECHA) if isinstance(fecha, datetime) else str(fecha)
+        with self._condicion:
+            self._aplicar_medicion(id_paciente, fecha_texto)
+            self._condicion.notify_all()
+
+    # Fija el intervalo entre mediciones de una paciente (por ejemplo, 15 minutos en fase activa);
+    # con minutos=None vuelve al intervalo por defecto.
+    def configurar_intervalo(self, id_paciente, minutos):
+        if minutos is None:
+            self.pool.escribir("DELETE FROM intervalos_medicion WHERE id_paciente = ?", (id_paciente,))
+        else:
+            self.pool.escribir(
+                "INSERT INTO intervalos_medicion (id_paciente, intervalo_minutos) VALUES (?, ?) "
+                "ON CONFLICT(id_paciente) DO UPDATE SET intervalo_minutos = excluded.intervalo_minutos",
+                (id_paciente, int(minutos)),
+            )
+        with self._condicion:
+            if minutos is None:
+                self._intervalos.pop(id_paciente, None)
+            else:
+                self._intervalos[id_paciente] = int(minutos)
+            if id_paciente in self._pacientes:
+                self._programar(id_paciente)
+            self._condicion.notify_all()
+
+    # Estado de todas las pacientes: id, nombre, ultima_fecha, intervalo_minutos, vence y alerta.
+    def estado(self):
+        with self._condicion:
+            filas = [
+                (id_paciente, p['nombre'], p['ultima_fecha'], self._intervalos.get(id_paciente, self.intervalo_minutos),
+                 p['vence'], p['alerta'])
+                for id_paciente, p in self._pacientes.items()
+            ]
+        return pd.DataFrame(filas, columns=['id', 'nombre', 'ultima_fecha', 'intervalo_minutos', 'vence', 'alerta'])
+
+    def metricas(self):
+        with self._condicion:
+            return {
+                'pacientes': len(self._pacientes),
+                'en_monticulo': len(self._monticulo),
+                'alertas_abiertas': sum(p['alerta'] for p in self._pacientes.values()),
+                'alertas_emitidas': self.alertas_emitidas,
+                'eventos_pendientes': self.eventos.qsize(),
+                'eventos_descartados': self.eventos_descartados,
+                'actualizaciones_incrementales': self.actualizaciones,
+                'recargas': self.recargas,
+            }
+
+# Uso: python planificador.py [--bd partoseguro.db]
+# Corre el planificador como proceso independiente e imprime las alertas a medida que vencen.
+def main():
+    from conexiones import obtener_pool
+
+    parser = argparse.ArgumentParser(description="Planificador de mediciones: registra alertas de mediciones vencidas.")
+    parser.add_argument('--bd', default='partoseguro.db', help="Base de datos (por defecto: partoseguro.db)")
+    parser.add_argument('--sondeo', type=float, default=INTERVALO_SONDEO_S, help="Segundos entre sondeos de la base de datos")
+    args = parser.parse_args()
+
+    planificador = PlanificadorMediciones(obtener_pool(args.bd), intervalo_sondeo_s=args.sondeo).iniciar()
+    try:
+        while True:
+            try:
+                evento = planificador.eventos.get(timeout=1)
+            except queue.Empty:
+                continue
+            print(f"{datetime.now():%H:%M:%S} Medición vencida: {evento['nombre']} (ID: {evento['id_paciente']}), "
+                  f"vencía a las {evento['vence']:%H:%M}")
+    except KeyboardInterrupt:
+        planificador.detener()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import pandas as pd
+from datetime import datetime, timedelta
+
+# Intervalo por defecto entre mediciones y ventana para considerar activa a una paciente.
+INTERVALO_MINUTOS = 30
+HORAS_ACTIVIDAD = 24
+
+# Consulta única con la última medición de cada paciente con el episodio de parto activo,
+# incluidas las que no tienen mediciones. La fecha sale de estado_paciente, que los triggers
+# mantienen al día (ver esquema.py), sin buscar el MAX(fecha) de cada paciente en mediciones.
+SQL_ULTIMAS_MEDICIONES = """
+SELECT p.id, p.nombre, e.ultima_fecha
+FROM pacientes p
+LEFT JOIN estado_paciente e ON e.id_paciente = p.id
+WHERE p.estado_episodio = 'activo'
+"""
+
+# Consulta limitada a las pacientes con mediciones dentro de la ventana de actividad:
+# el rango sobre el índice de ultima_fecha descarta el histórico de altas sin recorrerlo.
+SQL_ULTIMAS_MEDICIONES_ACTIVAS = """
+SELECT p.id, p.nombre, e.ultima_fecha
+FROM estado_paciente e
+JOIN pacientes p ON p.id = e.id_paciente
+WHERE e.ultima_fecha >= ? AND p.estado_episodio = 'activo'
+"""
+
+# Función para obtener en una sola consulta la última medición de cada paciente.
+# Con solo_activos=True solo se devuelven las pacientes medidas en las últimas horas_actividad horas.
+def obtener_ultimas_mediciones(conn, solo_activos=False, horas_actividad=HORAS_ACTIVIDAD, ahora=None):
+    if solo_activos:
+        ahora = ahora or datetime.now()
+        desde = (ahora - timedelta(hours=horas_actividad)).strftime('%Y-%m-%d %H:%M:%S')
+        filas = conn.execute(SQL_ULTIMAS_MEDICIONES_ACTIVAS, (desde,)).fetchall()
+    else:
+        filas = conn.execute(SQL_ULTIMAS_MEDICIONES).fetchall()
+    return pd.DataFrame(filas, columns=['id', 'nombre', 'ultima_fecha'])
+
+# Función para calcular de una vez la cuenta regresiva de todas las pacientes.
+# Agrega las columnas 'estado' ('pendiente', 'vencida', 'sin_mediciones' o 'fecha_invalida'),
+# 'segundos_restantes' y 'cuenta_regresiva' con el mismo formato que mostrar_cuenta_regresiva.
+# intervalo_minutos puede ser un número o una serie con el intervalo de cada paciente.
+def calcular_cuentas_regresivas(ultimas_df, intervalo_minutos=INTERVALO_MINUTOS, ahora=None):
+    ahora = ahora or datetime.now()
+    resultado = ultimas_df.copy()
+    fechas = pd.to_datetime(resultado['ultima_fecha'], format='ISO8601', errors='coerce')
+    restante = (fechas + pd.to_timedelta(intervalo_minutos, unit='min') - pd.Timestamp(ahora)).dt.total_seconds()
+    segundos = restante.clip(lower=0).fillna(0).astype(int)
+
+    horas, resto = (segundos % 86400).divmod(3600)
+    minutos, segs = resto.divmod(60)
+    resultado['segundos_restantes'] = segundos
+    resultado['cuenta_regresiva'] = (
+        horas.astype(str).str.zfill(2) + ':' + minutos.astype(str).str.zfill(2) + ':' + segs.astype(str).str.zfill(2)
+    )
+
+    resultado['estado'] = 'pendiente'
+    resultado.loc[restante <= 0, 'estado'] = 'vencida'
+    resultado.loc[fechas.isna(), 'estado'] = 'fecha_invalida'
+    resultado.loc[resultado['ultima_fecha'].isna(), 'estado'] = 'sin_mediciones'
+    return resultado
@@ -0,0 +1,209 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import re
+import sqlite3
+import time
+import urllib.parse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+from almacen_mediciones import COLUMNAS, tipar_mediciones
+from diagnostico import evaluar_mediciones
+
+# Carpeta por defecto de los partogramas del fin de turno.
+CARPETA_PARTOGRAMAS = 'partogramas'
+# Procesos que generan PDF; cada uno abre su propia conexión de solo lectura.
+TRABAJADORES = max(1, min(8, os.cpu_count() or 1))
+# Filas de la tabla de mediciones por página.
+FILAS_POR_PAGINA = 70
+# Tamaño de página: A4 vertical, en pulgadas.
+TAMANO_PAGINA = (8.27, 11.69)
+
+# Líneas de referencia, las mismas de partograma.py.
+ALERTA_DILATACION = 4       # cm de dilatación
+LIMITE_SUPERIOR_FCF = 160   # lpm
+LIMITE_INFERIOR_FCF = 110   # lpm
+LIMITE_CONTRACCIONES = 5    # en 10 minutos
+
+# Columnas de la tabla de mediciones y su ancho en caracteres.
+# Fuentes estándar de PDF (Helvetica y Courier): no se incrustan en el archivo, así que cada PDF
+# se escribe unas tres veces más rápido y pesa la quinta parte. Los acentos y la ñ están incluidos.
+PARAMETROS_PDF = {'pdf.use14corefonts': True}
+# matplotlib avisa en cada proceso que Helvetica no tiene peso 'normal' y usa 'medium', que es el mismo.
+logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+
+COLUMNAS_TABLA = [('Hora', 17), ('Dilat. (cm)', 12), ('FCF (lpm)', 10), ('Contr./10 min', 14), ('PA (mmHg)', 10), ('Estado', 80)]
+
+SQL_PACIENTE = "SELECT id, nombre, edad, fum, patologia FROM pacientes WHERE id = ?"
+SQL_MEDICIONES = f"SELECT {', '.join(COLUMNAS)} FROM mediciones WHERE id_paciente = ? ORDER BY fecha, id"
+
+# Gráficas del partograma en la primera página, con los títulos, ejes y líneas de
+# referencia de partograma.py. El eje x son las horas desde la primera medición.
+def _pagina_graficas(paciente, mediciones_df, horas):
+    fig = Figure(figsize=TAMANO_PAGINA)
+    fig.suptitle('Partograma de seguimiento del trabajo de parto')
+    fig.text(0.5, 0.94, f"Paciente: {paciente[1]} (ID: {paciente[0]}) - Edad: {paciente[2]} - "
+                        f"FUM: {paciente[3]} - Patología: {paciente[4]}", ha='center', fontsize=9)
+    ax = fig.subplots(nrows=3, ncols=1)
+
+    ax[0].plot(horas, mediciones_df['dilatacion'].astype('float64'), 'bo-', markersize=3)
+    ax[0].set(xlabel='Tiempo (horas)', ylabel='Dilatación cervical (cm)', ylim=(0, 10.5))
+    ax[0].set_title("Gráfico de dilatación cervical")
+    ax[0].grid()
+    ax[0].axhline(y=ALERTA_DILATACION, color='r', linestyle='--')
+    ax[0].annotate('Línea de alerta', xy=(0.01, ALERTA_DILATACION + 0.5), xycoords=('axes fraction', 'data'), color='r')
+
+    ax[1].plot(horas, mediciones_df['frecuencia_cardiaca'].astype('float64'), 'go-', markersize=3)
+    ax[1].set(xlabel='Tiempo (horas)', ylabel='Frecuencia cardíaca fetal (lpm)')
+    ax[1].set_title("Gráfico de frecuencia cardíaca fetal")
+    ax[1].grid()
+    ax[1].axhline(y=LIMITE_SUPERIOR_FCF, color='r', linestyle='--')
+    ax[1].axhline(y=LIMITE_INFERIOR_FCF, color='r', linestyle='--')
+    ax[1].annotate('Límite superior', xy=(0.01, LIMITE_SUPERIOR_FCF + 2), xycoords=('axes fraction', 'data'), color='r')
+    ax[1].annotate('Límite inferior', xy=(0.01, LIMITE_INFERIOR_FCF - 8), xycoords=('axes fraction', 'data'), color='r')
+
+    ax[2].plot(horas, mediciones_df['contracciones'].astype('float64'), 'ro-', markersize=3)
+    ax[2].set(xlabel='Tiempo (horas)', ylabel='Contracciones uterinas (en 10 min)')
+    ax[2].set_title("Gráfico de contracciones uterinas")
+    ax[2].grid()
+    ax[2].axhline(y=LIMITE_CONTRACCIONES, color='r', linestyle='--')
+    ax[2].annotate('Límite normal', xy=(0.01, LIMITE_CONTRACCIONES + 0.5), xycoords=('axes fraction', 'data'), color='r')
+
+    # Márgenes fijos: tight_layout mide todos los textos y costaba casi tanto como dibujar la página.
+    fig.subplots_adjust(left=0.12, right=0.95, bottom=0.05, top=0.9, hspace=0.4)
+    return fig
+
+# Tabla de mediciones con el estado de cada una, partida en páginas de FILAS_POR_PAGINA filas.
+# Cada página es un solo bloque de texto de ancho fijo: matplotlib dibuja cada celda de
+# ax.table como un texto aparte, lo que multiplicaba por diez el tiempo de cada página.
+def _paginas_tabla(paciente, filas):
+    encabezado = ''.join(titulo.ljust(ancho) for titulo, ancho in COLUMNAS_TABLA)
+    separador = '-' * len(encabezado)
+    total_paginas = -(-len(filas) // FILAS_POR_PAGINA)
+    for inicio in range(0, len(filas), FILAS_POR_PAGINA):
+        lineas = [encabezado, separador] + [
+            ''.join(valor[:ancho - 1].ljust(ancho) for valor, (_, ancho) in zip(fila, COLUMNAS_TABLA))
+            for fila in filas[inicio:inicio + FILAS_POR_PAGINA]
+        ]
+        fig = Figure(figsize=TAMANO_PAGINA)
+        fig.suptitle(f"Mediciones de {paciente[1]} (ID: {paciente[0]}) - "
+                     f"página {inicio // FILAS_POR_PAGINA + 1} de {total_paginas}", fontsize=10)
+        fig.text(0.05, 0.94, '\n'.join(lineas), family='monospace', fontsize=6, va='top', linespacing=1.6)
+        yield fig
+
+def _texto(valor):
+    return '' if valor is None or valor != valor else str(valor)
+
+# Función para escribir el partograma de una paciente en un PDF: gráficas en la primera página
+# y tabla de mediciones en las siguientes. Devuelve el número de páginas.
+def escribir_partograma(paciente, mediciones_df, destino):
+    diagnostico_df = evaluar_mediciones(mediciones_df)
+    fechas = mediciones_df['Fecha']
+    horas = (fechas - fechas.min()).dt.total_seconds() / 3600
+    filas = [
+        [fecha.strftime('%Y-%m-%d %H:%M') if fecha == fecha else '', _texto(dilatacion), _texto(fcf),
+         _texto(contracciones), _texto(presion), estados]
+        for fecha, dilatacion, fcf, contracciones, presion, estados in zip(
+            fechas, mediciones_df['dilatacion'], mediciones_df['frecuencia_cardiaca'],
+            mediciones_df['contracciones'], mediciones_df['presion_arterial'], diagnostico_df['estados'])
+    ]
+    paginas = 0
+    with matplotlib.rc_context(PARAMETROS_PDF), PdfPages(destino, metadata={'Title': f"Partograma {paciente[0]}"}) as pdf:
+        for fig in [_pagina_graficas(paciente, mediciones_df, horas), *_paginas_tabla(paciente, filas)]:
+            pdf.savefig(fig)
+            fig.clear()
+            paginas += 1
+    return paginas
+
+def _nombre_archivo(id_paciente):
+    seguro = re.sub(r'[^\w-]', '_', str(id_paciente))
+    return f"partograma_{seguro}.pdf"
+
+def _conectar_solo_lectura(ruta_bd):
+    return sqlite3.connect(f"file:{urllib.parse.quote(ruta_bd)}?mode=ro", uri=True)
+
+# Trabajo de un proceso: lee la paciente y sus mediciones con su propia conexión, escribe el
+# PDF en un temporal y lo renombra. Devuelve un resumen de la paciente.
+def _generar_pdf(ruta_bd, id_paciente, carpeta):
+    inicio = time.perf_counter()
+    conn = _conectar_solo_lectura(ruta_bd)
+    try:
+        paciente = conn.execute(SQL_PACIENTE, (id_paciente,)).fetchone()
+        mediciones_df = tipar_mediciones(conn.execute(SQL_MEDICIONES, (id_paciente,)).fetchall())
+    finally:
+        conn.close()
+    if paciente is None or mediciones_df.empty:
+        return {'id_paciente': id_paciente, 'archivo': None, 'paginas': 0, 'mediciones': 0, 'bytes': 0,
+                'ms': round((time.perf_counter() - inicio) * 1000, 1)}
+    destino = os.path.join(carpeta, _nombre_archivo(id_paciente))
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    paginas = escribir_partograma(paciente, mediciones_df, temporal)
+    os.replace(temporal, destino)
+    return {'id_paciente': id_paciente, 'archivo': destino, 'paginas': paginas, 'mediciones': len(mediciones_df),
+            'bytes': os.path.getsize(destino), 'ms': round((time.perf_counter() - inicio) * 1000, 1)}
+
+# Generador que reparte los partogramas entre un pool de procesos y devuelve el resumen de cada
+# paciente a medida que su PDF queda escrito en la carpeta. Nunca hay más de 2 trabajos por
+# proceso en vuelo, así que la memoria no depende del número de pacientes. Con trabajadores=0
+# se generan en este proceso, uno tras otro.
+def iterar_partogramas(ruta_bd, carpeta=CARPETA_PARTOGRAMAS, id_pacientes=None, solo_activos=False,
+                       trabajadores=TRABAJADORES):
+    os.makedirs(carpeta, exist_ok=True)
+    ruta_bd = os.path.abspath(ruta_bd)
+    if id_pacientes is None:
+        conn = _conectar_solo_lectura(ruta_bd)
+        try:
+            sql = "SELECT id FROM pacientes" + (" WHERE estado_episodio = 'activo'" if solo_activos else "")
+            id_pacientes = [fila[0] for fila in conn.execute(sql + " ORDER BY id")]
+        finally:
+            conn.close()
+
+    if trabajadores == 0:
+        for id_paciente in id_pacientes:
+            yield _generar_pdf(ruta_bd, id_paciente, carpeta)
+        return
+
+    pendientes = iter(id_pacientes)
+    with ProcessPoolExecutor(max_workers=trabajadores, mp_context=multiprocessing.get_context('spawn')) as pool:
+        en_vuelo = set()
+        for id_paciente in pendientes:
+            en_vuelo.add(pool.submit(_generar_pdf, ruta_bd, id_paciente, carpeta))
+            if len(en_vuelo) >= 2 * trabajadores:
+                terminados, en_vuelo = wait(en_vuelo, return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    yield futuro.result()
+        for futuro in wait(en_vuelo).done:
+            yield futuro.result()
+
+# Uso: python reporte_partogramas.py [--bd partoseguro.db] [--destino partogramas] [--trabajadores 4] [--activas]
+def main():
+    parser = argparse.ArgumentParser(description="Genera el partograma en PDF de cada paciente de la base de datos.")
+    parser.add_argument('--bd', default='partoseguro.db', help="Base de datos de origen (por defecto: partoseguro.db)")
+    parser.add_argument('--destino', default=CARPETA_PARTOGRAMAS, help=f"Carpeta de salida (por defecto: {CARPETA_PARTOGRAMAS})")
+    parser.add_argument('--paciente', action='append', dest='id_pacientes', help="ID de paciente (se puede repetir)")
+    parser.add_argument('--activas', action='store_true', help="Solo pacientes con el episodio de parto activo")
+    parser.add_argument('--trabajadores', type=int, default=TRABAJADORES,
+                        help=f"Procesos en paralelo; 0 para generar en este proceso (por defecto: {TRABAJADORES})")
+    args = parser.parse_args()
+    if not os.path.exists(args.bd):
+        parser.exit(1, f"Error: no existe la base de datos {args.bd}\n")
+
+    inicio = time.perf_counter()
+    generados = 0
+    for resultado in iterar_partogramas(args.bd, args.destino, args.id_pacientes, args.activas, args.trabajadores):
+        if resultado['archivo'] is None:
+            print(f"{resultado['id_paciente']}: sin mediciones")
+        else:
+            generados += 1
+            print(f"{resultado['archivo']}: {resultado['paginas']} páginas, {resultado['mediciones']} mediciones")
+    print(f"{generados} partogramas en {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
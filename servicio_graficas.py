@@ -0,0 +1,217 @@
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from graficas import METRICAS, renderizar_grafica
+
+# Carpeta donde los trabajadores dejan las gráficas terminadas.
+CARPETA_GRAFICAS = os.path.join('cache', 'graficas')
+FORMATOS_GRAFICA = ('png', 'svg')
+# Procesos de renderizado (PARTOSEGURO_TRABAJADORES_GRAFICAS); con 0 se renderiza en el hilo
+# de la sesión, como antes del servicio.
+TRABAJADORES = int(os.environ.get('PARTOSEGURO_TRABAJADORES_GRAFICAS', max(1, min(4, (os.cpu_count() or 2) - 1))))
+# Gráficas que pueden esperar en la cola; con la cola llena la solicitud se repite en el
+# siguiente rerun.
+MAX_PENDIENTES = 256
+# Espacio en disco para las gráficas; se borran las menos usadas al superarlo.
+PRESUPUESTO_DISCO_BYTES = 256 * 1024 * 1024
+
+# Trabajo de un proceso del pool: renderiza la gráfica y la escribe en destino. Escribe a un
+# archivo temporal y lo renombra, así la página nunca lee una imagen a medio escribir.
+# Devuelve (bytes escritos, milisegundos de renderizado).
+def _renderizar_a_disco(mediciones_df, estilo, formato, destino):
+    inicio = time.perf_counter()
+    contenido = renderizar_grafica(mediciones_df, estilo, formato=formato)
+    temporal = f"{destino}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, destino)
+    return len(contenido), (time.perf_counter() - inicio) * 1000
+
+# Servicio de gráficas: un pool de procesos renderiza las gráficas de las pacientes cuyos datos
+# cambiaron y las deja en la carpeta de caché; el hilo de la sesión solo encola el trabajo y
+# muestra imágenes ya terminadas. Cada proceso tiene su propio estado de matplotlib, así que
+# una paciente lenta no bloquea la página ni a las demás sesiones.
+# La clave de una gráfica es (id_paciente, último mediciones.id, estilo, desde, hasta). Al
+# editar o borrar mediciones, invalidar_paciente borra sus archivos y descarta los trabajos en
+# curso de esa paciente. aciertos y fallos cuentan las solicitudes que encontraron la gráfica
+# terminada y las que no (encolada, en curso o rechazada).
+class ServicioGraficas:
+    def __init__(self, carpeta=CARPETA_GRAFICAS, trabajadores=TRABAJADORES, formato='png',
+                 max_pendientes=MAX_PENDIENTES, presupuesto_bytes=PRESUPUESTO_DISCO_BYTES):
+        if formato not in FORMATOS_GRAFICA:
+            raise ValueError(f"Formato de gráfica desconocido: {formato}")
+        self.carpeta = carpeta
+        self.trabajadores = trabajadores
+        self.formato = formato
+        self.max_pendientes = max_pendientes
+        self.presupuesto_bytes = presupuesto_bytes
+        # Los archivos de un proceso anterior pueden ser de mediciones editadas desde entonces.
+        os.makedirs(carpeta, exist_ok=True)
+        for entrada in os.scandir(carpeta):
+            if entrada.is_file() and entrada.name.endswith(FORMATOS_GRAFICA + ('.tmp',)):
+                _borrar_archivo(entrada.path)
+        # 'spawn' evita heredar por fork los hilos y locks del servidor de Streamlit.
+        self._pool = (
+            ProcessPoolExecutor(max_workers=trabajadores, mp_context=multiprocessing.get_context('spawn'))
+            if trabajadores > 0 else None
+        )
+        self._lock = threading.Lock()
+        self._archivos = OrderedDict()   # clave -> (ruta, bytes), en orden de uso
+        self._ultima = {}                # id_paciente -> ruta de la última gráfica terminada
+        self._pendientes = {}            # clave -> generación de la paciente al encolar
+        self._generaciones = {}
+        self._bytes = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.renderizadas = 0
+        self.errores = 0
+        self.descartadas = 0
+        self.rechazadas = 0
+        self._render_total_ms = 0.0
+        self.ultimo_error = None
+
+    def _ruta(self, clave):
+        paciente = re.sub(r'[^\w-]', '_', str(clave[0]))
+        resumen = hashlib.sha1(repr(clave).encode()).hexdigest()[:20]
+        return os.path.join(self.carpeta, f"{paciente}_{resumen}.{self.formato}")
+
+    # Devuelve la ruta de la gráfica si ya está terminada; si no, la encola (una sola vez por
+    # clave) y devuelve None. Con trabajadores=0 la renderiza aquí mismo.
+    def obtener(self, clave, mediciones_df, estilo):
+        with self._lock:
+            entrada = self._archivos.get(clave)
+            if entrada is not None:
+                self._archivos.move_to_end(clave)
+                self.aciertos += 1
+                return entrada[0]
+            self.fallos += 1
+            generacion = self._generaciones.get(clave[0], 0)
+            if self._pendientes.get(clave) == generacion:
+                return None
+            if len(self._pendientes) >= self.max_pendientes:
+                self.rechazadas += 1
+                return None
+            self._pendientes[clave] = generacion
+
+        # Solo viajan al proceso las columnas que se grafican.
+        datos = mediciones_df[['Fecha'] + [columna for columna, _, _ in METRICAS]]
+        ruta = self._ruta(clave)
+        if self._pool is None:
+            try:
+                resultado = _renderizar_a_disco(datos, estilo, self.formato, ruta)
+            except Exception as e:
+                self._terminar(clave, generacion, ruta, error=e)
+                raise
+            self._terminar(clave, generacion, ruta, resultado)
+            return ruta
+        futuro = self._pool.submit(_renderizar_a_disco, datos, estilo, self.formato, ruta)
+        futuro.add_done_callback(lambda f: self._al_terminar(clave, generacion, ruta, f))
+        return None
+
+    def _al_terminar(self, clave, generacion, ruta, futuro):
+        if futuro.cancelled():
+            self._terminar(clave, generacion, ruta, error='cancelado')
+        elif futuro.exception() is not None:
+            self._terminar(clave, generacion, ruta, error=futuro.exception())
+        else:
+            self._terminar(clave, generacion, ruta, futuro.result())
+
+    def _terminar(self, clave, generacion, ruta, resultado=None, error=None):
+        borrar = []
+        with self._lock:
+            if self._pendientes.get(clave) == generacion:
+                del self._pendientes[clave]
+            if error is not None:
+                self.errores += 1
+                self.ultimo_error = repr(error)
+                return
+            if self._generaciones.get(clave[0], 0) != generacion:
+                # La paciente se invalidó mientras se renderizaba: la imagen ya no sirve.
+                self.descartadas += 1
+                borrar.append(ruta)
+            else:
+                bytes_escritos, render_ms = resultado
+                anterior = self._archivos.pop(clave, None)
+                if anterior is not None:
+                    self._bytes -= anterior[1]
+                self._archivos[clave] = (ruta, bytes_escritos)
+                self._bytes += bytes_escritos
+                self._ultima[clave[0]] = ruta
+                self.renderizadas += 1
+                self._render_total_ms += render_ms
+                borrar.extend(self._desalojar())
+        for ruta_borrar in borrar:
+            _borrar_archivo(ruta_borrar)
+
+    # Quita las gráficas menos usadas hasta respetar el presupuesto; devuelve las rutas a borrar.
+    def _desalojar(self):
+        rutas = []
+        while self._archivos and self._bytes > self.presupuesto_bytes:
+            clave, (ruta, bytes_archivo) = self._archivos.popitem(last=False)
+            self._bytes -= bytes_archivo
+            if self._ultima.get(clave[0]) == ruta:
+                del self._ultima[clave[0]]
+            rutas.append(ruta)
+        return rutas
+
+    # Última gráfica terminada de una paciente, aunque sea de datos anteriores: la página la
+    # muestra mientras se prepara la nueva.
+    def ultima(self, id_paciente):
+        with self._lock:
+            return self._ultima.get(id_paciente)
+
+    # Indica si la gráfica de alguna de las claves ya está terminada.
+    def alguna_lista(self, claves):
+        with self._lock:
+            return any(clave in self._archivos for clave in claves)
+
+    # Elimina las gráficas de una paciente, por ejemplo tras editar o borrar mediciones. Los
+    # trabajos en curso de la paciente se descartan al terminar.
+    def invalidar_paciente(self, id_paciente):
+        with self._lock:
+            self._generaciones[id_paciente] = self._generaciones.get(id_paciente, 0) + 1
+            claves = [clave for clave in self._archivos if clave[0] == id_paciente]
+            rutas = []
+            for clave in claves:
+                ruta, bytes_archivo = self._archivos.pop(clave)
+                self._bytes -= bytes_archivo
+                rutas.append(ruta)
+            self._ultima.pop(id_paciente, None)
+        for ruta in rutas:
+            _borrar_archivo(ruta)
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'trabajadores': self.trabajadores,
+                'en_cola': len(self._pendientes),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / consultas, 3) if consultas else 0.0,
+                'renderizadas': self.renderizadas,
+                'render_medio_ms': round(self._render_total_ms / self.renderizadas, 1) if self.renderizadas else 0.0,
+                'errores': self.errores,
+                'ultimo_error': self.ultimo_error,
+                'descartadas': self.descartadas,
+                'rechazadas_cola_llena': self.rechazadas,
+                'archivos': len(self._archivos),
+                'bytes_en_disco': self._bytes,
+                'presupuesto_bytes': self.presupuesto_bytes,
+            }
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+def _borrar_archivo(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
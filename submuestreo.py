@@ -0,0 +1,65 @@
+import numpy as np
+
+# Métodos de submuestreo disponibles para las series que se grafican.
+METODOS = ('lttb', 'minmax')
+
+# Función para elegir puntos de una serie con Largest-Triangle-Three-Buckets.
+# Divide la serie en n_puntos - 2 grupos y en cada uno conserva el punto que forma el triángulo
+# de mayor área con el punto elegido en el grupo anterior y el promedio del grupo siguiente; así
+# se mantienen los picos y valles que definen la forma de la curva. Siempre conserva el primer y
+# el último punto. x e y son arreglos float64 sin nulos, con x creciente.
+# Devuelve los índices elegidos, en orden.
+def lttb(x, y, n_puntos):
+    n = len(x)
+    if n_puntos >= n or n_puntos < 3:
+        return np.arange(n)
+    bordes = np.linspace(1, n - 1, n_puntos - 1).astype(np.int64)
+    indices = np.empty(n_puntos, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(n_puntos - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        # El grupo siguiente del último grupo es el último punto de la serie.
+        fin_siguiente = bordes[i + 2] if i + 2 < len(bordes) else n
+        cx = x[fin:fin_siguiente].mean()
+        cy = y[fin:fin_siguiente].mean()
+        areas = np.abs((x[a] - cx) * (y[inicio:fin] - y[a]) - (x[a] - x[inicio:fin]) * (cy - y[a]))
+        a = inicio + int(areas.argmax())
+        indices[i + 1] = a
+    return indices
+
+# Función para elegir puntos de una serie con decimación mínimo/máximo.
+# Divide la serie en n_puntos // 2 grupos de igual tamaño y conserva el mínimo y el máximo de
+# cada uno, en orden temporal: ningún pico ni valle se pierde. Devuelve los índices elegidos.
+def min_max(y, n_puntos):
+    n = len(y)
+    grupos = n_puntos // 2
+    if n_puntos >= n or grupos < 1:
+        return np.arange(n)
+    tamano = -(-n // grupos)
+    grupos = -(-n // tamano)
+    relleno = np.full(grupos * tamano, np.nan)
+    relleno[:n] = y
+    matriz = relleno.reshape(grupos, tamano)
+    base = np.arange(grupos)[:, None] * tamano
+    extremos = np.sort(np.stack([np.nanargmin(matriz, axis=1), np.nanargmax(matriz, axis=1)], axis=1), axis=1)
+    return np.unique((base + extremos).ravel())
+
+# Función para reducir una serie a lo sumo a n_puntos, con el método indicado.
+# fechas es una Serie datetime y valores una Serie numérica (puede tener nulos, que se
+# descartan solo si hace falta reducir). Devuelve (fechas, valores) listos para graficar.
+def reducir_serie(fechas, valores, n_puntos, metodo='lttb'):
+    if len(valores) <= n_puntos:
+        return fechas, valores
+    validos = valores.notna().to_numpy() & fechas.notna().to_numpy()
+    fechas, valores = fechas[validos], valores[validos]
+    y = valores.to_numpy(dtype='float64')
+    if metodo == 'lttb':
+        x = fechas.to_numpy(dtype='datetime64[ns]').astype('int64').astype('float64')
+        indices = lttb(x, y, n_puntos)
+    elif metodo == 'minmax':
+        indices = min_max(y, n_puntos)
+    else:
+        raise ValueError(f"Método de submuestreo desconocido: {metodo}")
+    return fechas.iloc[indices], valores.iloc[indices]
@@ -0,0 +1,260 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+import zlib
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# Señales de un cardiotocógrafo: frecuencia cardíaca fetal y actividad uterina (tocografía).
+SENALES = {
+    'fcf': 'Frecuencia cardíaca fetal (lpm)',
+    'toco': 'Actividad uterina',
+}
+# Duración de cada bloque de la tabla trazas_ctg; los bloques empiezan en múltiplos de esta
+# duración desde la medianoche.
+BLOQUE_MINUTOS = 10
+# Las muestras se guardan como enteros de 16 bits en cuartos de unidad (0,25 lpm de resolución);
+# SIN_SENAL marca las muestras perdidas (transductor desplazado, pérdida de contacto).
+ESCALA = 4
+SIN_SENAL = 0xFFFF
+NIVEL_COMPRESION = 6
+# Copias contiguas y sin comprimir de cada traza, para leerlas con un mapa de memoria.
+CARPETA_TRAZAS = os.path.join('cache', 'trazas')
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+SQL_BLOQUES = """
+SELECT inicio, frecuencia_hz, n_muestras, datos FROM trazas_ctg
+WHERE id_paciente = ? AND senal = ? AND inicio >= ? AND inicio < ?
+ORDER BY inicio
+"""
+# Firma de una traza: cambia con cualquier bloque nuevo o reescrito.
+SQL_FIRMA = """
+SELECT COUNT(*), SUM(version), MIN(inicio), MAX(inicio), MAX(frecuencia_hz), MIN(frecuencia_hz)
+FROM trazas_ctg WHERE id_paciente = ? AND senal = ?
+"""
+# Firma de los bloques de una traza anteriores a un inicio dado.
+SQL_FIRMA_PREVIA = """
+SELECT COUNT(*), SUM(version) FROM trazas_ctg WHERE id_paciente = ? AND senal = ? AND inicio < ?
+"""
+
+# Tramo de una traza: muestras en unidades físicas (float32, NaN donde no hubo señal) tomadas
+# a frecuencia_hz desde inicio.
+class Traza(NamedTuple):
+    inicio: datetime
+    frecuencia_hz: float
+    muestras: np.ndarray
+
+    def fechas(self):
+        return pd.date_range(self.inicio, periods=len(self.muestras), freq=pd.Timedelta(seconds=1 / self.frecuencia_hz))
+
+    def fin(self):
+        return self.inicio + timedelta(seconds=len(self.muestras) / self.frecuencia_hz)
+
+    def como_dataframe(self, columna='valor'):
+        return pd.DataFrame({'Fecha': self.fechas(), columna: self.muestras})
+
+# Inicio del bloque que contiene el instante indicado.
+def inicio_bloque(fecha):
+    medianoche = datetime.combine(fecha.date(), datetime.min.time())
+    minutos = (fecha - medianoche) // timedelta(minutes=BLOQUE_MINUTOS) * BLOQUE_MINUTOS
+    return medianoche + timedelta(minutes=minutos)
+
+def _muestras_por_bloque(frecuencia_hz):
+    return int(round(BLOQUE_MINUTOS * 60 * frecuencia_hz))
+
+def _a_enteros(valores):
+    valores = np.asarray(valores, dtype='float64')
+    enteros = np.full(len(valores), SIN_SENAL, dtype=np.uint16)
+    validos = np.isfinite(valores)
+    enteros[validos] = np.clip(np.rint(valores[validos] * ESCALA), 0, SIN_SENAL - 1)
+    return enteros
+
+def _a_unidades(enteros):
+    valores = enteros.astype(np.float32) / ESCALA
+    valores[enteros == SIN_SENAL] = np.nan
+    return valores
+
+# Función para codificar las muestras de un bloque: diferencias entre muestras consecutivas
+# (módulo 2^16, así que se revierten exactamente) comprimidas con zlib. La señal cambia poco de
+# una muestra a la siguiente, y las diferencias pequeñas se comprimen mucho mejor que los valores.
+def codificar_bloque(enteros):
+    diferencias = np.diff(enteros.astype(np.uint16), prepend=np.uint16(0))
+    return zlib.compress(diferencias.astype('<u2').tobytes(), NIVEL_COMPRESION)
+
+def decodificar_bloque(datos):
+    diferencias = np.frombuffer(zlib.decompress(datos), dtype='<u2')
+    return np.cumsum(diferencias, dtype=np.uint16)
+
+# Función para guardar muestras de una señal de una paciente, desde inicio y a frecuencia_hz.
+# valores puede ser cualquier arreglo numérico (NaN = sin señal) y de cualquier largo: se reparte
+# en los bloques que toca, completando los bloques ya guardados (un monitor envía unos segundos
+# cada vez). Todos los bloques se escriben en una sola escritura de la cola del pool.
+# Devuelve el número de bloques escritos.
+def agregar_muestras(pool, id_paciente, senal, inicio, valores, frecuencia_hz):
+    if senal not in SENALES:
+        raise ValueError(f"Señal desconocida: {senal}")
+    enteros = _a_enteros(valores)
+    por_bloque = _muestras_por_bloque(frecuencia_hz)
+    tramos = []
+    bloque = inicio_bloque(inicio)
+    desplazamiento = int(round((inicio - bloque).total_seconds() * frecuencia_hz))
+    posicion = 0
+    while posicion < len(enteros):
+        cantidad = min(por_bloque - desplazamiento, len(enteros) - posicion)
+        tramos.append((bloque.strftime(FORMATO_FECHA), desplazamiento, enteros[posicion:posicion + cantidad]))
+        posicion += cantidad
+        bloque += timedelta(minutes=BLOQUE_MINUTOS)
+        desplazamiento = 0
+
+    def escribir_bloques(conn):
+        for inicio_texto, desplazamiento, tramo in tramos:
+            fila = conn.execute(
+                "SELECT frecuencia_hz, datos FROM trazas_ctg WHERE id_paciente = ? AND senal = ? AND inicio = ?",
+                (id_paciente, senal, inicio_texto),
+            ).fetchone()
+            if fila is None:
+                muestras = np.full(desplazamiento + len(tramo), SIN_SENAL, dtype=np.uint16)
+            else:
+                if fila[0] != frecuencia_hz:
+                    raise ValueError(f"La traza {senal} de {id_paciente} se registra a {fila[0]} Hz, no a {frecuencia_hz} Hz")
+                guardadas = decodificar_bloque(fila[1])
+                muestras = np.full(max(len(guardadas), desplazamiento + len(tramo)), SIN_SENAL, dtype=np.uint16)
+                muestras[:len(guardadas)] = guardadas
+            muestras[desplazamiento:desplazamiento + len(tramo)] = tramo
+            conn.execute(
+                "INSERT INTO trazas_ctg (id_paciente, senal, inicio, frecuencia_hz, n_muestras, datos) "
+                "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(id_paciente, senal, inicio) DO UPDATE SET "
+                "n_muestras = excluded.n_muestras, datos = excluded.datos, version = version + 1",
+                (id_paciente, senal, inicio_texto, frecuencia_hz, len(muestras), codificar_bloque(muestras)),
+            )
+        return len(tramos)
+
+    return pool.escribir(escribir_bloques)
+
+# Función para leer un tramo de una traza descomprimiendo sus bloques de la base de datos.
+# desde y hasta son datetime (None = desde el principio o hasta el final). Devuelve una Traza
+# o None si la paciente no tiene esa señal en el rango.
+def leer_traza(conn, id_paciente, senal, desde=None, hasta=None):
+    filas = conn.execute(SQL_BLOQUES, (
+        id_paciente, senal,
+        inicio_bloque(desde).strftime(FORMATO_FECHA) if desde is not None else '',
+        hasta.strftime(FORMATO_FECHA) if hasta is not None else '9999-12-31 23:59:59',
+    )).fetchall()
+    if not filas:
+        return None
+    frecuencia_hz = filas[0][1]
+    por_bloque = _muestras_por_bloque(frecuencia_hz)
+    primero = datetime.strptime(filas[0][0], FORMATO_FECHA)
+    ultimo = datetime.strptime(filas[-1][0], FORMATO_FECHA)
+    total = _posicion(primero, ultimo, frecuencia_hz) + filas[-1][2]
+    enteros = np.full(total, SIN_SENAL, dtype=np.uint16)
+    for inicio_texto, _, _, datos in filas:
+        posicion = _posicion(primero, datetime.strptime(inicio_texto, FORMATO_FECHA), frecuencia_hz)
+        muestras = decodificar_bloque(datos)[:por_bloque]
+        enteros[posicion:posicion + len(muestras)] = muestras
+    return _recortar(primero, frecuencia_hz, enteros, desde, hasta)
+
+def _posicion(inicio, fecha, frecuencia_hz):
+    return int(round((fecha - inicio).total_seconds() * frecuencia_hz))
+
+def _recortar(inicio, frecuencia_hz, enteros, desde, hasta):
+    desde_i = max(0, _posicion(inicio, desde, frecuencia_hz)) if desde is not None else 0
+    hasta_i = min(len(enteros), _posicion(inicio, hasta, frecuencia_hz)) if hasta is not None else len(enteros)
+    if hasta_i <= desde_i:
+        return None
+    return Traza(inicio + timedelta(seconds=desde_i / frecuencia_hz), frecuencia_hz, _a_unidades(enteros[desde_i:hasta_i]))
+
+# Copia contigua de una traza en disco, leída con np.memmap: un tramo cualquiera, aun de 24 horas,
+# se lee sin descomprimir ni consultar los bloques, solo las páginas del archivo que se tocan. La
+# copia se nombra con la firma de la traza (bloques, versiones y extremos) y se vuelve a generar
+# cuando algún bloque cambia; la escribe cualquier proceso que la necesite, a un temporal que luego
+# se renombra. Junto a cada copia se guarda un descriptor (.json) con su último bloque y la firma
+# de los anteriores, para que la copia siguiente reutilice lo que no cambió.
+def leer_traza_mapeada(conn, id_paciente, senal, desde=None, hasta=None, carpeta=CARPETA_TRAZAS):
+    n_bloques, versiones, primero, ultimo, frecuencia_max, frecuencia_min = conn.execute(
+        SQL_FIRMA, (id_paciente, senal)
+    ).fetchone()
+    if not n_bloques:
+        return None
+    if frecuencia_max != frecuencia_min:
+        # Bloques con frecuencias distintas no caben en una copia contigua.
+        return leer_traza(conn, id_paciente, senal, desde, hasta)
+    firma = hashlib.sha1(repr((n_bloques, versiones, primero, ultimo, frecuencia_max)).encode()).hexdigest()[:16]
+    nombre = re.sub(r'[^\w-]', '_', str(id_paciente))
+    prefijo = os.path.join(carpeta, f"{nombre}_{senal}_")
+    ruta = f"{prefijo}{firma}.u2"
+    if not os.path.exists(ruta):
+        os.makedirs(carpeta, exist_ok=True)
+        # La firma de los bloques previos se toma antes de leerlos: si alguno cambia mientras tanto,
+        # la copia siguiente no coincidirá con ella y se regenerará entera.
+        descriptor = {
+            'primero': primero, 'frecuencia_hz': frecuencia_max, 'ultimo': ultimo,
+            'previos': list(conn.execute(SQL_FIRMA_PREVIA, (id_paciente, senal, ultimo)).fetchone()),
+        }
+        # Temporales con nombre único: dos sesiones del mismo proceso pueden generar la misma copia.
+        with tempfile.NamedTemporaryFile(dir=carpeta, prefix=os.path.basename(prefijo), suffix='.tmp', delete=False) as temporal:
+            _escribir_copia(conn, id_paciente, senal, prefijo, primero, frecuencia_max, temporal)
+        with tempfile.NamedTemporaryFile('w', dir=carpeta, prefix=os.path.basename(prefijo), suffix='.tmp',
+                                         delete=False, encoding='utf-8') as temporal_descriptor:
+            json.dump(descriptor, temporal_descriptor)
+        os.replace(temporal_descriptor.name, f"{prefijo}{firma}.json")
+        os.replace(temporal.name, ruta)
+        for anterior in glob.glob(f"{glob.escape(prefijo)}*.u2") + glob.glob(f"{glob.escape(prefijo)}*.json"):
+            if not anterior.startswith(f"{prefijo}{firma}."):
+                try:
+                    os.remove(anterior)
+                except FileNotFoundError:
+                    pass
+    mapa = np.memmap(ruta, dtype='<u2', mode='r')
+    return _recortar(datetime.strptime(primero, FORMATO_FECHA), frecuencia_max, mapa, desde, hasta)
+
+# Función para escribir en archivo la copia contigua de una traza. Si hay una copia anterior con el
+# mismo inicio y frecuencia cuyos bloques previos a su último bloque no cambiaron, copia esas
+# muestras tal cual y solo descomprime desde ese último bloque: con una paciente en monitorización,
+# el bloque que se va completando y los nuevos. Si no, descomprime la traza entera.
+def _escribir_copia(conn, id_paciente, senal, prefijo, primero, frecuencia_hz, archivo):
+    for ruta_descriptor in glob.glob(f"{glob.escape(prefijo)}*.json"):
+        try:
+            with open(ruta_descriptor, encoding='utf-8') as f:
+                anterior = json.load(f)
+            if (anterior['primero'], anterior['frecuencia_hz']) != (primero, frecuencia_hz):
+                continue
+            previos = conn.execute(SQL_FIRMA_PREVIA, (id_paciente, senal, anterior['ultimo'])).fetchone()
+            if list(previos) != anterior['previos']:
+                continue
+            ultimo = datetime.strptime(anterior['ultimo'], FORMATO_FECHA)
+            posicion = _posicion(datetime.strptime(primero, FORMATO_FECHA), ultimo, frecuencia_hz)
+            reutilizadas = np.fromfile(ruta_descriptor[:-len('.json')] + '.u2', dtype='<u2', count=posicion)
+        except (OSError, ValueError, KeyError):
+            # Copia anterior borrada por otra sesión o descriptor incompleto.
+            continue
+        cola = leer_traza(conn, id_paciente, senal, ultimo)
+        if len(reutilizadas) == posicion and cola is not None and cola.inicio == ultimo:
+            reutilizadas.tofile(archivo)
+            _a_enteros(cola.muestras).astype('<u2').tofile(archivo)
+            return
+    _a_enteros(leer_traza(conn, id_paciente, senal).muestras).astype('<u2').tofile(archivo)
+
+# Función para saber qué señales tiene registradas una paciente.
+def senales_paciente(conn, id_paciente):
+    return [fila[0] for fila in conn.execute(
+        "SELECT DISTINCT senal FROM trazas_ctg WHERE id_paciente = ? ORDER BY senal", (id_paciente,)
+    )]
+
+# Función para saber cuáles de las pacientes indicadas (todas, con ids=None) tienen registrada
+# una señal. Devuelve un conjunto de ids.
+def pacientes_con_senal(conn, senal, ids=None):
+    if ids is None:
+        filas = conn.execute("SELECT DISTINCT id_paciente FROM trazas_ctg WHERE senal = ?", (senal,))
+    else:
+        filas = conn.execute(
+            "SELECT DISTINCT id_paciente FROM trazas_ctg WHERE senal = ? AND id_paciente IN (SELECT value FROM json_each(?))",
+            (senal, json.dumps(list(ids))),
+        )
+    return {fila[0] for fila in filas}
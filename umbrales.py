@@ -0,0 +1,21 @@
+# Umbrales clínicos de las reglas de diagnóstico. Los comparten las reglas vectorizadas de
+# diagnostico.py y su versión en SQL de esquema.py (diagnóstico de estado_paciente), para que las
+# dos den siempre el mismo resultado; benchmarks/verificar_reglas.py lo comprueba.
+
+# Frecuencia cardíaca fetal (latidos por minuto): bradicardia por debajo, taquicardia por encima.
+FCF_BRADICARDIA = 110
+FCF_TAQUICARDIA = 160
+
+# Presión arterial (mmHg) de las reglas de hipertensión e hipotensión.
+SISTOLICA_HIPERTENSION = 140
+DIASTOLICA_HIPERTENSION = 90
+SISTOLICA_HIPOTENSION = 90
+DIASTOLICA_HIPOTENSION = 60
+
+# Contracciones uterinas en 10 minutos: frecuentes por encima, insuficientes por debajo.
+CONTRACCIONES_FRECUENTES = 5
+CONTRACCIONES_INSUFICIENTES = 3
+
+# Dilatación cervical (cm): completa desde DILATACION_COMPLETA, lenta por debajo de DILATACION_LENTA.
+DILATACION_COMPLETA = 10
+DILATACION_LENTA = 4
@@ -0,0 +1,48 @@
+import re
+
+import pandas as pd
+
+from diagnostico import PATRON_PRESION_ARTERIAL, separar_presion_arterial
+
+# Límites aceptados para la presión arterial (mmHg), los mismos que usa el formulario de la barra lateral.
+SISTOLICA_MIN = 50
+DIASTOLICA_MIN = 30
+SISTOLICA_MAX = 250
+DIASTOLICA_MAX = 150
+
+# Rangos aceptados para las mediciones numéricas: (mínimo, máximo), iguales a los de los formularios.
+RANGOS = {
+    'dilatacion': (0, 10),
+    'frecuencia_cardiaca': (60, 200),
+    'contracciones': (0, 30),
+}
+
+MENSAJE_FORMATO_PA = "Por favor ingresa la presión arterial en el formato correcto (sistólica/diastólica)."
+MENSAJE_PA_BAJA = "La presión arterial sistólica y diastólica parece muy baja."
+MENSAJE_PA_ALTA = "La presión arterial sistólica y diastólica parece muy alta."
+# Las contracciones pueden quedar vacías solo si la paciente tiene tocografía: el analizador de
+# cardiotocografías las cuenta desde la traza (ver contracciones_ctg.py).
+MENSAJE_SIN_CONTRACCIONES = "Faltan las contracciones (la paciente no tiene tocografía para contarlas)"
+
+# Función para validar una serie de presiones arteriales "sistólica/diastólica".
+# Devuelve una serie con el mensaje de error de cada valor, o nulo si el valor es válido.
+def validar_presiones_arteriales(presion_arterial):
+    sistolica, diastolica = separar_presion_arterial(presion_arterial)
+    errores = pd.Series(pd.NA, index=presion_arterial.index, dtype='object')
+    errores[(sistolica > SISTOLICA_MAX) | (diastolica > DIASTOLICA_MAX)] = MENSAJE_PA_ALTA
+    errores[(sistolica < SISTOLICA_MIN) | (diastolica < DIASTOLICA_MIN)] = MENSAJE_PA_BAJA
+    errores[sistolica.isna()] = MENSAJE_FORMATO_PA
+    return errores
+
+# Función para validar una sola presión arterial; devuelve el mensaje de error o None.
+def validar_presion_arterial(presion_arterial):
+    error = validar_presiones_arteriales(pd.Series([presion_arterial], dtype='object')).iloc[0]
+    return None if pd.isna(error) else error
+
+# Función para separar una presión arterial "sistólica/diastólica" al guardarla.
+# Devuelve (sistolica, diastolica) como enteros, o (None, None) si no sigue el formato.
+def separar_presion(presion_arterial):
+    coincidencia = re.match(PATRON_PRESION_ARTERIAL, presion_arterial) if isinstance(presion_arterial, str) else None
+    if coincidencia is None:
+        return None, None
+    return int(coincidencia.group(1)), int(coincidencia.group(2))
@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from almacen_mediciones import COLUMNAS, tipar_mediciones
+
+# Ventanas de visualización disponibles, en horas hacia atrás desde ahora.
+VENTANAS_HORAS = [4, 8, 12, 24]
+VENTANA_POR_DEFECTO = 24
+# Inicio de las ventanas relativas redondeado hacia abajo a este número de minutos, para que la
+# ventana (y la gráfica en caché) no cambie en cada rerun sino solo cada tanto.
+GRANULARIDAD_MINUTOS = 15
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+# Función para calcular el inicio de la ventana de las últimas `horas` horas.
+def inicio_ventana(horas, ahora=None):
+    ahora = ahora or datetime.now()
+    desde = ahora - timedelta(hours=horas)
+    return desde.replace(minute=desde.minute - desde.minute % GRANULARIDAD_MINUTOS, second=0, microsecond=0)
+
+# Mediciones de un paciente en un rango de fechas; el rango se resuelve con el índice (id_paciente, fecha).
+SQL_MEDICIONES_RANGO = f"""
+SELECT {', '.join(COLUMNAS)} FROM mediciones
+WHERE id_paciente = ? AND fecha BETWEEN ? AND ?
+ORDER BY fecha, id
+"""
+
+# Función para leer las mediciones de un paciente entre dos fechas (ventana personalizada).
+def leer_ventana(conn, id_paciente, desde, hasta):
+    filas = conn.execute(
+        SQL_MEDICIONES_RANGO, (id_paciente, desde.strftime(FORMATO_FECHA), hasta.strftime(FORMATO_FECHA))
+    ).fetchall()
+    return tipar_mediciones(filas)
+
+# Resumen por hora de las mediciones anteriores a la ventana: la agregación la hace SQLite
+# recorriendo el índice (id_paciente, fecha), y solo viaja una fila por hora.
+SQL_RESUMEN_POR_HORA = """
+SELECT strftime('%Y-%m-%d %H:00:00', fecha) AS hora,
+       COUNT(*) AS mediciones,
+       MAX(dilatacion) AS dilatacion_max,
+       AVG(frecuencia_cardiaca) AS frecuencia_cardiaca_media,
+       MIN(frecuencia_cardiaca) AS frecuencia_cardiaca_min,
+       MAX(frecuencia_cardiaca) AS frecuencia_cardiaca_max,
+       AVG(contracciones) AS contracciones_media
+FROM mediciones
+WHERE id_paciente = ? AND fecha >= ? AND fecha < ?
+GROUP BY hora
+HAVING hora IS NOT NULL
+ORDER BY hora
+"""
+
+# Función para resumir por hora las mediciones de un paciente anteriores a `hasta`
+# (opcionalmente desde `desde`). Devuelve una fila por hora con conteo, máximos y promedios.
+def resumen_por_hora(conn, id_paciente, hasta, desde=None):
+    desde = desde.strftime(FORMATO_FECHA) if desde is not None else ''
+    resumen = pd.read_sql_query(SQL_RESUMEN_POR_HORA, conn, params=(id_paciente, desde, hasta.strftime(FORMATO_FECHA)))
+    resumen['hora'] = pd.to_datetime(resumen['hora'])
+    for columna in ['frecuencia_cardiaca_media', 'contracciones_media']:
+        resumen[columna] = resumen[columna].round(1)
+    return resumen